@@ -0,0 +1,451 @@
+"""
+asyncio-based fetch engine for batch and prefetch extraction.
+Downloads run as coroutines on one background event loop, so hundreds of
+concurrent chapter fetches share a single thread instead of each holding a
+blocked worker thread for the length of a slow response. Parsing and
+cleaning are CPU work and run on a small thread pool off the event loop.
+
+aiohttp is used when installed; without it, downloads fall back to the
+synchronous http_client running in the loop's default executor.
+The synchronous extract_content API used by the Streamlit UI is unchanged.
+"""
+
+import asyncio
+import inspect
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
+import requests
+
+import http_client
+import content_extractor
+import dns_cache
+import http2_transport
+import light_endpoints
+from extraction_cache import get_extraction_cache
+from single_flight import get_single_flight, shared_result, FOLLOWER_GRACE_SECONDS
+from http_cache import get_http_cache, get_redirect_cache
+from cookie_store import get_cookie_jar
+from html_stream import watcher_for_url
+from latency_tracker import get_latency_tracker
+from transport_profile import get_transport_profiles
+from retry_policy import RetryBudget, BATCH_BUDGET, check_status, check_deadline
+from proxy_pool import get_proxy_pool, HTTP_PROXY_SCHEMES
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+logger = logging.getLogger("content_extractor")
+
+PARSE_WORKERS = int(os.environ.get("ASYNC_PARSE_WORKERS", 2))
+MAX_CONNECTIONS = int(os.environ.get("ASYNC_MAX_CONNECTIONS", 100))
+
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+MAX_REDIRECTS = 10
+
+
+class AsyncSSLError(Exception):
+    """Raised when an async download fails certificate verification"""
+
+
+async def fetch_html_async(session, url, headers, timeout, verify=True, debug_info=None, domain_limiter=None,
+                           watcher=None, use_cache=True, content_types=http_client.HTML_CONTENT_TYPES,
+                           cache_variant=None, deadline=None):
+    """Fetch a page and return its HTML as text (see fetch_page_async)"""
+    html, _ = await fetch_page_async(session, url, headers, timeout, verify, debug_info, domain_limiter, watcher,
+                                     use_cache, content_types, cache_variant, deadline)
+    return html
+
+
+async def fetch_page_async(session, url, headers, timeout, verify=True, debug_info=None, domain_limiter=None,
+                           watcher=None, use_cache=True, content_types=http_client.HTML_CONTENT_TYPES,
+                           cache_variant=None, deadline=None):
+    """
+    Async counterpart of http_client.fetch_page, returning (HTML, final URL) and sharing the same HTTP cache,
+    cookie jar, redirect memory and proxy pool (HTTP proxies only). Redirects are followed here rather than by
+    aiohttp so every hop gets the cookies of its own domain. https pages go over
+    HTTP/2 instead when it is switched on (see http2_transport).
+    `timeout` is a (connect, read) tuple. Certificate failures raise AsyncSSLError.
+    """
+    if debug_info is None:
+        debug_info = []
+    url = http_client.resolve_redirects(url, debug_info)
+
+    if session is None:
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                None, lambda: http_client.fetch_page(url, headers, timeout, verify=verify, debug_info=debug_info,
+                                               use_cache=use_cache, watcher=watcher,
+                                               content_types=content_types, cache_variant=cache_variant,
+                                               deadline=deadline)
+            )
+        except requests.exceptions.SSLError as e:
+            raise AsyncSSLError(str(e)) from e
+
+    html, entry = None, None
+    if use_cache:
+        html, entry = await asyncio.to_thread(
+            http_client.lookup_cache, url, headers, timeout, verify, debug_info, watcher is not None, cache_variant
+        )
+        if html is not None:
+            return html, entry.get("final_url") or url
+
+    request_headers = dict(headers)
+    if entry:
+        request_headers.update(get_http_cache().conditional_headers(entry))
+
+    connect_timeout, read_timeout = timeout
+    client_timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+    stats = http_client.TransferStats()
+    cookie_jar = get_cookie_jar()
+
+    try:
+        if domain_limiter:
+            await domain_limiter.acquire_async(timeout)
+        error = None
+        try:
+            body = None
+            if http2_transport.enabled_for(url):
+                try:
+                    response, body = await http2_transport.download_async(
+                        url, request_headers, timeout, verify, watcher, stats, content_types, deadline
+                    )
+                    status_code, response_headers = response.status_code, response.headers
+                    # httpx follows redirects itself; download_async has recorded them
+                    hops = []
+                    current_url = str(response.url)
+                except http2_transport.Http2Unavailable:
+                    # Start over on HTTP/1.1; a watcher that already saw part of the page cannot be reused
+                    if getattr(watcher, "bytes_seen", 0):
+                        watcher = None
+                    stats = http_client.TransferStats()
+            if body is None:
+                lease = await get_proxy_pool().lease_async(timeout, HTTP_PROXY_SCHEMES)
+                with lease:
+                    if lease.proxy:
+                        stats.proxy = lease.proxy.label
+                    sent_at = time.monotonic()
+                    first_byte_at = None
+                    current_url = url
+                    hops = []
+                    while True:
+                        hop_headers = dict(request_headers)
+                        cookie = cookie_jar.cookie_header(current_url)
+                        if cookie:
+                            hop_headers["Cookie"] = cookie
+                        async with session.get(current_url, headers=hop_headers, timeout=client_timeout,
+                                               ssl=None if verify else False, allow_redirects=False,
+                                               proxy=lease.url) as response:
+                            if first_byte_at is None:
+                                first_byte_at = time.monotonic()
+                                get_latency_tracker().record_first_byte(url, first_byte_at - sent_at)
+                                lease.record_latency(first_byte_at - sent_at)
+                            status_code = response.status
+                            response_headers = response.headers
+                            cookie_jar.store_cookies(current_url, response_headers)
+                            location = response_headers.get("Location")
+                            if status_code in REDIRECT_STATUSES and location and len(hops) < MAX_REDIRECTS:
+                                hops.append((status_code, current_url))
+                                current_url = urljoin(current_url, location)
+                                # Validators belong to the cached copy of the original URL only
+                                request_headers = dict(headers)
+                                entry = None
+                                continue
+                            check_status(status_code, response_headers)
+                            buffer = http_client.BodyBuffer(
+                                http_client.check_response_headers(response_headers, content_types)
+                            )
+                            decoder = http_client.ContentDecoder(response_headers.get("Content-Encoding"))
+                            stats.encoding = decoder.encoding
+                            if watcher:
+                                watcher.start(response_headers.get("Content-Type"))
+                            stopped = False
+                            # The session does not decompress, so these are the bytes as sent
+                            async for raw_chunk in response.content.iter_chunked(65536):
+                                check_deadline(deadline)
+                                stats.transferred += len(raw_chunk)
+                                chunk = decoder.decompress(raw_chunk)
+                                buffer.append(chunk)
+                                if watcher and chunk and watcher.feed(chunk):
+                                    stopped = True
+                                    break
+                            if not stopped:
+                                buffer.append(decoder.flush())
+                            stats.decoded = buffer.size
+                            body = buffer.getvalue()
+                            break
+        except asyncio.TimeoutError as e:
+            error = e
+            if first_byte_at is None:
+                # Counted, not recorded as a latency sample (see latency_tracker)
+                if isinstance(e, getattr(aiohttp, "ConnectionTimeoutError", ())):
+                    get_latency_tracker().record_timeout(url, "connect")
+                else:
+                    get_latency_tracker().record_timeout(url, "first_byte")
+            raise
+        except BaseException as e:
+            # 429/503 and timeouts shrink the domain's concurrency limit
+            error = e
+            raise
+        finally:
+            if domain_limiter:
+                domain_limiter.release(error)
+    except (aiohttp.ClientSSLError, requests.exceptions.SSLError) as e:
+        raise AsyncSSLError(str(e)) from e
+
+    if hops:
+        await asyncio.to_thread(get_redirect_cache().record, hops, current_url)
+    await asyncio.to_thread(cookie_jar.save_if_dirty)
+    http_client.log_download(status_code, body, watcher, debug_info, stats)
+    if not use_cache:
+        return http_client.decode_body(body, response_headers.get("Content-Type")), current_url
+    partial = bool(watcher and watcher.stopped_early)
+    html = await asyncio.to_thread(
+        http_client.store_response, url, status_code, response_headers, body, entry, partial, cache_variant,
+        current_url
+    )
+    return html, current_url
+
+
+async def extract_content_async(url, timeout_setting=30, session=None, parse_executor=None, domain_limiter=None,
+                                budget_seconds=BATCH_BUDGET):
+    """
+    Async equivalent of content_extractor.extract_content.
+    Fetches asynchronously, then parses and cleans on parse_executor so the
+    event loop is never blocked. Transient failures are retried for up to
+    budget_seconds, and concurrent calls for the same chapter share one
+    extraction. Returns the same tuple as extract_content.
+    """
+    start_time = time.time()
+
+    cached = content_extractor.cached_result(url, start_time)
+    if cached:
+        return cached
+
+    # Shares one extraction with concurrent callers, sync or async (see single_flight)
+    flights = get_single_flight()
+    flight, leader = flights.join(url, content_extractor.EXTRACTOR_VERSION)
+    if not leader:
+        if await flights.wait_async(flight, budget_seconds + FOLLOWER_GRACE_SECONDS):
+            return shared_result(flight.outcome(), time.time() - start_time)
+        logger.warning(f"Not waiting any longer for the concurrent extraction of {url}, extracting it separately")
+        flight = None
+
+    result, error = None, None
+    try:
+        # The previous extraction may have finished and been cached between the check above and join()
+        result = content_extractor.cached_result(url, start_time)
+        if result:
+            return result
+        result = await _extract_content_uncached_async(url, timeout_setting, session, parse_executor,
+                                                       domain_limiter, budget_seconds, start_time)
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        flights.finish(flight, result, error)
+    return result
+
+
+async def _extract_content_uncached_async(url, timeout_setting, session, parse_executor, domain_limiter,
+                                          budget_seconds, start_time):
+    """Fetch, parse and clean a chapter for extract_content_async and store it in the extraction cache"""
+    loop = asyncio.get_running_loop()
+    cache = get_extraction_cache()
+    debug_info = [f"Fetching URL (async): {url}"]
+    budget = RetryBudget(budget_seconds)
+    try:
+        headers, timeouts, ssl_verification = content_extractor.build_request_settings(url, timeout_setting, debug_info)
+        result = await _extract_light(url, headers, timeouts, ssl_verification, budget, session, parse_executor,
+                                      domain_limiter, start_time, debug_info)
+        if result:
+            cache.put(url, content_extractor.EXTRACTOR_VERSION, (result[0], result[1], result[4], result[5]))
+            return result
+        try:
+            html, page_url = await budget.run_async(
+                lambda attempt_timeouts: fetch_page_async(session, url, headers, attempt_timeouts, ssl_verification,
+                                                          debug_info, domain_limiter, watcher_for_url(url),
+                                                          deadline=budget.deadline),
+                timeouts, debug_info
+            )
+            await asyncio.to_thread(get_transport_profiles().record_success, url,
+                                    True if ssl_verification else None, None, headers)
+        except AsyncSSLError:
+            debug_info.append("SSL Error occurred. Retrying without SSL verification.")
+            html, page_url = await budget.run_async(
+                lambda attempt_timeouts: fetch_page_async(session, url, headers, attempt_timeouts, False,
+                                                          debug_info, domain_limiter, watcher_for_url(url),
+                                                          deadline=budget.deadline),
+                timeouts, debug_info
+            )
+            debug_info.append("Successfully retrieved content with SSL verification disabled")
+            await asyncio.to_thread(get_transport_profiles().record_success, url, False, None, headers)
+    except Exception as e:
+        execution_time = time.time() - start_time
+        debug_info.append(f"ERROR: {str(e)}")
+        await asyncio.to_thread(get_transport_profiles().record_failure, url, e)
+        return f"Error: {str(e)}", "", execution_time, '\n'.join(debug_info), None, None
+
+    await asyncio.to_thread(light_endpoints.learn_from_page, url, html, debug_info)
+    result = await loop.run_in_executor(
+        parse_executor, content_extractor.extract_from_html, url, html, start_time, debug_info, page_url
+    )
+    title, content, execution_time, debug_text, prev_chapter_url, next_chapter_url = result
+    if content and len(content) > 100:
+        cache.put(url, content_extractor.EXTRACTOR_VERSION, (title, content, prev_chapter_url, next_chapter_url))
+    return result
+
+
+async def _extract_light(url, headers, timeouts, ssl_verification, budget, session, parse_executor,
+                         domain_limiter, start_time, debug_info):
+    """Async counterpart of content_extractor.extract_light"""
+    attempt = await asyncio.to_thread(light_endpoints.plan, url, headers)
+    if attempt is None:
+        return None
+    debug_info.append(attempt.describe())
+    try:
+        attempt_timeouts, deadline = attempt.limits(budget, timeouts)
+        html, page_url = await fetch_page_async(session, attempt.url, attempt.headers, attempt_timeouts,
+                                                ssl_verification, debug_info, domain_limiter,
+                                                watcher=attempt.watcher, content_types=attempt.content_types,
+                                                cache_variant=attempt.cache_variant, deadline=deadline)
+        html = attempt.to_html(html)
+    except Exception as e:
+        await asyncio.to_thread(attempt.fail, str(e), debug_info)
+        return None
+    if not await asyncio.to_thread(attempt.accept_page, html, debug_info):
+        return None
+    result = await asyncio.get_running_loop().run_in_executor(
+        parse_executor, content_extractor.extract_from_html, attempt.url, html, start_time, debug_info, page_url
+    )
+    return await asyncio.to_thread(attempt.accept_result, result, debug_info)
+
+
+if aiohttp is not None:
+    class CachedResolver(aiohttp.abc.AbstractResolver):
+        """aiohttp resolver backed by the shared dns_cache, with recently dead addresses last"""
+
+        async def resolve(self, host, port=0, family=socket.AF_INET):
+            cache = dns_cache.get_dns_cache()
+            infos = cache.order(await asyncio.to_thread(cache.resolve, host, port))
+            return [
+                {
+                    "hostname": host, "host": info[4][0], "port": port,
+                    "family": info[0], "proto": info[2],
+                    "flags": socket.AI_NUMERICHOST | socket.AI_NUMERICSERV,
+                }
+                for info in infos if family == socket.AF_UNSPEC or info[0] == family
+            ]
+
+        async def close(self):
+            pass
+
+
+def _connect_timing_trace():
+    """aiohttp trace hooks reporting new-connection times to the latency tracker"""
+    trace = aiohttp.TraceConfig()
+
+    async def on_request_start(session, context, params):
+        context.host = params.url.host
+
+    async def on_connection_create_start(session, context, params):
+        context.connect_started = time.monotonic()
+
+    async def on_connection_create_end(session, context, params):
+        get_latency_tracker().record_connect(context.host, time.monotonic() - context.connect_started)
+
+    trace.on_request_start.append(on_request_start)
+    trace.on_connection_create_start.append(on_connection_create_start)
+    trace.on_connection_create_end.append(on_connection_create_end)
+    return trace
+
+
+class AsyncExtractionEngine:
+    """
+    Runs extract_content_async on a dedicated event-loop thread.
+    submit() can be called from any thread and returns a
+    concurrent.futures.Future; cancelling it cancels the download.
+    """
+
+    def __init__(self, parse_workers=PARSE_WORKERS, max_connections=MAX_CONNECTIONS):
+        self.max_connections = max_connections
+        self._parse_executor = ThreadPoolExecutor(max_workers=parse_workers, thread_name_prefix="extract-parse")
+        self._loop = asyncio.new_event_loop()
+        self._session = None
+        self._thread = threading.Thread(target=self._run_loop, name="async-extraction", daemon=True)
+        self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def _get_session(self):
+        # Must be called on the loop thread
+        if self._session is None and aiohttp is not None:
+            options = {}
+            if "happy_eyeballs_delay" in inspect.signature(aiohttp.TCPConnector).parameters:
+                options["happy_eyeballs_delay"] = dns_cache.HAPPY_EYEBALLS_DELAY
+            # Lookups are cached by dns_cache (honouring record TTLs), not by aiohttp
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=http_client.DEFAULT_POOL_MAXSIZE,
+                resolver=CachedResolver(),
+                use_dns_cache=False,
+                **options
+            )
+            # Bodies are decoded by http_client.ContentDecoder so br/zstd work and wire sizes can be counted
+            # Cookies live in the shared cookie_store jar, not in aiohttp's own
+            self._session = aiohttp.ClientSession(connector=connector, auto_decompress=False,
+                                                  cookie_jar=aiohttp.DummyCookieJar(),
+                                                  trace_configs=[_connect_timing_trace()])
+        return self._session
+
+
+    async def _extract(self, url, timeout_setting, budget_seconds):
+        return await extract_content_async(
+            url, timeout_setting,
+            session=self._get_session(),
+            parse_executor=self._parse_executor,
+            # Adaptive limiter shared with the synchronous client
+            domain_limiter=http_client.domain_slot(url),
+            budget_seconds=budget_seconds
+        )
+
+    def submit(self, url, timeout_setting=30, budget_seconds=BATCH_BUDGET):
+        """Schedule an extraction and return a concurrent.futures.Future for its result tuple"""
+        return asyncio.run_coroutine_threadsafe(self._extract(url, timeout_setting, budget_seconds), self._loop)
+
+    def extract_many(self, urls, timeout_setting=30, budget_seconds=BATCH_BUDGET):
+        """Extract several URLs concurrently and return their result tuples in order (blocking)"""
+        futures = [self.submit(url, timeout_setting, budget_seconds) for url in urls]
+        return [future.result() for future in futures]
+
+    def close(self):
+        async def shutdown():
+            if self._session is not None:
+                await self._session.close()
+            await http2_transport.close_async_clients()
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result(timeout=10)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._parse_executor.shutdown(wait=False)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_async_engine():
+    """Return the process-wide async extraction engine"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = AsyncExtractionEngine()
+    return _engine
@@ -0,0 +1,167 @@
+"""
+HTTP/1.1 versus HTTP/2 download benchmark.
+Fetches the same page many times concurrently through http_client.fetch_html,
+first over the regular HTTP/1.1 path and then with the HTTP/2 transport, and
+reports the time taken and pages per second for each.
+
+With --serve, a local HTTP/2 test server (hypercorn, self-signed certificate
+made with openssl unless --cert/--key are given) is started first and also
+reports how many TCP connections each run opened.
+
+Usage:
+    python bench_http2.py --serve [--requests 200] [--concurrency 32] [--delay 0.05]
+    python bench_http2.py --url https://example.com/chapter-1 [--requests 50]
+"""
+
+import argparse
+import asyncio
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import http_client
+import http2_transport
+
+HEADERS = {"User-Agent": "Mozilla/5.0 (X11; Linux x86_64) bench_http2", "Accept-Encoding": "gzip, deflate"}
+
+
+class TestServer:
+    """Local hypercorn server answering every GET with the same chapter-sized page"""
+
+    def __init__(self, port, cert, key, page_size, delay):
+        self.port = port
+        self.cert = cert
+        self.key = key
+        self.page = ("<html><head><title>Chapter</title></head><body><div id='chapter-content'>"
+                     + "<p>Lorem ipsum dolor sit amet.</p>" * (page_size // 33)
+                     + "</div></body></html>").encode("utf-8")
+        self.delay = delay
+        self.connections = set()
+        self._lock = threading.Lock()
+
+    async def app(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        with self._lock:
+            self.connections.add(tuple(scope["client"]))
+        await asyncio.sleep(self.delay)
+        await send({"type": "http.response.start", "status": 200, "headers": [
+            (b"content-type", b"text/html; charset=utf-8"),
+            (b"content-length", str(len(self.page)).encode()),
+        ]})
+        await send({"type": "http.response.body", "body": self.page})
+
+    def start(self):
+        from hypercorn.asyncio import serve
+        from hypercorn.config import Config
+
+        config = Config()
+        config.bind = [f"127.0.0.1:{self.port}"]
+        config.certfile = self.cert
+        config.keyfile = self.key
+        config.alpn_protocols = ["h2", "http/1.1"]
+        config.accesslog = None
+        config.errorlog = None
+        ready = threading.Event()
+
+        async def run():
+            loop = asyncio.get_running_loop()
+            loop.call_soon(ready.set)
+            # A shutdown trigger keeps hypercorn from installing signal handlers, which only work in the main thread
+            await serve(self.app, config, shutdown_trigger=asyncio.Event().wait)
+
+        threading.Thread(target=lambda: asyncio.run(run()), daemon=True).start()
+        ready.wait()
+        time.sleep(0.5)
+        return f"https://127.0.0.1:{self.port}/chapter-1"
+
+    def take_connections(self):
+        with self._lock:
+            count = len(self.connections)
+            self.connections.clear()
+        return count
+
+
+def self_signed_certificate(directory):
+    """Create a throwaway certificate for 127.0.0.1 with openssl; returns (cert path, key path)"""
+    cert = Path(directory) / "cert.pem"
+    key = Path(directory) / "key.pem"
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=127.0.0.1", "-keyout", str(key), "-out", str(cert)],
+        check=True, capture_output=True,
+    )
+    return str(cert), str(key)
+
+
+def run(url, requests_count, concurrency, verify):
+    """Fetch url requests_count times with concurrency threads; returns (seconds, failures)"""
+    def fetch(_):
+        try:
+            http_client.fetch_html(url, HEADERS, (10, 30), verify=verify, use_cache=False)
+            return True
+        except Exception as e:
+            print(f"  request failed: {str(e)}")
+            return False
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(fetch, range(requests_count)))
+    return time.monotonic() - started, results.count(False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare page downloads over HTTP/1.1 and HTTP/2")
+    parser.add_argument("--url", help="https page to fetch (not needed with --serve)")
+    parser.add_argument("--serve", action="store_true", help="Start a local HTTP/2 test server")
+    parser.add_argument("--port", type=int, default=8843, help="Port of the test server")
+    parser.add_argument("--cert", help="Certificate for the test server")
+    parser.add_argument("--key", help="Private key for the test server")
+    parser.add_argument("--page-size", type=int, default=60000, help="Size of the test server's page in bytes")
+    parser.add_argument("--delay", type=float, default=0.05, help="Test server response delay in seconds")
+    parser.add_argument("--requests", type=int, default=200, help="Downloads per run")
+    parser.add_argument("--concurrency", type=int, default=32, help="Simultaneous downloads")
+    parser.add_argument("--insecure", action="store_true", help="Skip certificate verification")
+    args = parser.parse_args()
+
+    if not http2_transport.is_available():
+        parser.error('HTTP/2 needs httpx with its h2 extra: pip install "httpx[h2]"')
+
+    server = None
+    url = args.url
+    verify = not args.insecure
+    if args.serve:
+        cert, key = args.cert, args.key
+        if not cert:
+            cert, key = self_signed_certificate(tempfile.mkdtemp())
+        server = TestServer(args.port, cert, key, args.page_size, args.delay)
+        url = server.start()
+        verify = False
+    elif not url:
+        parser.error("either --url or --serve is required")
+
+    # Let the runs use the full concurrency instead of the adaptive per-domain limit
+    http_client.set_domain_limit(0)
+    if not verify:
+        import urllib3
+        urllib3.disable_warnings()
+
+    print(f"{args.requests} downloads of {url}, {args.concurrency} at a time")
+    for label, enabled in (("HTTP/1.1", False), ("HTTP/2", True)):
+        http2_transport.set_http2_enabled(enabled)
+        # One untimed download opens the first connection
+        run(url, 1, 1, verify)
+        if server:
+            server.take_connections()
+        seconds, failures = run(url, args.requests, args.concurrency, verify)
+        line = f"{label:9} {seconds:7.2f}s  {args.requests / seconds:8.1f} pages/s  {failures} failed"
+        if server:
+            line += f"  {server.take_connections()} connections"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
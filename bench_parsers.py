@@ -0,0 +1,110 @@
+"""
+HTML parser backend benchmark.
+Parses saved pages with every installed backend (see parser_backend) and
+reports the parse time and the time of the whole extract_from_html per
+backend, and whether each backend extracts the same text and navigation
+links as html.parser.
+
+Pages are .html files (or directories of them), or the pages stored in the
+HTTP cache (--http-cache), which also know their original URL.
+
+Usage:
+    python bench_parsers.py saved_pages/ [--url https://metruyencv.com/truyen/x/chuong-1] [--repeat 5]
+    python bench_parsers.py --http-cache [.cache/http]
+"""
+
+import argparse
+import json
+import logging
+import statistics
+import time
+from pathlib import Path
+
+import content_extractor
+import parser_backend
+from http_cache import CACHE_DIR
+from http_client import decode_body
+
+
+def load_files(paths, url):
+    pages = []
+    for path in map(Path, paths):
+        files = sorted(path.glob("*.htm*")) if path.is_dir() else [path]
+        for file in files:
+            pages.append((file.name, url, decode_body(file.read_bytes(), "text/html")))
+    return pages
+
+
+def load_http_cache(directory):
+    pages = []
+    for meta_path in sorted(Path(directory).glob("*.json")):
+        body_path = meta_path.with_suffix(".body")
+        if not body_path.exists():
+            continue
+        try:
+            entry = json.loads(meta_path.read_text(encoding="utf-8"))
+        except Exception:
+            continue
+        if "html" not in (entry.get("content_type") or "text/html"):
+            continue
+        pages.append((entry["url"], entry["url"], decode_body(body_path.read_bytes(), entry.get("content_type"))))
+    return pages
+
+
+def timed(function, repeat):
+    """Median duration of repeat calls, and the last result"""
+    durations = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the HTML parser backends on saved pages")
+    parser.add_argument("paths", nargs="*", help="Saved .html files or directories")
+    parser.add_argument("--url", default="https://example.com/chapter-1",
+                        help="URL the saved files are extracted as (selects site-specific rules)")
+    parser.add_argument("--http-cache", nargs="?", const=str(CACHE_DIR), help="Use the pages in the HTTP cache")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per page and backend (the median is reported)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    pages = load_files(args.paths, args.url)
+    if args.http_cache:
+        pages += load_http_cache(args.http_cache)
+    if not pages:
+        parser.error("no pages given")
+
+    backends = parser_backend.available_backends()
+    print(f"{len(pages)} pages, backends: {', '.join(backends)}")
+    totals = {backend: [0.0, 0.0, 0] for backend in backends}
+    for label, url, html in pages:
+        print(f"\n{label} ({len(html) // 1024} KB)")
+        reference = None
+        for backend in reversed(backends):
+            # html.parser runs first so the others can be compared against it
+            parser_backend.set_parser_backend(backend)
+            parse_time, _ = timed(lambda: parser_backend.make_soup(html), args.repeat)
+            extract_time, result = timed(lambda: content_extractor.extract_from_html(url, html), args.repeat)
+            outcome = (result[1], result[4], result[5])
+            if reference is None:
+                reference = outcome
+            same = outcome == reference
+            totals[backend][0] += parse_time
+            totals[backend][1] += extract_time
+            totals[backend][2] += same
+            print(f"  {backend:12} parse {parse_time * 1000:8.1f} ms  extract {extract_time * 1000:8.1f} ms  "
+                  f"{len(result[1]):7} chars  {'same as html.parser' if same else 'DIFFERS from html.parser'}")
+
+    print("\nTotal")
+    for backend in backends:
+        parse_time, extract_time, same = totals[backend]
+        print(f"  {backend:12} parse {parse_time * 1000:8.1f} ms  extract {extract_time * 1000:8.1f} ms  "
+              f"{same}/{len(pages)} pages same as html.parser")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Whole-novel crawler.
+Starts from one chapter URL and follows the next-chapter chain, extracting
+chapters on the async extraction engine so that fetching, parsing and
+cleaning of upcoming chapters overlap. Chapter URLs following the "chuong-N"
+pattern are fetched speculatively ahead of the chain. Progress is checkpointed after every
+chapter so an interrupted crawl resumes where it stopped, and the ordered
+chapters are written to a single text file.
+
+Usage:
+    python chapter_crawler.py <first chapter url> -o novel.txt [--lookahead 8] [--per-domain 8] [--http2]
+"""
+
+import argparse
+import json
+import logging
+import re
+import time
+from pathlib import Path
+
+import http_client
+import http2_transport
+from async_fetch import get_async_engine
+
+logger = logging.getLogger("content_extractor")
+
+CHAPTER_NUMBER_PATTERN = re.compile(r'chuong-(\d+)')
+
+
+def infer_following_urls(url, count):
+    """Guess the URLs of the next `count` chapters from a chuong-N URL"""
+    match = CHAPTER_NUMBER_PATTERN.search(url)
+    if not match:
+        return []
+    current_chapter = int(match.group(1))
+    prefix, suffix = url[:match.start(1)], url[match.end(1):]
+    return [f"{prefix}{current_chapter + offset}{suffix}" for offset in range(1, count + 1)]
+
+
+def load_checkpoint(checkpoint_path):
+    """Read the chapters saved by an earlier run, in order"""
+    chapters = []
+    if not checkpoint_path.exists():
+        return chapters
+    with open(checkpoint_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                chapters.append(json.loads(line))
+            except json.JSONDecodeError:
+                # A crash mid-write can leave a truncated last line - drop it
+                logger.warning(f"Ignoring corrupt checkpoint line in {checkpoint_path}")
+                break
+    return chapters
+
+
+def write_output(chapters, output_path):
+    """Write the ordered chapters to one text file"""
+    with open(output_path, "w", encoding="utf-8") as f:
+        for chapter in chapters:
+            f.write(f"{chapter['title']}\n\n{chapter['content']}\n\n\n")
+
+
+def crawl_novel(start_url, output_path, max_chapters=5000, lookahead=8, per_domain=8,
+                timeout_setting=30, checkpoint_path=None, progress=None):
+    """
+    Crawl a novel starting at start_url and write it to output_path.
+
+    Args:
+        start_url: URL of the first chapter to download
+        output_path: Text file receiving the ordered chapters
+        max_chapters: Stop after this many chapters
+        lookahead: Number of chapters after the current one requested ahead of the
+            chain (chuong-N URLs only); how many are parsed at once is set by
+            the engine's ASYNC_PARSE_WORKERS
+        per_domain: Upper bound for simultaneous downloads from one domain; the
+            actual number adapts to how the site responds (see concurrency_control)
+        timeout_setting: Timeout passed to each extraction
+        checkpoint_path: JSON-lines progress file (defaults to <output>.checkpoint.jsonl)
+        progress: Optional callback(chapter_index, title, url) called per finished chapter
+
+    Returns:
+        Number of chapters written
+    """
+    output_path = Path(output_path)
+    checkpoint_path = Path(checkpoint_path) if checkpoint_path else output_path.with_suffix(".checkpoint.jsonl")
+
+    chapters = load_checkpoint(checkpoint_path)
+    if chapters:
+        next_url = chapters[-1].get("next_url")
+        logger.info(f"Resuming crawl after {len(chapters)} chapters from {checkpoint_path}")
+    else:
+        next_url = start_url
+
+    seen_urls = {chapter["url"] for chapter in chapters}
+    http_client.set_domain_limit(per_domain)
+    pending = {}
+    start_time = time.time()
+
+    engine = get_async_engine()
+
+    def submit(url):
+        if url not in pending and url not in seen_urls:
+            pending[url] = engine.submit(url, timeout_setting)
+
+    with open(checkpoint_path, "a", encoding="utf-8") as checkpoint:
+        try:
+            while next_url and len(chapters) < max_chapters:
+                if next_url in seen_urls:
+                    logger.warning(f"Chapter chain loops back to {next_url}, stopping")
+                    break
+
+                submit(next_url)
+                # Keep the pool busy with the chapters we expect to come next
+                for url in infer_following_urls(next_url, lookahead):
+                    submit(url)
+
+                title, content, execution_time, debug_text, prev_url, following_url = pending.pop(next_url).result()
+                if not content or len(content) <= 100:
+                    logger.info(f"No content at {next_url} ({title}), stopping")
+                    break
+
+                record = {"url": next_url, "title": title, "content": content, "next_url": following_url}
+                checkpoint.write(json.dumps(record, ensure_ascii=False) + "\n")
+                checkpoint.flush()
+                chapters.append(record)
+                seen_urls.add(next_url)
+
+                if progress:
+                    progress(len(chapters), title, next_url)
+                next_url = following_url
+        finally:
+            # Drop speculative work that the chain did not reach
+            for future in pending.values():
+                future.cancel()
+
+    write_output(chapters, output_path)
+    elapsed = time.time() - start_time
+    logger.info(f"Wrote {len(chapters)} chapters to {output_path} in {elapsed:.1f} seconds")
+    return len(chapters)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download a whole novel by following its next-chapter links")
+    parser.add_argument("url", help="URL of the first chapter")
+    parser.add_argument("-o", "--output", default="novel.txt", help="Output text file")
+    parser.add_argument("--max-chapters", type=int, default=5000, help="Stop after this many chapters")
+    parser.add_argument("--lookahead", "--workers", dest="lookahead", type=int, default=8,
+                        help="Chapters requested ahead of the current one (chuong-N URLs only)")
+    parser.add_argument("--per-domain", type=int, default=8,
+                        help="Upper bound for simultaneous downloads per domain (adapts below it)")
+    parser.add_argument("--timeout", type=int, default=30, help="Timeout in seconds per request")
+    parser.add_argument("--http2", action="store_true", help="Use HTTP/2 for https sites (needs httpx[h2])")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.http2:
+        http2_transport.set_http2_enabled(True)
+    count = crawl_novel(
+        args.url, args.output,
+        max_chapters=args.max_chapters,
+        lookahead=args.lookahead,
+        per_domain=args.per_domain,
+        timeout_setting=args.timeout,
+        progress=lambda index, title, url: print(f"[{index}] {title}"),
+    )
+    print(f"Saved {count} chapters to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
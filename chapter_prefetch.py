@@ -0,0 +1,117 @@
+"""
+Background prefetching of adjacent chapters.
+After a chapter is shown, its next/previous chapters are extracted on the
+async extraction engine so that the result cache already holds them when the
+reader clicks "Chương sau" or "Chương trước". Work never runs on the
+Streamlit script thread and can be cancelled when the reader moves elsewhere.
+"""
+
+import logging
+import threading
+
+import content_extractor
+from async_fetch import get_async_engine
+from extraction_cache import get_extraction_cache
+
+logger = logging.getLogger("content_extractor")
+
+
+class PrefetchHandle:
+    """Handle for one batch of prefetch jobs that can be cancelled together"""
+
+    def __init__(self, prefetcher):
+        self._prefetcher = prefetcher
+        self.urls = []
+        self.futures = []
+
+    def cancel(self):
+        """
+        Cancel the jobs of the batch, including downloads already in progress.
+        Jobs another batch also asked for keep running until that one is cancelled too.
+        """
+        self._prefetcher._cancel(self)
+
+    def done(self):
+        return all(future.done() for future in self.futures)
+
+
+class ChapterPrefetcher:
+    """Extracts chapters into the shared result cache in the background"""
+
+    def __init__(self, engine=None):
+        self._engine = engine or get_async_engine()
+        # url -> (future, handles of the batches waiting for it)
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def prefetch(self, urls, timeout_setting=30):
+        """
+        Schedule extraction of the given URLs (None entries are skipped).
+        URLs already cached or already being prefetched are not scheduled again;
+        the batch shares the running job instead.
+        Returns a PrefetchHandle that cancels the batch.
+        """
+        handle = PrefetchHandle(self)
+        cache = get_extraction_cache()
+
+        for url in urls:
+            if not url:
+                continue
+            if cache.get(url, content_extractor.EXTRACTOR_VERSION):
+                continue
+            with self._lock:
+                job = self._in_flight.get(url)
+                if job:
+                    future = job[0]
+                    job[1].add(handle)
+                else:
+                    future = self._engine.submit(url, timeout_setting)
+                    self._in_flight[url] = (future, {handle})
+                handle.urls.append(url)
+                handle.futures.append(future)
+            if not job:
+                # Release the URL whether the job ran, failed or was cancelled
+                future.add_done_callback(lambda f, url=url: self._finished(url, f))
+
+        return handle
+
+    def _cancel(self, handle):
+        """Drop a batch from its jobs and cancel the ones no other batch waits for"""
+        abandoned = []
+        with self._lock:
+            for url, future in zip(handle.urls, handle.futures):
+                job = self._in_flight.get(url)
+                if not job or job[0] is not future:
+                    continue
+                job[1].discard(handle)
+                if not job[1]:
+                    abandoned.append(future)
+        for future in abandoned:
+            future.cancel()
+
+    def _finished(self, url, future):
+        with self._lock:
+            job = self._in_flight.get(url)
+            if job and job[0] is future:
+                del self._in_flight[url]
+        if future.cancelled():
+            return
+        try:
+            title, content, execution_time, debug_text, prev_url, next_url = future.result()
+            logger.info(f"Prefetched {url} in {execution_time:.2f} seconds ({len(content or '')} characters)")
+        except Exception as e:
+            logger.warning(f"Prefetch failed for {url}: {str(e)}")
+
+
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+
+def get_prefetcher():
+    """Return the process-wide chapter prefetcher"""
+    global _prefetcher
+    if _prefetcher is None:
+        with _prefetcher_lock:
+            if _prefetcher is None:
+                _prefetcher = ChapterPrefetcher()
+    return _prefetcher
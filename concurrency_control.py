@@ -0,0 +1,208 @@
+"""
+Adaptive per-domain concurrency (AIMD).
+Every domain gets a DomainLimiter whose limit on simultaneous downloads
+grows additively while responses are healthy (by one slot per full window of
+successful downloads) and is halved when the site pushes back: a 429 or 503
+response or a timeout. A Retry-After on such a response pauses all new
+downloads from the domain until it has passed. Batch crawls thereby settle
+near the highest concurrency each site tolerates, between 1 and the
+configured ceiling, without per-site tuning. Limiters are shared by the
+synchronous client and the async engine.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+import urllib3
+
+from retry_policy import RetryableStatus
+
+logger = logging.getLogger("content_extractor")
+
+# Upper bound for simultaneous downloads from one domain (0 = unlimited)
+DEFAULT_MAX_PER_DOMAIN = int(os.environ.get("HTTP_MAX_PER_DOMAIN", 8))
+# Limit a domain starts with
+AIMD_INITIAL_LIMIT = float(os.environ.get("AIMD_INITIAL_LIMIT", 2))
+# The limit grows by this much once per window of successful downloads
+AIMD_INCREASE = 1.0
+# ... and is multiplied by this on overload
+AIMD_DECREASE = 0.5
+# Failures of one burst (less than this many seconds apart) only cut the limit once
+AIMD_DECREASE_INTERVAL = 1.0
+# Longest pause honoured from a Retry-After header
+MAX_PAUSE_SECONDS = 300
+
+OVERLOAD_STATUSES = (429, 503)
+
+
+def overload_signal(error):
+    """
+    Return (overloaded, retry_after) for the outcome of a download:
+    429/503 responses and timeouts mean the site is overloaded.
+    """
+    if error is None:
+        return False, None
+    if isinstance(error, RetryableStatus):
+        if error.status in OVERLOAD_STATUSES:
+            return True, error.retry_after
+        return False, None
+    if isinstance(error, (requests.exceptions.Timeout, urllib3.exceptions.TimeoutError,
+                          asyncio.TimeoutError, socket.timeout, TimeoutError)):
+        return True, None
+    return False, None
+
+
+class DomainLimiter:
+    """AIMD limit on simultaneous downloads from one domain"""
+
+    def __init__(self, domain, ceiling, initial=AIMD_INITIAL_LIMIT):
+        self.domain = domain
+        self.ceiling = ceiling
+        self.limit = float(max(1, min(initial, ceiling)))
+        self.active = 0
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def _wait_time(self, now):
+        """0 when a download can start now, else how long to wait (None: until a slot is released)"""
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.active < max(1, int(self.limit)):
+            return 0
+        return None
+
+    def try_acquire(self):
+        """Take a slot without waiting; returns False when none is free"""
+        with self._condition:
+            if self._wait_time(time.monotonic()) == 0:
+                self.active += 1
+                return True
+            return False
+
+    def _give_up(self, now, deadline):
+        """Raise when no slot can be had before the deadline"""
+        if deadline is None:
+            return
+        if self.paused_until > deadline:
+            # Lets the retry policy wait out the pause, or give up if it is too long
+            raise RetryableStatus(429, self.paused_until - now)
+        if now >= deadline:
+            raise TimeoutError(f"Timed out waiting for a download slot for {self.domain}")
+
+    def acquire(self, timeout=None):
+        """
+        Take a slot, waiting up to timeout seconds (a (connect, read) pair
+        waits for its read timeout). Raises RetryableStatus when the domain is
+        paused beyond the timeout, TimeoutError when it stays busy.
+        """
+        if isinstance(timeout, tuple):
+            timeout = timeout[-1]
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                wait = self._wait_time(now)
+                if wait == 0:
+                    self.active += 1
+                    return True
+                self._give_up(now, deadline)
+                waits = [w for w in (wait, deadline - now if deadline is not None else None) if w is not None]
+                self._condition.wait(min(waits) if waits else None)
+
+    async def acquire_async(self, timeout=None, poll_interval=0.05):
+        """Coroutine version of acquire() that does not block the event loop while waiting"""
+        if isinstance(timeout, tuple):
+            timeout = timeout[-1]
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while not self.try_acquire():
+            self._give_up(time.monotonic(), deadline)
+            await asyncio.sleep(poll_interval)
+        return True
+
+    def release(self, error=None):
+        """Give the slot back and adjust the limit from the download's outcome (error=None: success)"""
+        overloaded, retry_after = overload_signal(error)
+        with self._condition:
+            self.active -= 1
+            now = time.monotonic()
+            if overloaded:
+                if now - self.last_decrease >= AIMD_DECREASE_INTERVAL:
+                    self.limit = max(1.0, self.limit * AIMD_DECREASE)
+                    self.last_decrease = now
+                    logger.info(f"Concurrency for {self.domain} reduced to {int(self.limit)} after: {str(error)}")
+                if retry_after:
+                    self.paused_until = max(self.paused_until, now + min(retry_after, MAX_PAUSE_SECONDS))
+            elif error is None:
+                # One slot more per window of `limit` successful downloads
+                self.limit = min(float(self.ceiling), self.limit + AIMD_INCREASE / self.limit)
+            self._condition.notify_all()
+
+    def set_ceiling(self, ceiling):
+        with self._condition:
+            self.ceiling = ceiling
+            self.limit = min(self.limit, float(ceiling))
+            self._condition.notify_all()
+
+    def describe(self):
+        with self._condition:
+            return {
+                "domain": self.domain,
+                "limit": int(self.limit),
+                "active": self.active,
+                "paused_for": max(0, round(self.paused_until - time.monotonic(), 1)),
+            }
+
+
+class DomainConcurrency:
+    """Registry of DomainLimiters sharing one ceiling"""
+
+    def __init__(self, ceiling=DEFAULT_MAX_PER_DOMAIN):
+        self.ceiling = ceiling
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, url):
+        """The limiter of a URL's domain, or None when downloads are unlimited"""
+        if not self.ceiling:
+            return None
+        domain = urlparse(url).netloc.lower()
+        with self._lock:
+            limiter = self._limiters.get(domain)
+            if limiter is None:
+                limiter = self._limiters[domain] = DomainLimiter(domain, self.ceiling)
+        return limiter
+
+    def set_ceiling(self, ceiling):
+        """Change the ceiling; limits learned so far are kept (and cut down to it)"""
+        with self._lock:
+            self.ceiling = ceiling
+            limiters = list(self._limiters.values())
+        if ceiling:
+            for limiter in limiters:
+                limiter.set_ceiling(ceiling)
+
+    def snapshot(self):
+        with self._lock:
+            limiters = list(self._limiters.values())
+        return [limiter.describe() for limiter in limiters]
+
+
+_concurrency = None
+_concurrency_lock = threading.Lock()
+
+
+def get_domain_concurrency():
+    """Return the process-wide per-domain concurrency registry"""
+    global _concurrency
+    if _concurrency is None:
+        with _concurrency_lock:
+            if _concurrency is None:
+                _concurrency = DomainConcurrency()
+    return _concurrency
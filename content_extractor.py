@@ -0,0 +1,1443 @@
+"""
+Core content extraction for the Universal Content Extractor.
+Fetching, parsing and cleaning live here, independent of Streamlit, so the
+same extraction can run from the UI script, from background workers and
+from batch tools.
+"""
+
+import re
+import time
+import logging
+from urllib.parse import urlparse
+
+import requests
+
+from http_client import fetch_page, ACCEPT_ENCODING
+from html_stream import watcher_for_url
+from parser_backend import get_parser_backend
+from page_slimming import parse_page
+from link_index import LinkIndex, NEXT_LINK_PATTERNS, PREV_LINK_PATTERNS
+from tree_pruning import prune, BOILERPLATE_RULES, METRUYENCV_UI_RULES
+from dom_stats import DomStats
+from extraction_cache import get_extraction_cache
+from latency_tracker import get_latency_tracker
+from transport_profile import get_transport_profiles
+from retry_policy import RetryBudget, INTERACTIVE_BUDGET
+from single_flight import get_single_flight, shared_result, FOLLOWER_GRACE_SECONDS
+import light_endpoints
+
+logger = logging.getLogger("content_extractor")
+
+# Special function for metruyencv.com
+def extract_metruyencv(url, html, soup, debug_info):
+    """
+    Special extraction method specifically for metruyencv.com
+    """
+    debug_info.append("Using specialized metruyencv.com extractor")
+    title = ""
+    content = ""
+    
+    # Get title
+    title_elem = soup.select_one('h1.txt-primary')
+    if title_elem:
+        title = title_elem.get_text().strip()
+        debug_info.append(f"Found title: {title}")
+    else:
+        # Try alternate title selector
+        title_elem = soup.select_one('title')
+        if title_elem:
+            title = title_elem.get_text().split(' - ')[0].strip()
+            debug_info.append(f"Found title from page title: {title}")
+    
+    # EXTREME FOCUS APPROACH: Identify and extract ONLY the story content
+    
+    # Get the article content area - add more robust selectors for Yugioh novel
+    article = soup.select_one('#article.chapter-content')
+    if not article:
+        article = soup.select_one('.nh-read__content')
+    if not article:
+        article = soup.select_one('.chapter-c')  # Another common container
+    if not article:
+        article = soup.select_one('article.chapter')  # Another possible container
+    
+    # Special handling for Yugioh: Bệnh Nghiện Rồng novel
+    if not article and "yugioh" in url.lower():
+        debug_info.append("Trying specialized selectors for Yugioh novel")
+        article = soup.select_one('main.container')
+        
+        # If we found the main container but need to narrow down to content
+        if article:
+            # Try to find the actual content container within the main container
+            potential_content = article.select('.content, .chapter-content, .chapter, article')
+            if potential_content:
+                largest_text = ""
+                largest_elem = None
+                for elem in potential_content:
+                    text = elem.get_text().strip()
+                    if len(text) > len(largest_text):
+                        largest_text = text
+                        largest_elem = elem
+                
+                if largest_elem:
+                    article = largest_elem
+                    debug_info.append(f"Found content container for Yugioh novel with {len(largest_text)} characters")
+    
+    if not article:
+        debug_info.append("Could not find content container")
+        # More robust fallback - try to get content from main or article elements
+        main_container = soup.select_one('main')
+        if main_container:
+            # Only proceed if we have a main container
+            debug_info.append("Using main container as fallback")
+            # Extract chapter content directly from text
+            raw_text = main_container.get_text(separator='\n', strip=True)
+            
+            # Look for chapter title pattern
+            chapter_title_match = re.search(r'(Chương|Chapter)\s+\d+.*?(?=\n|$)', raw_text)
+            if chapter_title_match:
+                chapter_title = chapter_title_match.group(0).strip()
+                debug_info.append(f"Found chapter title: {chapter_title}")
+                
+                # Extract content after the chapter title
+                content_start_idx = raw_text.find(chapter_title) + len(chapter_title)
+                content_text = raw_text[content_start_idx:].strip()
+                
+                # Split into paragraphs
+                paragraphs = []
+                for line in content_text.split('\n'):
+                    line = line.strip()
+                    if line and len(line) > 20:  # Only meaningful paragraphs
+                        paragraphs.append(line)
+                
+                if paragraphs:
+                    final_content = chapter_title + "\n\n" + "\n\n".join(paragraphs)
+                    debug_info.append(f"Extracted content with fallback method: {len(final_content)} characters")
+                    return title, final_content
+        
+        return title, "Failed to extract content"
+    
+    # Step 1: Directly remove ALL UI elements from the HTML before extraction
+    prune(article, METRUYENCV_UI_RULES)
+    
+    # Step 2: Get clean raw text from the remaining content
+    raw_text = article.get_text(separator='\n', strip=True)
+    
+    # Step 3: ULTRA-DIRECT PATTERN MATCHING to find the actual chapter content
+    # This targets the specific pattern of Yugioh novel chapters but works for other novels too
+    
+    # Look for chapter title pattern
+    chapter_title_match = re.search(r'(Chương|Chapter)\s+\d+.*?(?=\n|$)', raw_text)
+    
+    if chapter_title_match:
+        chapter_title = chapter_title_match.group(0).strip()
+        debug_info.append(f"Found chapter title: {chapter_title}")
+        
+        # Find where the actual content starts (after the chapter title)
+        content_start_idx = raw_text.find(chapter_title) + len(chapter_title)
+        
+        # Find where the chapter content ends (before lock message or navigation)
+        end_markers = [
+            "Vui lòng đăng nhập", 
+            "Chương Bị Khóa",
+            "Chương trước",
+            "Chấm điểm",
+            "Tặng quà", 
+            "Báo cáo",
+            "Đề cử",
+            "Chương sau"
+        ]
+        
+        content_end_idx = len(raw_text)
+        for marker in end_markers:
+            idx = raw_text.find(marker, content_start_idx)
+            if idx > 0:
+                content_end_idx = min(content_end_idx, idx)
+        
+        # Extract just the story content between chapter title and end marker
+        raw_content = raw_text[content_start_idx:content_end_idx].strip()
+        
+        # Step 4: SUPER AGGRESSIVE FILTERING of extracted content
+        
+        # Direct string removal of problematic UI elements
+        ui_strings = [
+            "Cấu hình", "Mục lục", "Đánh dấu", "Cài đặt đọc truyện", "Close", 
+            "Màu nền", "Màu chữ", "Font chữ", "Cỡ chữ", "Chiều cao dòng", "Canh chữ", 
+            "Mặc định", "CấuhìnhMụclụcĐánhdấuCàiđặtđọctruyệnClose",
+            "MàunềnMàuchữFontchữCỡchữChiềucaodòngCanhchữ",
+            "chữđượctrìnhbàytrênmộtcột"
+        ]
+        
+        # Exact matches of concatenated UI blocks
+        exact_ui_blocks = [
+            "Cấu hìnhMục lụcĐánh dấuCài đặt đọc truyệnClose",
+            "CấuhìnhMụclụcĐánhdấuCàiđặtđọctruyệnClose",
+            "Màu nền [ngày]#F8FAFC#f4f4f4#e9ebee#d5d8dc#f4f4e4#f5ebcd#eae4d3#f2f2f2#c2b49b#272729#232323#1e293b",
+            "Màu chữ [ngày]Màu nền [đêm]#F8FAFC#f4f4f4#e9ebee#d5d8dc#f4f4e4#f5ebcd#eae4d3#f2f2f2#c2b49b#272729#232323#1e293bMàu chữ [đêm]",
+            "Font chữAvenir NextBookerlySegoe UILiterataBaskervilleArialCourier NewTahomaPalatino LinotypeGeorgiaVerdanaTimes New RomanSource Sans Pro",
+            "Cỡ chữChiều cao dòngCanh chữCanh tráiCanh đềuCanh giữaCanh phảiMặc định"
+        ]
+        
+        # Step 5: Line-by-line cleaning
+        clean_lines = []
+        is_content_started = False
+        
+        for line in raw_content.split('\n'):
+            line = line.strip()
+            
+            # Skip empty lines
+            if not line:
+                continue
+                
+            # Skip any line containing UI elements (case-insensitive check)
+            should_skip = False
+            for ui_text in ui_strings:
+                if ui_text.lower() in line.lower():
+                    should_skip = True
+                    break
+            
+            # Skip exact UI blocks
+            for ui_block in exact_ui_blocks:
+                if ui_block in line:
+                    should_skip = True
+                    break
+            
+            # Skip lines with hex colors or many special characters
+            if re.search(r'#[A-Fa-f0-9]{3,6}', line) or len(re.findall(r'[#\[\]{}()<>/\\|@]', line)) > 5:
+                should_skip = True
+            
+            # Skip lines that are just UI noise based on content patterns
+            if len(line) < 10 and any(word in line.lower() for word in ["cấu", "hình", "màu", "font", "chữ", "nền", "đóng", "close"]):
+                should_skip = True
+            
+            # Start content only when we find a line with actual content
+            if not is_content_started and len(line) > 30 and not should_skip:
+                is_content_started = True
+            
+            # Only keep lines after we've found actual content
+            if is_content_started and not should_skip:
+                clean_lines.append(line)
+        
+        # Step 6: Combine with proper chapter title
+        if clean_lines:
+            final_content = chapter_title + "\n\n" + "\n\n".join(clean_lines)
+            return title, final_content
+    
+    # Fallback: If we couldn't find a chapter title, try extracting paragraphs directly
+    paragraphs = []
+    
+    # Extract all paragraph elements
+    for p in article.find_all('p'):
+        text = p.get_text().strip()
+        if text and len(text) > 20:  # Only meaningful paragraphs
+            # Skip UI elements
+            if not any(ui in text.lower() for ui in ["cấu hình", "mục lục", "đánh dấu", "cài đặt", "màu nền", "màu chữ"]):
+                paragraphs.append(text)
+    
+    if paragraphs:
+        content = "\n\n".join(paragraphs)
+        return title, content
+    
+    # Final fallback: Just clean the raw text as much as possible
+    raw_text = article.get_text()
+    
+    # Remove all known UI patterns
+    for ui_pattern in [
+        r'Cấu\s*hình.*?Mặc\s*định',
+        r'Màu\s*nền.*?#[A-Fa-f0-9]{3,6}.*?#[A-Fa-f0-9]{3,6}',
+        r'Font\s*chữ.*?Source\s*Sans\s*Pro',
+        r'Vui\s*lòng\s*đăng\s*nhập.*?Chương\s*sau'
+    ]:
+        raw_text = re.sub(ui_pattern, '', raw_text, flags=re.DOTALL | re.IGNORECASE)
+    
+    # Split into lines and clean
+    lines = [line.strip() for line in raw_text.split('\n') if line.strip()]
+    clean_lines = []
+    
+    for line in lines:
+        # Skip short lines with UI indicators
+        if len(line) < 20 and any(ui in line.lower() for ui in ["cấu", "hình", "màu", "font", "chữ"]):
+            continue
+        clean_lines.append(line)
+    
+    if clean_lines:
+        content = "\n\n".join(clean_lines)
+    
+    return title, content
+
+# Modify the deep_clean_content function to be less aggressive
+def deep_clean_content(content, domain=None, is_novel=False, debug_info=None):
+    """
+    Performs cleaning of extracted content to remove noise while preserving actual content.
+    
+    Args:
+        content: The text content to clean
+        domain: The website domain (optional)
+        is_novel: Whether the content is from a novel site
+        debug_info: List to store debug information
+    
+    Returns:
+        Cleaned content with noise removed
+    """
+    if not debug_info:
+        debug_info = []
+    
+    if not content or len(content.strip()) < 100:
+        return content
+        
+    debug_info.append("Performing deep content cleaning")
+    start_length = len(content)
+    
+    # Check if the content has a chapter title pattern (common in novels)
+    # If it does, we need to be more careful with cleaning
+    has_chapter_pattern = re.search(r'(chương|chapter)\s+\d+', content.lower())
+    
+    # Split content into lines for processing
+    lines = content.split('\n')
+    clean_lines = []
+    
+    # Common noise patterns - reduced aggressiveness
+    noise_patterns = [
+        # Color codes
+        r'#[A-Fa-f0-9]{3,6}',
+        # Authentication
+        r'^(đăng\s*nhập|đăng\s*ký|login|register|sign\s*in|sign\s*up)$'
+    ]
+    
+    # UI elements to look for - but only delete if they occur on their own lines
+    standalone_ui_patterns = [
+        r'^cấu\s*hình$', 
+        r'^mục\s*lục$', 
+        r'^đánh\s*dấu$', 
+        r'^cài\s*đặt\s*đọc\s*truyện$', 
+        r'^close$',
+        r'^màu\s*nền$', 
+        r'^màu\s*chữ$', 
+        r'^font\s*chữ$', 
+        r'^cỡ\s*chữ$', 
+        r'^chiều\s*cao\s*dòng$', 
+        r'^canh\s*chữ$',
+        r'^mặc\s*định$'
+    ]
+    
+    # Process each line
+    for i, line in enumerate(lines):
+        original_line = line
+        line = line.strip()
+        
+        # Skip empty lines
+        if not line:
+            continue
+            
+        # Keep chapter headings intact
+        if re.search(r'(chương|chapter)\s+\d+', line.lower()):
+            clean_lines.append(line)
+            continue
+        
+        # Skip very short lines that don't make sense as content
+        if len(line) < 5 and not re.match(r'^["\']+.*[!?.]["\']+$', line):
+            continue
+        
+        # Check against standalone UI patterns - skip only if the entire line matches
+        should_skip = False
+        for pattern in standalone_ui_patterns:
+            if re.match(pattern, line.lower()):
+                should_skip = True
+                break
+                
+        if should_skip:
+            continue
+        
+        # Check against other noise patterns
+        for pattern in noise_patterns:
+            if re.search(pattern, line.lower()):
+                should_skip = True
+                break
+        
+        if should_skip:
+            continue
+            
+        # Check for high symbol density - but only for short lines
+        if len(line) < 30:
+            symbol_count = len(re.findall(r'[#\[\]{}()<>/\\|@$%^&*+=]', line))
+            if symbol_count > len(line) * 0.15:  # Reduced from 0.1 to 0.15
+                continue
+        
+        # This line passed all filters - add it to clean content
+        clean_lines.append(line)
+    
+    # Special handling for novels - keep more content
+    if is_novel or has_chapter_pattern:
+        # If we have a chapter pattern and very few lines, the cleaning was probably too aggressive
+        if has_chapter_pattern and len(clean_lines) < 3 and len(lines) > 10:
+            debug_info.append("Cleaning was too aggressive, reverting to less aggressive filtering")
+            # Try again with minimal filtering
+            clean_lines = []
+            for line in lines:
+                line = line.strip()
+                if not line:
+                    continue
+                    
+                # Only remove exact matches of UI elements
+                if line in ["Cấu hình", "Mục lục", "Đánh dấu", "Cài đặt đọc truyện", "Close", 
+                           "Màu nền", "Màu chữ", "Font chữ", "Cỡ chữ", "Chiều cao dòng", "Canh chữ"]:
+                    continue
+                    
+                # Only remove lines with hexadecimal color codes
+                if re.search(r'#[A-Fa-f0-9]{3,6}', line):
+                    continue
+                    
+                clean_lines.append(line)
+    # Reconstruct the content
+    final_content = '\n\n'.join(clean_lines)
+    
+    # Final cleanup operations
+    # Remove excessive whitespace
+    final_content = re.sub(r'\n{3,}', '\n\n', final_content)
+    final_content = re.sub(r' {2,}', ' ', final_content)
+    
+    # Trim final content
+    final_content = final_content.strip()
+    
+    # Safeguard - if cleaned content is much shorter than original, it might have been too aggressive
+    if len(final_content) < min(300, start_length * 0.3) and start_length > 1000:
+        debug_info.append("Cleaned content too short, reverting to original content")
+        # The cleaning was too aggressive, revert to original but remove only definite UI elements
+        lines = content.split('\n')
+        minimal_clean_lines = []
+        
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+                
+            # Only remove the most obvious UI elements
+            if any(ui in line for ui in ["#F8FAFC", "Màu nền [ngày]", "Màu chữ [ngày]", "Font chữAvenir Next"]):
+                continue
+                
+            minimal_clean_lines.append(line)
+            
+        final_content = '\n\n'.join(minimal_clean_lines)
+    
+    end_length = len(final_content)
+    reduction = start_length - end_length
+    debug_info.append(f"Deep cleaning removed {reduction} characters ({reduction/max(1, start_length)*100:.1f}% reduction)")
+    
+    return final_content
+
+# Also modify the clean_vietnamese_novel function to be less aggressive
+def clean_vietnamese_novel(content, debug_info=None):
+    """
+    Specialized cleaning for Vietnamese novel content with a more balanced approach.
+    
+    Args:
+        content: The text content to clean
+        debug_info: List to store debug information
+    
+    Returns:
+        Cleaned content with Vietnamese-specific noise removed
+    """
+    if not debug_info:
+        debug_info = []
+    
+    if not content or len(content.strip()) < 100:
+        return content
+    
+    debug_info.append("Applying specialized Vietnamese novel cleaning")
+    start_length = len(content)
+    
+    # Check if we already have a good chapter
+    has_chapter_title = re.search(r'(Chương|Chapter)\s+\d+', content, re.IGNORECASE)
+    has_paragraphs = content.count('\n\n') > 3  # Multiple paragraphs indicates probably good content
+    
+    # If the content already looks good, do minimal cleaning
+    if has_chapter_title and has_paragraphs and len(content) > 500:
+        debug_info.append("Content already well-structured, applying minimal cleaning")
+        # Only remove exact matches of UI blocks
+        ui_blocks = [
+            "Cấu hình", "Mục lục", "Đánh dấu", "Cài đặt đọc truyện", "Close",
+            "Màu nền", "Màu chữ", "Font chữ", "Cỡ chữ", "Chiều cao dòng",
+            "Canh chữ", "Mặc định", "CấuhìnhMụclụcĐánhdấuCàiđặtđọctruyệnClose",
+            "MàunềnMàuchữFontchữCỡchữChiềucaodòngCanhchữ"
+        ]
+        
+        # Split by paragraphs to preserve structure
+        paragraphs = content.split('\n\n')
+        clean_paragraphs = []
+        
+        for paragraph in paragraphs:
+            # Skip if it's an exact UI block
+            if paragraph.strip() in ui_blocks:
+                continue
+                
+            # Skip if it has hex color codes
+            if re.search(r'#[A-Fa-f0-9]{3,6}', paragraph):
+                continue
+                
+            clean_paragraphs.append(paragraph)
+            
+        cleaned_content = '\n\n'.join(clean_paragraphs)
+        
+        end_length = len(cleaned_content)
+        reduction = start_length - end_length
+        if reduction > 0:
+            debug_info.append(f"Minimal Vietnamese cleaning removed {reduction} characters ({reduction/max(1, start_length)*100:.1f}% reduction)")
+        
+        return cleaned_content
+    
+    # Vietnamese-specific patterns to remove - reduced aggressiveness
+    vn_noise_patterns = [
+        # Concatenated UI elements (no spaces) - only match exact patterns
+        r'^(cấuhình|mụclục|đánhdấu|càiđặt|đọctruyện|màunền|màuchữ|fontchữ|cỡchữ)$',
+        # Mix of Vietnamese and English UI terms - only match exact patterns
+        r'^(darkmode|lightmode|fontsize|lineheight|textalign)$',
+        # Color codes
+        r'#[A-Fa-f0-9]{3,6}'
+    ]
+    
+    # Common text segments that appear at start/end of chapters
+    vn_chapter_noise = [
+        "Cấu hình", "Mục lục", "Đánh dấu", "Cài đặt đọc truyện", 
+        "Màu nền", "Màu chữ", "Font chữ", "Cỡ chữ", "Chiều cao dòng", 
+        "Canh chữ", "Canh trái", "Canh giữa", "Canh phải", "Canh đều",
+        "Chương trước", "Chương sau", "Chấm điểm", "Đề cử", "Tặng quà", "Báo cáo",
+        "Close", "Mặc định"
+    ]
+    
+    # Process line by line with more specific Vietnamese context
+    lines = content.split('\n')
+    clean_lines = []
+    
+    # First pass: Remove exact noise segments
+    for i, line in enumerate(lines):
+        line = line.strip()
+        if not line:
+            continue
+            
+        # Skip exact matches of known noise
+        should_skip = False
+        for noise in vn_chapter_noise:
+            if line == noise:  # Only exact matches, not substring matches
+                should_skip = True
+                break
+        
+        if should_skip:
+            continue
+            
+        # Check against Vietnamese-specific patterns - only for exact matches or short lines
+        if len(line) < 30:  # Only apply to short lines to avoid filtering real content
+            for pattern in vn_noise_patterns:
+                if re.search(pattern, line.lower().replace(" ", "")):
+                    should_skip = True
+                    break
+        
+        if should_skip:
+            continue
+        
+        # Keep this line
+        clean_lines.append(line)
+    
+    # Second pass: Structure detection - group lines into paragraphs
+    paragraphs = []
+    current_paragraph = []
+    
+    # Try to detect chapter structure
+    chapter_title_pattern = r'(chương|chapter)\s+\d+'
+    has_chapter_structure = any(re.search(chapter_title_pattern, line.lower()) for line in clean_lines)
+    
+    # Process cleaned lines for paragraph structure
+    for i, line in enumerate(clean_lines):
+        # Chapter titles are always separate paragraphs
+        if re.search(chapter_title_pattern, line.lower()):
+            if current_paragraph:
+                paragraphs.append(' '.join(current_paragraph))
+                current_paragraph = []
+            paragraphs.append(line)
+            continue
+            
+        # Group shorter lines that don't end with punctuation
+        if len(line) < 100 and not line.rstrip().endswith(('.', '!', '?', ':', '…', '"', '"', '"')):
+            current_paragraph.append(line)
+        else:
+            # This line ends a paragraph
+            current_paragraph.append(line)
+            paragraphs.append(' '.join(current_paragraph))
+            current_paragraph = []
+    
+    # Add any remaining paragraph
+    if current_paragraph:
+        paragraphs.append(' '.join(current_paragraph))
+    
+    # Join paragraphs with double newlines
+    cleaned_content = '\n\n'.join(paragraphs)
+    
+    # Final formatting cleanup
+    cleaned_content = re.sub(r'\n{3,}', '\n\n', cleaned_content)  # Normalize newlines
+    cleaned_content = re.sub(r' {2,}', ' ', cleaned_content)      # Remove extra spaces
+    
+    # Safeguard - if cleaned content is much shorter than original, it might have been too aggressive
+    if len(cleaned_content) < min(300, start_length * 0.3) and start_length > 1000:
+        debug_info.append("Vietnamese cleaning was too aggressive, reverting to minimal cleaning")
+        # Try again with minimal filtering
+        minimal_clean_content = content
+        
+        # Only remove exact UI blocks
+        for ui_block in vn_chapter_noise:
+            minimal_clean_content = minimal_clean_content.replace(ui_block, '')
+            
+        # Remove color codes
+        minimal_clean_content = re.sub(r'#[A-Fa-f0-9]{3,6}', '', minimal_clean_content)
+        
+        # Clean up formatting
+        minimal_clean_content = re.sub(r'\n{3,}', '\n\n', minimal_clean_content)
+        minimal_clean_content = re.sub(r' {2,}', ' ', minimal_clean_content)
+        minimal_clean_content = minimal_clean_content.strip()
+        
+        cleaned_content = minimal_clean_content
+    
+    end_length = len(cleaned_content)
+    reduction = start_length - end_length
+    if reduction > 0:
+        debug_info.append(f"Vietnamese novel cleaning removed {reduction} characters ({reduction/max(1, start_length)*100:.1f}% reduction)")
+    
+    return cleaned_content
+
+# Version of the extraction and cleaning rules - bump whenever they change so
+# results cached by older rules are no longer served
+EXTRACTOR_VERSION = "2.4"
+
+def build_request_settings(url, timeout_setting, debug_info):
+    """
+    Work out the request headers, (connect, read) timeouts and SSL verification
+    mode to use for a URL.
+    """
+    # Generic browser headers
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        'Accept-Language': 'vi-VN,vi;q=0.9,en-US;q=0.8,en;q=0.7',
+        'Accept-Encoding': ACCEPT_ENCODING,
+    }
+    
+    # Get the page with reasonable timeout
+    timeout_value = timeout_setting  # Default to 30 seconds
+    
+    # Parse URL to get domain first
+    domain = urlparse(url).netloc
+    debug_info.append(f"Domain: {domain}")
+    
+    # Start from whatever worked for this domain last time
+    profiles = get_transport_profiles()
+    profile = profiles.get(url)
+    if profile.get("headers"):
+        headers.update(profile["headers"])
+        debug_info.append("Using request headers remembered for this domain")
+    if profile.get("last_failure"):
+        debug_info.append(f"Last failure on this domain: {profile['last_failure']}")
+    
+    # Double-check that a proper timeout value is set, especially for problematic domains
+    if "truyensextv" in domain or "metruyencv" in domain:
+        if timeout_value < 45:
+            timeout_value = 45  # Force minimum 45 seconds for these problematic domains
+            debug_info.append(f"Forced minimum timeout value of 45s for problematic domain: {domain}")
+    
+    debug_info.append(f"Using timeout: {timeout_value}s")
+    
+    # Special handling for problematic domains with SSL issues
+    ssl_verification = True
+    if "truyensextv" in domain:
+        # Disable SSL verification for problematic sites
+        ssl_verification = False
+        # Import urllib3 here to suppress warnings
+        import urllib3
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        debug_info.append("SSL verification disabled for known problematic site")
+    elif not profiles.ssl_verification(url):
+        ssl_verification = False
+        import urllib3
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        debug_info.append("SSL verification disabled: certificate failed verification on an earlier visit")
+    
+    # Performance optimization - set a longer connect timeout but shorter read timeout
+    # This helps with slow initial connections but prevents hanging on data transfer
+    timeouts = (timeout_value, min(timeout_value, 30))  # (connect_timeout, read_timeout)
+    
+    # Domains with enough history get timeouts from their observed p99 latency instead,
+    # so a dead host fails in seconds; the values above remain the upper bound
+    tracker = get_latency_tracker()
+    learned_timeouts = tracker.suggest_timeouts(url, timeouts)
+    if learned_timeouts != timeouts:
+        debug_info.append(f"Adaptive timeouts from observed latency (configured {timeouts})")
+        timeouts = learned_timeouts
+    timed_out = tracker.consecutive_timeouts(url, "connect") + tracker.consecutive_timeouts(url, "first_byte")
+    if timed_out:
+        debug_info.append(f"{timed_out} recent attempts on this domain timed out")
+    debug_info.append(f"Using connect/read timeouts: {timeouts}")
+    
+    return headers, timeouts, ssl_verification
+
+def extract_content_uncached(url, timeout_setting=30, budget=None):
+    """
+    Fetch a page and run the full extraction pipeline on it, bypassing the result cache.
+    Transient failures are retried within budget (a RetryBudget, interactive by default).
+    """
+    start_time = time.time()
+    debug_info = []
+    if budget is None:
+        budget = RetryBudget()
+    
+    try:
+        debug_info.append(f"Fetching URL: {url}")
+        headers, timeouts, ssl_verification = build_request_settings(url, timeout_setting, debug_info)
+        
+        # Sites with a lighter AMP/mobile/print/JSON version are read from that first
+        result = extract_light(url, headers, timeouts, ssl_verification, budget, start_time, debug_info)
+        if result:
+            return result
+        
+        # Attempt the request with appropriate settings (served from the HTTP cache when possible)
+        try:
+            # For sites with a known chapter container, stop downloading once it has arrived
+            html, page_url = budget.run(
+                lambda attempt_timeouts: fetch_page(url, headers, attempt_timeouts, verify=ssl_verification,
+                                                    debug_info=debug_info, watcher=watcher_for_url(url),
+                                                    deadline=budget.deadline),
+                timeouts, debug_info
+            )
+            get_transport_profiles().record_success(url, ssl_verify=True if ssl_verification else None,
+                                                    headers=headers)
+            
+        except requests.exceptions.SSLError:
+            # If we get an SSL error, retry without verification
+            debug_info.append("SSL Error occurred. Retrying without SSL verification.")
+            import urllib3
+            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+            
+            html, page_url = budget.run(
+                lambda attempt_timeouts: fetch_page(url, headers, attempt_timeouts, verify=False,
+                                                    debug_info=debug_info, watcher=watcher_for_url(url),
+                                                    deadline=budget.deadline),
+                timeouts, debug_info
+            )
+            
+            debug_info.append("Successfully retrieved content with SSL verification disabled")
+            # Later requests to this domain skip the failing verified handshake
+            get_transport_profiles().record_success(url, ssl_verify=False, headers=headers)
+    except Exception as e:
+        execution_time = time.time() - start_time
+        debug_info.append(f"ERROR: {str(e)}")
+        get_transport_profiles().record_failure(url, e)
+        debug_text = '\n'.join(debug_info)
+        return f"Error: {str(e)}", "", execution_time, debug_text, None, None
+    
+    light_endpoints.learn_from_page(url, html, debug_info)
+    return extract_from_html(url, html, start_time, debug_info, page_url)
+
+def extract_light(url, headers, timeouts, ssl_verification, budget, start_time, debug_info):
+    """
+    Fetch and extract a chapter from its domain's lighter endpoint (see light_endpoints).
+    Makes a single attempt; returns None when the full page has to be fetched instead.
+    """
+    attempt = light_endpoints.plan(url, headers)
+    if attempt is None:
+        return None
+    debug_info.append(attempt.describe())
+    try:
+        attempt_timeouts, deadline = attempt.limits(budget, timeouts)
+        html, page_url = fetch_page(attempt.url, attempt.headers, attempt_timeouts, verify=ssl_verification,
+                                    debug_info=debug_info, watcher=attempt.watcher,
+                                    content_types=attempt.content_types, cache_variant=attempt.cache_variant,
+                                    deadline=deadline)
+        html = attempt.to_html(html)
+    except Exception as e:
+        attempt.fail(str(e), debug_info)
+        return None
+    if not attempt.accept_page(html, debug_info):
+        return None
+    return attempt.accept_result(extract_from_html(attempt.url, html, start_time, debug_info, page_url), debug_info)
+
+# Enhanced Universal Content Extractor - Works on any website
+def extract_from_html(url, html, start_time=None, debug_info=None, page_url=None):
+    """
+    Parse and clean an already fetched page.
+    page_url is the URL it was finally served from after redirects (default: url);
+    relative links are resolved against it.
+    
+    Returns:
+        (title, content, execution_time, debug_text, prev_chapter_url, next_chapter_url)
+    """
+    if start_time is None:
+        start_time = time.time()
+    if debug_info is None:
+        debug_info = []
+    if page_url is None:
+        page_url = url
+    next_chapter_url = None
+    prev_chapter_url = None
+    
+    try:
+        domain = urlparse(url).netloc
+        
+        # Extract title for reference
+        title_match = re.search(r'<title>(.*?)</title>', html, re.IGNORECASE)
+        title = title_match.group(1).split(' - ')[0].strip() if title_match else "Extracted Content"
+        debug_info.append(f"Title: {title}")
+        
+        # Parse HTML with the fastest installed backend (see parser_backend), without
+        # the scripts, styles and other markup that is never extracted (see page_slimming)
+        parse_started = time.time()
+        soup = parse_page(url, html, debug_info)
+        debug_info.append(f"Parsed with {get_parser_backend()} in {time.time() - parse_started:.3f} seconds")
+        
+        # Extract navigation links (next/previous chapter)
+        # This needs to happen before we remove elements from the soup
+        debug_info.append("Looking for chapter navigation links")
+        
+        # Every link of the page, with its text and absolute URL, for all the strategies below
+        links = LinkIndex(soup, page_url)
+        debug_info.append(f"Indexed {len(links)} links")
+        
+        # Special handling for metruyencv.com - they have specific navigation patterns
+        if 'metruyencv.com' in domain:
+            debug_info.append("Using metruyencv.com specialized navigation detection")
+            
+            # For metruyencv we need a different approach - they use specific classes and patterns
+            # First try the chapter-nav links
+            for link in links.inside(['chapter-nav', 'chapter-header', 'chapter-actions', 'btn-chap']):
+                try:
+                    # Check text content for navigation clues
+                    if any(term in link.text for term in ['chương sau', 'tiếp', 'tiếp theo', 'next']):
+                        if link.url:
+                            next_chapter_url = link.url
+                            debug_info.append(f"Found next chapter URL (metruyencv): {next_chapter_url}")
+                    elif any(term in link.text for term in ['chương trước', 'trước', 'previous', 'prev']):
+                        if link.url:
+                            prev_chapter_url = link.url
+                            debug_info.append(f"Found previous chapter URL (metruyencv): {prev_chapter_url}")
+                except Exception as e:
+                    debug_info.append(f"Error processing navigation link: {str(e)}")
+            # If we didn't find navigation using the above approach, try secondary approach
+            if not next_chapter_url or not prev_chapter_url:
+                # Look for links with icon classes typically used for navigation
+                for link in links.with_class(['fa-arrow-left', 'fa-arrow-right', 'fa-angle-left', 'fa-angle-right', 'prev-chap', 'next-chap']):
+                    try:
+                        if not link.url:
+                            continue
+                            
+                        if any(cls in ['fa-arrow-right', 'fa-angle-right', 'next-chap'] for cls in link.classes):
+                            next_chapter_url = link.url
+                            debug_info.append(f"Found next chapter URL from icon (metruyencv): {next_chapter_url}")
+                        elif any(cls in ['fa-arrow-left', 'fa-angle-left', 'prev-chap'] for cls in link.classes):
+                            prev_chapter_url = link.url
+                            debug_info.append(f"Found previous chapter URL from icon (metruyencv): {prev_chapter_url}")
+                    except Exception as e:
+                        debug_info.append(f"Error processing icon link: {str(e)}")
+            
+            # Third approach: Look at the link texts for navigation patterns
+            if not next_chapter_url:
+                # Match on Vietnamese navigation terms
+                link = links.first_with_text(['chương sau', 'chương tiếp', 'tiếp theo'])
+                if link:
+                    next_chapter_url = link.url
+                    debug_info.append(f"Found next chapter URL from text (metruyencv): {next_chapter_url}")
+            
+            if not prev_chapter_url:
+                link = links.first_with_text(['chương trước', 'quay lại'])
+                if link:
+                    prev_chapter_url = link.url
+                    debug_info.append(f"Found previous chapter URL from text (metruyencv): {prev_chapter_url}")
+            
+            # Fourth approach: Try to infer navigation from the current chapter number in the URL
+            if (not next_chapter_url or not prev_chapter_url) and 'chuong-' in page_url:
+                try:
+                    # Extract the current chapter number from the URL
+                    chapter_match = re.search(r'chuong-(\d+)', page_url)
+                    if chapter_match:
+                        current_chapter = int(chapter_match.group(1))
+                        debug_info.append(f"Current chapter number: {current_chapter}")
+                        
+                        # Construct URLs for adjacent chapters
+                        base_path = page_url[:page_url.find(f"chuong-{current_chapter}")]
+                        
+                        if not prev_chapter_url and current_chapter > 1:
+                            prev_chapter_url = f"{base_path}chuong-{current_chapter - 1}"
+                            debug_info.append(f"Inferred previous chapter URL: {prev_chapter_url}")
+                        
+                        if not next_chapter_url:
+                            next_chapter_url = f"{base_path}chuong-{current_chapter + 1}"
+                            debug_info.append(f"Inferred next chapter URL: {next_chapter_url}")
+                except Exception as e:
+                    debug_info.append(f"Error inferring chapter URLs: {str(e)}")
+        
+        # Common patterns for next/prev chapter links (classes, rel, ids; see link_index)
+        if not next_chapter_url:
+            # Try to find navigation links using common patterns
+            for pattern in NEXT_LINK_PATTERNS:
+                link = links.first(**pattern)
+                if link and link.url:
+                    next_chapter_url = link.url
+                    debug_info.append(f"Found next chapter URL: {next_chapter_url}")
+                    break
+            
+            # Try to find by text content
+            if not next_chapter_url:
+                link = links.first_with_text(['next chapter', 'chương sau', 'chap sau', 'tiếp', 'next'])
+                if link:
+                    next_chapter_url = link.url
+                    debug_info.append(f"Found next chapter URL by text: {next_chapter_url}")
+        
+        if not prev_chapter_url:
+            # Try to find navigation links using common patterns
+            for pattern in PREV_LINK_PATTERNS:
+                link = links.first(**pattern)
+                if link and link.url:
+                    prev_chapter_url = link.url
+                    debug_info.append(f"Found previous chapter URL: {prev_chapter_url}")
+                    break
+            
+            # Try to find by text content
+            if not prev_chapter_url:
+                link = links.first_with_text(['previous chapter', 'chương trước', 'chap trước', 'trước', 'previous', 'prev'])
+                if link:
+                    prev_chapter_url = link.url
+                    debug_info.append(f"Found previous chapter URL by text: {prev_chapter_url}")
+        
+        # Check for specialized extractors
+        if 'metruyencv.com' in domain:
+            title, content = extract_metruyencv(url, html, soup, debug_info)
+            if content and len(content) > 100:
+                # Apply deep cleaning to the content
+                content = deep_clean_content(content, domain, True, debug_info)
+                # Apply Vietnamese-specific novel cleaning
+                content = clean_vietnamese_novel(content, debug_info)
+                
+                execution_time = time.time() - start_time
+                debug_info.append(f"Extraction completed in {execution_time:.2f} seconds")
+                debug_text = '\n'.join(debug_info)
+                return title, content, execution_time, debug_text, prev_chapter_url, next_chapter_url
+
+        # Remove elements that are definitely not content (scripts, navigation, header, footer, ads, comments)
+        removed = prune(soup, BOILERPLATE_RULES)
+        debug_info.append(f"Pruned {removed} boilerplate elements")
+        
+        # STEP 1: SPECIALIZED HANDLING FOR COMMON SITES
+        
+        # Check if we're dealing with a novel site or blog - with error handling
+        is_novel_site = False
+        is_blog = False
+        is_news_site = False
+        
+        # Safely check for novel site
+        try:
+            novel_domains = ['wuxiaworld.com', 'royalroad.com', 'novelupdates.com', 'webnovel.com', 'metruyencv.com', 'truyenfull.vn']
+            is_novel_site = any(nd in domain for nd in novel_domains)
+        except Exception as e:
+            debug_info.append(f"Error during novel site check: {str(e)}")
+        
+        # Text, markup and paragraph statistics of every element, computed in one pass (see dom_stats)
+        stats = DomStats(soup)
+        
+        # Safely check for blog
+        try:
+            is_blog = len(stats.find_all(['article'])) > 0
+        except Exception as e:
+            debug_info.append(f"Error during blog check: {str(e)}")
+        
+        # Safely check for news site
+        try:
+            news_domains = ['news.', 'cnn.', 'bbc.', 'nytimes.', 'theguardian.', 'reuters.']
+            is_news_site = any(nd in domain for nd in news_domains)
+        except Exception as e:
+            debug_info.append(f"Error during news site check: {str(e)}")
+        
+        # Special case for metruyencv.com
+        if 'metruyencv.com' in domain:
+            is_novel_site = True
+            debug_info.append("Detected metruyencv.com - using specialized novel extraction")
+            
+        debug_info.append(f"Site type: {'Novel' if is_novel_site else 'Blog' if is_blog else 'News' if is_news_site else 'General'}")
+        
+        # Store all potential content blocks
+        content_blocks = []
+        
+        def score_block(node, text_length, selector, strip):
+            """Candidate block scored by text length, text-to-HTML ratio and paragraph density"""
+            # Calculate text-to-HTML ratio (higher = more likely to be content)
+            ratio = text_length / node.markup_length if node.markup_length else 0
+            
+            # Check the density of paragraph tags
+            p_density = node.p_count / max(1, text_length / 500)  # number of <p> tags per 500 chars
+            
+            # Higher score for elements with good paragraph structure
+            p_score = min(2.0, p_density * 0.5)  # Cap at doubling the score
+            
+            # Calculate final score, weighting for different site types
+            if is_novel_site:
+                # Novel sites often have less HTML structure but more plain text
+                final_score = text_length * ratio * 1.5
+            else:
+                # Regular sites should have good paragraph structure
+                final_score = text_length * ratio * (1.0 + p_score)
+            
+            return {
+                'node': node,
+                'length': text_length,
+                'ratio': ratio,
+                'score': final_score,
+                'selector': selector,
+                'strip': strip
+            }
+        
+        # Method 1: Look for common content containers
+        selectors = []
+        
+        # Add specialized selectors based on site type
+        if is_novel_site:
+            selectors.extend(['.chapter-content', '.chapter-inner', '.chapter', '#chapter', '.chapter-text', '.reading-content', '#novel-content', '.novel-content'])
+        
+        if is_blog or is_news_site:
+            selectors.extend(['.post-content', '.entry-content', '.article-content', '.article__content', '.article-body', '.story-body', '.story-content'])
+        
+        # Always include these generic selectors
+        selectors.extend(['article', 'main', '[role="main"]', '.content', '#content', '.post', '.article', '.entry', '.page-content', '.post-content', '.story'])
+        
+        # Check if specific domain patterns are present
+        if 'metruyencv.com' in domain or 'truyenfull.vn' in domain:
+            # Add specific selectors for Vietnamese novel sites
+            selectors.insert(0, '#article.chapter-content')
+            selectors.insert(0, '.nh-read__content')
+        
+        debug_info.append(f"Trying selectors: {selectors[:5]}...")
+        
+        # Find elements matching our selectors
+        for selector in selectors:
+            try:
+                elements = soup.select(selector)
+                debug_info.append(f"Selector {selector}: found {len(elements)} elements")
+                
+                for element in elements:
+                    node = stats.get(element)
+                    # Skip if too small or empty
+                    if node is None or node.stripped_length < 200:
+                        continue
+                    content_blocks.append(score_block(node, node.text_length, selector, False))
+            except Exception as e:
+                debug_info.append(f"Error processing selector {selector}: {str(e)}")
+        
+        # Method 2: Find divs with substantial text
+        if not content_blocks:
+            debug_info.append("No content from selectors, searching divs with substantial text")
+            try:
+                for node in stats.find_all(['div', 'section']):
+                    if node.stripped_length > 300:  # Only consider substantial text blocks
+                        content_blocks.append(score_block(node, node.stripped_length, 'div-text', True))
+            except Exception as e:
+                debug_info.append(f"Error during div search: {str(e)}")
+        
+        # Method 3: Find element with most paragraph tags
+        if not content_blocks:
+            try:
+                debug_info.append("Searching for element with most paragraph tags")
+                max_paragraphs = 0
+                best_node = None
+                
+                for node in stats.find_all(['div', 'article', 'section']):
+                    # Check if paragraphs contain meaningful text
+                    if node.p_count > max_paragraphs and node.paragraph_text_length > 200:
+                        max_paragraphs = node.p_count
+                        best_node = node
+                
+                if best_node:
+                    text_length = best_node.stripped_length
+                    ratio = text_length / best_node.markup_length if best_node.markup_length else 0
+                    content_blocks.append({
+                        'node': best_node,
+                        'length': text_length,
+                        'ratio': ratio,
+                        'score': text_length * ratio,
+                        'selector': 'max-paragraphs',
+                        'strip': True
+                    })
+            except Exception as e:
+                debug_info.append(f"Error during paragraph search: {str(e)}")
+        
+        # Method 4: Last resort - look for largest text block
+        if not content_blocks:
+            try:
+                debug_info.append("Looking for largest text block as last resort")
+                largest_node = None
+                for node in stats.find_all(['div', 'article', 'section', 'main']):
+                    if largest_node is None or node.stripped_length > largest_node.stripped_length:
+                        largest_node = node
+                
+                if largest_node and largest_node.stripped_length > 200:
+                    text_length = largest_node.stripped_length
+                    ratio = text_length / largest_node.markup_length if largest_node.markup_length else 0
+                    content_blocks.append({
+                        'node': largest_node,
+                        'length': text_length,
+                        'ratio': ratio,
+                        'score': text_length * ratio,
+                        'selector': 'largest-text',
+                        'strip': True
+                    })
+            except Exception as e:
+                debug_info.append(f"Error during largest text search: {str(e)}")
+        
+        # STEP 2: SELECT BEST CONTENT BLOCK
+        
+        content_text = ""
+        if content_blocks:
+            # Sort by score
+            content_blocks.sort(key=lambda x: x['score'], reverse=True)
+            
+            # Get top 3 blocks for debugging
+            top_blocks = content_blocks[:min(3, len(content_blocks))]
+            debug_info.append(f"Top content blocks:")
+            for i, block in enumerate(top_blocks):
+                debug_info.append(f"{i+1}. Score: {block['score']:.2f}, Length: {block['length']}, Ratio: {block['ratio']:.2f}, Links: {block['node'].link_density:.2f}, Selector: {block['selector']}")
+            
+            # Get the highest scoring content - the only block whose text is needed
+            best_block = content_blocks[0]
+            content_text = best_block['node'].element.get_text()
+            if best_block['strip']:
+                content_text = content_text.strip()
+            debug_info.append(f"Selected content with score {best_block['score']:.2f} and length {len(content_text)}")
+        else:
+            # As a last resort, get the whole body text
+            try:
+                body = soup.find('body')
+                if body:
+                    content_text = body.get_text()
+                    debug_info.append("No content blocks found, using body text")
+            except Exception as e:
+                debug_info.append(f"Error getting body text: {str(e)}")
+                content_text = ""
+        
+        # STEP 3: ENHANCED CONTENT CLEANING
+        
+        # Split into lines for cleaning
+        lines = content_text.split('\n')
+        clean_lines = []
+        
+        # Content analysis metrics
+        if not lines or not any(line.strip() for line in lines):
+            avg_line_length = 0
+            max_line_length = 0
+        else:
+            try:
+                avg_line_length = sum(len(line.strip()) for line in lines if line.strip()) / max(1, len([line for line in lines if line.strip()]))
+                max_line_length = max((len(line.strip()) for line in lines if line.strip()), default=0)
+            except Exception as e:
+                debug_info.append(f"Error calculating line metrics: {str(e)}")
+                avg_line_length = 0
+                max_line_length = 0
+        
+        debug_info.append(f"Average line length: {avg_line_length:.2f}, Max line length: {max_line_length}")
+        
+        # Count lines before cleaning
+        original_line_count = len([line for line in lines if line.strip()])
+        debug_info.append(f"Original line count: {original_line_count}")
+        
+        # Detect common chapter patterns for novel sites
+        chapter_pattern = None
+        if is_novel_site:
+            try:
+                # Look for chapter title patterns
+                chapter_matches = []
+                for line in lines:
+                    if line.strip():
+                        match1 = re.search(r'chapter\s+\d+', line.lower())
+                        if match1:
+                            chapter_matches.append(match1)
+                        match2 = re.search(r'chương\s+\d+', line.lower())
+                        if match2:
+                            chapter_matches.append(match2)
+                
+                if chapter_matches:
+                    debug_info.append(f"Detected novel chapter format")
+                    # Format might be novel chapters
+                    chapter_pattern = r'(chapter|chương)\s+\d+'
+            except Exception as e:
+                debug_info.append(f"Error detecting chapter pattern: {str(e)}")
+        
+        # Process each line with error handling
+        for i, line in enumerate(lines):
+            try:
+                line = line.strip()
+                if not line:
+                    continue
+                
+                # Keep chapter headings in novels
+                if chapter_pattern and re.search(chapter_pattern, line.lower()):
+                    clean_lines.append(line)
+                    continue
+                
+                # Skip very short lines that look like UI elements
+                if len(line) < 5 and not re.match(r'^[A-Z]+!$|^[!?\.]+$', line):
+                    continue
+                
+                # Additional checks for novel sites - preserve short sound effects
+                if is_novel_site and re.match(r'^["\']*[A-Z][a-z]*[!\?\.]+["\']*$', line):
+                    clean_lines.append(line)
+                    continue
+                    
+                # Skip lines with high special character density
+                special_char_ratio = len(re.findall(r'[#\[\]{}()<>/\\|@]', line)) / (len(line) + 0.1)
+                if special_char_ratio > 0.1:  # More than 10% special chars
+                    continue
+                
+                # Skip lines with many non-word characters (likely UI)
+                word_char_ratio = len(re.findall(r'\w', line)) / (len(line) + 0.1)
+                if word_char_ratio < 0.5 and len(line) < 20:  # Less than 50% word chars and short
+                    continue
+                    
+                # Skip lines that look like navigation/UI
+                if re.match(r'^([<>«»]|next|prev|previous|forward|back|home|menu|login|search|sign in)$', line.lower()):
+                    continue
+                    
+                # Calculate how much this line differs from average length
+                if avg_line_length > 0:
+                    length_difference = abs(len(line) - avg_line_length) / max(1, avg_line_length)
+                    
+                    # Short lines surrounded by much longer lines might be headings or UI elements
+                    if i > 0 and i < len(lines) - 1 and len(line) < 20 and length_difference > 0.7:
+                        # Check if next and previous lines are much longer (suggesting this is a heading)
+                        prev_line = lines[i-1].strip() if i > 0 else ""
+                        next_line = lines[i+1].strip() if i < len(lines) - 1 else ""
+                        
+                        if len(prev_line) > 50 and len(next_line) > 50:
+                            # This could be a heading - we'll keep it
+                            clean_lines.append(line)
+                            continue
+                            
+                        # Otherwise it might be UI - but only skip if it's very short
+                        if len(line) < 10:
+                            continue
+                
+                # This line passed all filters - add it to clean content
+                clean_lines.append(line)
+            except Exception as e:
+                debug_info.append(f"Error processing line: {str(e)}")
+                # Add the line anyway if we encounter an error
+                if line and len(line.strip()) > 20:
+                    clean_lines.append(line.strip())
+        
+        # Count lines after cleaning
+        clean_line_count = len(clean_lines)
+        debug_info.append(f"Clean line count: {clean_line_count}")
+        debug_info.append(f"Removed {original_line_count - clean_line_count} lines")
+        
+        # If no clean lines, use a simple approach
+        if not clean_lines:
+            debug_info.append("No lines passed filtering, using simple extraction")
+            clean_lines = [line.strip() for line in content_text.split('\n') if len(line.strip()) > 20]
+        
+        # STEP 4: IMPROVED PARAGRAPH FORMATION
+        
+        paragraphs = []
+        current_paragraph = []
+        
+        # Detect if content has a lot of dialogue (affects paragraph formation)
+        dialogue_pattern = r'"[^"]+"|\'[^\']+\''
+        dialogue_count = 0
+        
+        try:
+            dialogue_matches = []
+            for line in clean_lines:
+                match = re.search(dialogue_pattern, line)
+                if match:
+                    dialogue_matches.append(match)
+            dialogue_count = len(dialogue_matches)
+            is_dialogue_heavy = dialogue_count > len(clean_lines) * 0.3
+        except Exception as e:
+            debug_info.append(f"Error during dialogue detection: {str(e)}")
+            is_dialogue_heavy = False
+        
+        debug_info.append(f"Dialogue heavy: {is_dialogue_heavy} ({dialogue_count}/{len(clean_lines)} lines with dialogue)")
+        
+        # Special handling for novels
+        if is_novel_site:
+            # Novel formatting often uses shorter paragraphs
+            paragraph_threshold = 15
+        else:
+            # Regular content can have longer paragraphs
+            paragraph_threshold = 25
+        
+        # If we have very few lines, don't try to form paragraphs
+        if len(clean_lines) <= 3:
+            paragraphs = clean_lines
+        else:
+            try:
+                for line in clean_lines:
+                    # Skip empty lines
+                    if not line.strip():
+                        continue
+                        
+                    # Chapter headings are always standalone
+                    if chapter_pattern and re.search(chapter_pattern, line.lower()):
+                        if current_paragraph:
+                            paragraphs.append(' '.join(current_paragraph))
+                            current_paragraph = []
+                        paragraphs.append(line)
+                        continue
+                        
+                    # Very short lines are likely standalone elements (headings, exclamations, etc.)
+                    if len(line) < paragraph_threshold:
+                        if current_paragraph:
+                            paragraphs.append(' '.join(current_paragraph))
+                            current_paragraph = []
+                        paragraphs.append(line)
+                        continue
+                    
+                    # Lines with dialogue in dialogue-heavy content might be standalone
+                    if is_dialogue_heavy and re.search(dialogue_pattern, line) and len(line) < 100:
+                        if current_paragraph:
+                            paragraphs.append(' '.join(current_paragraph))
+                            current_paragraph = []
+                        paragraphs.append(line)
+                        continue
+                        
+                    # Lines ending with sentence-ending punctuation might end paragraphs
+                    if line.endswith(('.', '!', '?')):
+                        current_paragraph.append(line)
+                        paragraphs.append(' '.join(current_paragraph))
+                        current_paragraph = []
+                    else:
+                        # Otherwise, add to current paragraph
+                        current_paragraph.append(line)
+            except Exception as e:
+                debug_info.append(f"Error during paragraph formation: {str(e)}")
+                # If paragraph formation fails, just use the clean lines as paragraphs
+                paragraphs = clean_lines
+        
+        # Add any remaining paragraph
+        if current_paragraph:
+            paragraphs.append(' '.join(current_paragraph))
+        
+        # Join paragraphs with double newlines
+        content = '\n\n'.join(paragraphs)
+        
+        # FINAL CLEANUP
+        
+        # Remove extra spaces
+        content = re.sub(r' +', ' ', content)
+        
+        # Fix excessive newlines
+        content = re.sub(r'\n{3,}', '\n\n', content)
+        
+        # Final whitespace trim
+        content = content.strip()
+        
+        # Check if extracted content is too short - might be error
+        if len(content) < 300 and original_line_count > 50:
+            debug_info.append("WARNING: Extracted content is very short compared to original")
+            
+            # As a fallback, try a simpler approach with less aggressive filtering
+            try:
+                simple_lines = []
+                for line in content_text.split('\n'):
+                    line = line.strip()
+                    if len(line) > 10:  # Keep any line with reasonable length
+                        simple_lines.append(line)
+                
+                # Only use this fallback if it gives substantially more content
+                if len(simple_lines) > 2 * len(paragraphs):
+                    debug_info.append("Using simple fallback extraction")
+                    content = '\n\n'.join(simple_lines)
+            except Exception as e:
+                debug_info.append(f"Error during fallback extraction: {str(e)}")
+        
+        # Final check - if content is still empty, try direct HTML extraction
+        if not content or len(content.strip()) < 100:
+            try:
+                debug_info.append("Content too short, trying direct HTML extraction")
+                # For metruyencv.com, try to find the article content directly
+                if 'metruyencv.com' in domain:
+                    article_text = ""
+                    article = soup.select_one('#article')
+                    if article:
+                        article_text = article.get_text()
+                    
+                    if len(article_text) > 100:
+                        content = article_text
+                        debug_info.append("Extracted content directly from #article")
+            except Exception as e:
+                debug_info.append(f"Error during direct HTML extraction: {str(e)}")
+        
+        # Final deep cleaning to remove any remaining noise
+        content = deep_clean_content(content, domain, is_novel_site, debug_info)
+        
+        # Apply Vietnamese novel cleaning for Vietnamese domains
+        vietnamese_domains = ['metruyencv.com', 'truyenfull.vn', 'truyenyy.com', 'truyencv.com', 'truyenki.com']
+        if any(vn_domain in domain for vn_domain in vietnamese_domains):
+            content = clean_vietnamese_novel(content, debug_info)
+        
+        execution_time = time.time() - start_time
+        debug_info.append(f"Extraction completed in {execution_time:.2f} seconds")
+        
+        # Compile debug information
+        debug_text = '\n'.join(debug_info)
+        
+        # Empty content check
+        if not content or len(content.strip()) < 100:
+            return "No content found", "No content could be extracted from this URL.", execution_time, debug_text, None, None
+            
+        return title, content, execution_time, debug_text, prev_chapter_url, next_chapter_url
+
+    except Exception as e:
+        execution_time = time.time() - start_time
+        debug_info.append(f"ERROR: {str(e)}")
+        debug_text = '\n'.join(debug_info)
+        return f"Error: {str(e)}", "", execution_time, debug_text, None, None
+
+def cached_result(url, start_time):
+    """The extraction result for url from the result cache, or None"""
+    cached = get_extraction_cache().get(url, EXTRACTOR_VERSION)
+    if not cached:
+        return None
+    title, content, prev_chapter_url, next_chapter_url = cached
+    execution_time = time.time() - start_time
+    debug_text = f"Served from extraction cache (version {EXTRACTOR_VERSION}) in {execution_time:.3f} seconds"
+    return title, content, execution_time, debug_text, prev_chapter_url, next_chapter_url
+
+def extract_content(url, timeout_setting=30, budget=None):
+    """
+    Extract content through the process-wide result cache.
+    Results are shared between all sessions reading the same chapter; only
+    successful extractions are cached, and concurrent calls for a chapter that
+    is being extracted wait for that extraction (see single_flight).
+    budget defaults to the interactive RetryBudget.
+    """
+    start_time = time.time()
+    cache = get_extraction_cache()
+    
+    cached = cached_result(url, start_time)
+    if cached:
+        return cached
+    
+    # Concurrent requests for the same chapter share one extraction
+    flights = get_single_flight()
+    flight, leader = flights.join(url, EXTRACTOR_VERSION)
+    if not leader:
+        wait_seconds = (budget.remaining() if budget else INTERACTIVE_BUDGET) + FOLLOWER_GRACE_SECONDS
+        if flights.wait(flight, wait_seconds):
+            return shared_result(flight.outcome(), time.time() - start_time)
+        logger.warning(f"Not waiting any longer for the concurrent extraction of {url}, extracting it separately")
+        flight = None
+
+    result, error = None, None
+    try:
+        # The previous extraction may have finished and been cached between the check above and join()
+        result = cached_result(url, start_time)
+        if result:
+            return result
+        result = extract_content_uncached(url, timeout_setting, budget)
+        title, content, execution_time, debug_text, prev_chapter_url, next_chapter_url = result
+        if content and len(content) > 100:
+            cache.put(url, EXTRACTOR_VERSION, (title, content, prev_chapter_url, next_chapter_url))
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        flights.finish(flight, result, error)
+    return result
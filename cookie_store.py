@@ -0,0 +1,159 @@
+"""
+Persistent cookie jar for all fetch paths.
+Cookies set by the novel sites (consent, session and anti-bot cookies) are
+kept for the lifetime of the server and saved to disk, one file per cookie
+domain, so later chapters and restarts reuse them instead of repeating the
+handshake. The jar plugs into the shared requests.Session directly; the
+other fetch paths use cookie_header() and store_cookies().
+"""
+
+import atexit
+import http.cookiejar
+import json
+import logging
+import os
+import re
+import threading
+import time
+import urllib.request
+from pathlib import Path
+
+logger = logging.getLogger("content_extractor")
+
+COOKIE_DIR = Path(os.environ.get("COOKIE_DIR", ".cache/cookies"))
+# Cookies without an expiry date (browser-session cookies) are dropped after this long
+SESSION_COOKIE_MAX_AGE = 24 * 3600
+
+# Cookie attributes stored per cookie, in http.cookiejar.Cookie argument order
+_COOKIE_FIELDS = (
+    "version", "name", "value", "port", "port_specified", "domain", "domain_specified",
+    "domain_initial_dot", "path", "path_specified", "secure", "expires", "discard",
+    "comment", "comment_url",
+)
+
+
+def _file_name(domain):
+    return re.sub(r"[^A-Za-z0-9.-]", "_", domain.lstrip(".")) + ".json"
+
+
+class _HeaderInfo:
+    """Minimal stand-in for the message object http.cookiejar reads Set-Cookie headers from"""
+
+    def __init__(self, headers):
+        self._headers = headers
+
+    def get_all(self, name, default=None):
+        headers = self._headers
+        if hasattr(headers, "getall"):  # aiohttp
+            values = headers.getall(name, [])
+        elif hasattr(headers, "get_all"):  # http.client
+            values = headers.get_all(name) or []
+        elif hasattr(headers, "getlist"):  # urllib3
+            values = headers.getlist(name)
+        else:
+            value = headers.get(name)
+            values = [value] if value else []
+        return values or default
+
+
+class _ResponseInfo:
+    def __init__(self, headers):
+        self._info = _HeaderInfo(headers)
+
+    def info(self):
+        return self._info
+
+
+class PersistentCookieJar(http.cookiejar.CookieJar):
+    """CookieJar that remembers when it changed and saves each cookie domain to its own file"""
+
+    def __init__(self, directory=COOKIE_DIR):
+        super().__init__()
+        self.directory = Path(directory)
+        self._dirty = False
+        self._save_lock = threading.Lock()
+
+    def set_cookie(self, cookie):
+        # Also called by extract_cookies for every accepted Set-Cookie
+        super().set_cookie(cookie)
+        self._dirty = True
+
+    def save(self):
+        """Write every cookie domain to its own file and remove files of domains without cookies"""
+        with self._save_lock:
+            self._dirty = False
+            by_domain = {}
+            saved_at = int(time.time())
+            for cookie in list(self):
+                record = {field: getattr(cookie, field) for field in _COOKIE_FIELDS}
+                record["rest"] = cookie._rest
+                record["saved_at"] = saved_at
+                by_domain.setdefault(cookie.domain.lstrip("."), []).append(record)
+            try:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                for domain, records in by_domain.items():
+                    path = self.directory / _file_name(domain)
+                    tmp_path = path.with_suffix(".tmp")
+                    tmp_path.write_text(json.dumps(records), encoding="utf-8")
+                    os.replace(tmp_path, path)
+                kept = {_file_name(domain) for domain in by_domain}
+                for path in self.directory.glob("*.json"):
+                    if path.name not in kept:
+                        path.unlink()
+                return True
+            except Exception as e:
+                logger.error(f"Error saving cookies: {str(e)}")
+                return False
+
+    def save_if_dirty(self):
+        if self._dirty:
+            self.save()
+
+    def load(self):
+        """Reload saved cookies, skipping expired ones"""
+        count = 0
+        now = time.time()
+        if not self.directory.exists():
+            return 0
+        for path in self.directory.glob("*.json"):
+            try:
+                for record in json.loads(path.read_text(encoding="utf-8")):
+                    if record["expires"] is None and now - record.get("saved_at", 0) > SESSION_COOKIE_MAX_AGE:
+                        continue
+                    cookie = http.cookiejar.Cookie(
+                        *(record[field] for field in _COOKIE_FIELDS), rest=record.get("rest") or {}
+                    )
+                    if cookie.is_expired(now):
+                        continue
+                    super().set_cookie(cookie)
+                    count += 1
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable cookie file {path}: {str(e)}")
+        return count
+
+    def cookie_header(self, url):
+        """Value for the Cookie header of a request to url, or None"""
+        request = urllib.request.Request(url)
+        self.add_cookie_header(request)
+        return request.get_header("Cookie")
+
+    def store_cookies(self, url, headers):
+        """Take the Set-Cookie headers of a response to url (any client's header object)"""
+        self.extract_cookies(_ResponseInfo(headers), urllib.request.Request(url))
+
+
+_cookie_jar = None
+_cookie_jar_lock = threading.Lock()
+
+
+def get_cookie_jar():
+    """Return the process-wide cookie jar, loading saved cookies on first use"""
+    global _cookie_jar
+    if _cookie_jar is None:
+        with _cookie_jar_lock:
+            if _cookie_jar is None:
+                jar = PersistentCookieJar()
+                jar.load()
+                atexit.register(jar.save_if_dirty)
+                _cookie_jar = jar
+    return _cookie_jar
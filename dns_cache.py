@@ -0,0 +1,344 @@
+"""
+DNS caching and address racing for the fetch layer.
+Name lookups are cached for their record TTL (when dnspython is installed,
+otherwise for DNS_CACHE_TTL seconds) and an expired answer is still used if
+the resolver fails. New connections of the pool managers passed to
+install() race the resolved addresses happy-eyeballs style: the next address (alternating IPv6/IPv4) is tried
+whenever the previous one has not connected within HAPPY_EYEBALLS_DELAY,
+and addresses that recently failed are tried last. Connections to the
+domains a reader has visited can be opened in the background at server
+start, so the first chapter of the day skips the cold lookup and handshake.
+"""
+
+import errno
+import logging
+import os
+import selectors
+import socket
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+from urllib3.exceptions import ConnectTimeoutError, NameResolutionError, NewConnectionError
+
+try:
+    import dns.resolver
+except ImportError:
+    dns = None
+
+logger = logging.getLogger("content_extractor")
+
+# Cache lifetime of a lookup when the record TTL is not known
+DNS_CACHE_TTL = int(os.environ.get("DNS_CACHE_TTL", 300))
+# Bounds applied to record TTLs
+MIN_DNS_TTL = 30
+MAX_DNS_TTL = 3600
+# Failed lookups are cached briefly so a broken name does not hit the resolver on every request
+NEGATIVE_TTL = 15
+# Delay before racing the next address of a host
+HAPPY_EYEBALLS_DELAY = float(os.environ.get("HAPPY_EYEBALLS_DELAY", 0.25))
+# Addresses that failed to connect are tried last for this long
+DEAD_ADDRESS_SECONDS = 600
+# Set to 0 to disable background connection pre-warming
+PREWARM_ENABLED = os.environ.get("HTTP_PREWARM", "1") != "0"
+# Number of domains pre-warmed at most
+PREWARM_MAX_DOMAINS = 10
+
+
+def _is_ip_address(host):
+    for family in (socket.AF_INET, socket.AF_INET6):
+        try:
+            socket.inet_pton(family, host)
+            return True
+        except OSError:
+            pass
+    return False
+
+
+class DnsCache:
+    """Thread-safe cache of getaddrinfo-style results with per-entry expiry"""
+
+    def __init__(self, default_ttl=DNS_CACHE_TTL):
+        self.default_ttl = default_ttl
+        self._entries = {}  # (host, port) -> (expires_at, infos or None)
+        self._dead = {}  # address -> time it failed
+        self._lock = threading.Lock()
+
+    def _lookup(self, host, port):
+        """Resolve a name, returning (addrinfo list, ttl in seconds)"""
+        if dns is not None:
+            infos = []
+            ttls = []
+            for record_type, family in (("AAAA", socket.AF_INET6), ("A", socket.AF_INET)):
+                try:
+                    answer = dns.resolver.resolve(host, record_type)
+                except Exception:
+                    continue
+                ttls.append(answer.rrset.ttl)
+                for record in answer:
+                    sockaddr = (record.address, port, 0, 0) if family == socket.AF_INET6 else (record.address, port)
+                    infos.append((family, socket.SOCK_STREAM, socket.IPPROTO_TCP, "", sockaddr))
+            if infos:
+                return infos, min(MAX_DNS_TTL, max(MIN_DNS_TTL, min(ttls)))
+        infos = socket.getaddrinfo(host, port, socket.AF_UNSPEC, socket.SOCK_STREAM)
+        return infos, self.default_ttl
+
+    def resolve(self, host, port):
+        """Return the addrinfo list for host:port, from the cache when still valid"""
+        if _is_ip_address(host):
+            return socket.getaddrinfo(host, port, socket.AF_UNSPEC, socket.SOCK_STREAM)
+
+        key = (host.lower(), port)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._entries.get(key)
+        if cached and cached[0] > now:
+            if cached[1] is None:
+                raise socket.gaierror(socket.EAI_NONAME, f"Cached lookup failure for {host}")
+            return cached[1]
+
+        try:
+            infos, ttl = self._lookup(host, port)
+        except socket.gaierror:
+            if cached and cached[1]:
+                # Serving an expired answer beats failing while the resolver is down
+                logger.warning(f"DNS lookup for {host} failed, using expired cached addresses")
+                return cached[1]
+            with self._lock:
+                self._entries[key] = (now + NEGATIVE_TTL, None)
+            raise
+
+        with self._lock:
+            self._entries[key] = (now + ttl, infos)
+        return infos
+
+    def mark_dead(self, address):
+        with self._lock:
+            self._dead[address] = time.monotonic()
+
+    def mark_alive(self, address):
+        with self._lock:
+            self._dead.pop(address, None)
+
+    def is_dead(self, address):
+        with self._lock:
+            failed_at = self._dead.get(address)
+        return failed_at is not None and time.monotonic() - failed_at < DEAD_ADDRESS_SECONDS
+
+    def order(self, infos):
+        """Interleave address families (first family first) and move recently dead addresses last"""
+        by_family = {}
+        for info in infos:
+            by_family.setdefault(info[0], []).append(info)
+        queues = list(by_family.values())
+        interleaved = []
+        while any(queues):
+            for queue in queues:
+                if queue:
+                    interleaved.append(queue.pop(0))
+        return sorted(interleaved, key=lambda info: self.is_dead(info[4][0]))
+
+
+_dns_cache = None
+_dns_cache_lock = threading.Lock()
+
+
+def get_dns_cache():
+    """Return the process-wide DNS cache"""
+    global _dns_cache
+    if _dns_cache is None:
+        with _dns_cache_lock:
+            if _dns_cache is None:
+                _dns_cache = DnsCache()
+    return _dns_cache
+
+
+def _new_socket(info, source_address, socket_options):
+    family, socktype, proto, _, _ = info
+    sock = socket.socket(family, socktype, proto)
+    try:
+        for option in socket_options or ():
+            sock.setsockopt(*option)
+        if source_address:
+            sock.bind(source_address)
+        sock.setblocking(False)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def create_connection(address, timeout=None, source_address=None, socket_options=None):
+    """
+    Drop-in replacement for urllib3.util.connection.create_connection.
+    Resolves through the DNS cache and races the addresses, returning the
+    first socket that connects. Raises socket.timeout when none connects in time.
+    """
+    host, port = address
+    if host.startswith("["):
+        host = host.strip("[]")
+    if not isinstance(timeout, (int, float)):
+        # urllib3 passes a sentinel when no timeout was configured
+        timeout = socket.getdefaulttimeout() if timeout is not None else None
+
+    cache = get_dns_cache()
+    candidates = cache.order(cache.resolve(host, port))
+    if not candidates:
+        raise OSError("getaddrinfo returns an empty list")
+
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    selector = selectors.DefaultSelector()
+    attempts = {}  # socket -> address
+    last_error = None
+    winner = None
+    next_start = time.monotonic()
+
+    try:
+        while winner is None:
+            now = time.monotonic()
+            if candidates and (now >= next_start or not attempts):
+                info = candidates.pop(0)
+                try:
+                    sock = _new_socket(info, source_address, socket_options)
+                    result = sock.connect_ex(info[4])
+                except OSError as e:
+                    last_error = e
+                    cache.mark_dead(info[4][0])
+                    continue
+                if result == 0:
+                    winner = sock
+                    attempts[sock] = info[4][0]
+                    break
+                if result not in (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY):
+                    sock.close()
+                    last_error = OSError(result, os.strerror(result))
+                    cache.mark_dead(info[4][0])
+                    continue
+                attempts[sock] = info[4][0]
+                selector.register(sock, selectors.EVENT_WRITE)
+                next_start = now + HAPPY_EYEBALLS_DELAY
+
+            if not attempts:
+                raise last_error or OSError(f"Could not connect to {host}")
+
+            waits = []
+            if candidates:
+                waits.append(max(0, next_start - now))
+            if deadline is not None:
+                if now >= deadline:
+                    # Addresses still connecting have not failed, only been slow - they are not marked dead
+                    raise socket.timeout(f"Connection to {host} timed out")
+                waits.append(deadline - now)
+            for key, _ in selector.select(min(waits) if waits else None):
+                sock = key.fileobj
+                selector.unregister(sock)
+                error = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                if error == 0:
+                    winner = sock
+                    break
+                failed_address = attempts.pop(sock)
+                sock.close()
+                last_error = OSError(error, os.strerror(error))
+                cache.mark_dead(failed_address)
+    finally:
+        for sock in attempts:
+            if sock is not winner:
+                sock.close()
+        selector.close()
+
+    cache.mark_alive(attempts[winner])
+    winner.setblocking(True)
+    winner.settimeout(timeout)
+    return winner
+
+
+class _CachedConnectMixin:
+    """Opens the socket of a urllib3 connection with create_connection"""
+
+    def _new_conn(self):
+        # As urllib3's own _new_conn, which calls urllib3.util.connection.create_connection
+        try:
+            sock = create_connection(
+                (self._dns_host, self.port),
+                self.timeout,
+                source_address=self.source_address,
+                socket_options=self.socket_options,
+            )
+        except socket.gaierror as e:
+            raise NameResolutionError(self.host, self, e) from e
+        except socket.timeout as e:
+            raise ConnectTimeoutError(
+                self, f"Connection to {self.host} timed out. (connect timeout={self.timeout})"
+            ) from e
+        except OSError as e:
+            raise NewConnectionError(self, f"Failed to establish a new connection: {e}") from e
+        sys.audit("http.client.connect", self, self.host, self.port)
+        return sock
+
+
+_pool_classes = {}  # urllib3 pool class -> its subclass connecting through create_connection
+_pool_classes_lock = threading.Lock()
+
+
+def _cached_pool_class(pool_class):
+    with _pool_classes_lock:
+        if issubclass(pool_class.ConnectionCls, _CachedConnectMixin):
+            return pool_class
+        if pool_class not in _pool_classes:
+            connection_class = type(
+                f"Cached{pool_class.ConnectionCls.__name__}", (_CachedConnectMixin, pool_class.ConnectionCls), {}
+            )
+            _pool_classes[pool_class] = type(
+                f"Cached{pool_class.__name__}", (pool_class,), {"ConnectionCls": connection_class}
+            )
+        return _pool_classes[pool_class]
+
+
+def install(pool_manager):
+    """
+    Make a urllib3 PoolManager (or requests adapter's pool manager) resolve
+    through the DNS cache and race addresses for its new connections. Keeps
+    the pool classes already set on it (e.g. by install_connect_timing), so
+    call it after those. Other urllib3 users in the process are unaffected.
+    """
+    pool_manager.pool_classes_by_scheme = {
+        scheme: _cached_pool_class(pool_class)
+        for scheme, pool_class in pool_manager.pool_classes_by_scheme.items()
+    }
+
+
+_prewarm_started = False
+_prewarm_lock = threading.Lock()
+
+
+def prewarm(urls, open_connection):
+    """
+    Once per process, resolve and connect to the domains of the given URLs in
+    a background thread. open_connection(url) opens a pooled connection.
+    """
+    global _prewarm_started
+    if not PREWARM_ENABLED:
+        return False
+    with _prewarm_lock:
+        if _prewarm_started:
+            return False
+        _prewarm_started = True
+
+    origins = []
+    for url in urls:
+        parsed = urlparse(url)
+        origin = f"{parsed.scheme}://{parsed.netloc}/"
+        if parsed.netloc and origin not in origins:
+            origins.append(origin)
+
+    def worker():
+        for origin in origins[:PREWARM_MAX_DOMAINS]:
+            try:
+                open_connection(origin)
+                logger.info(f"Pre-warmed connection to {origin}")
+            except Exception as e:
+                logger.warning(f"Pre-warming {origin} failed: {str(e)}")
+
+    threading.Thread(target=worker, name="connection-prewarm", daemon=True).start()
+    return True
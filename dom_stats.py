@@ -0,0 +1,165 @@
+"""
+Per-element statistics for content-block scoring.
+One post-order walk over a parsed page computes, for every element, the
+numbers the scoring in extract_from_html needs: the length of its text as
+get_text() returns it (with and without surrounding whitespace), the length
+of its markup as str() renders it, its <p> descendants and the text inside
+its links. Scoring then reads these records instead of calling get_text()
+and str() on every candidate and again on every nested candidate, which was
+quadratic in the size of the page.
+"""
+
+from bs4.element import CData, NavigableString, PreformattedString, Tag
+
+# Tags whose strings str() does not escape
+CDATA_CONTAINING_TAGS = frozenset(["script", "style"])
+# Text types get_text() returns for ordinary elements
+TEXT_TYPES = frozenset([NavigableString, CData])
+
+
+def _escaped_length(text):
+    """Length of text after &, < and > are replaced by entities"""
+    return len(text) + 4 * text.count("&") + 3 * (text.count("<") + text.count(">"))
+
+
+def _attribute_length(name, value):
+    """Length of ' name="value"' as str() renders it"""
+    if value is None:
+        return 1 + len(name)
+    if isinstance(value, (list, tuple)):
+        value = " ".join(value)
+    length = _escaped_length(value) + 2
+    if '"' in value and "'" in value:
+        # Double quotes inside are written as &quot;
+        length += 5 * value.count('"')
+    return 2 + len(name) + length
+
+
+class NodeStats:
+    """Statistics of one element and everything inside it"""
+
+    __slots__ = ("element", "text_length", "leading_space", "trailing_space", "blank",
+                 "markup_length", "p_count", "p_text_length", "link_text_length")
+
+    def __init__(self, element):
+        self.element = element
+        self.text_length = 0
+        # Whitespace get_text().strip() would remove at either end; blank: the text is all whitespace
+        self.leading_space = 0
+        self.trailing_space = 0
+        self.blank = True
+        self.markup_length = 0
+        # <p> descendants, and the summed length of their stripped texts
+        self.p_count = 0
+        self.p_text_length = 0
+        self.link_text_length = 0
+
+    @property
+    def stripped_length(self):
+        """len(element.get_text().strip())"""
+        return 0 if self.blank else self.text_length - self.leading_space - self.trailing_space
+
+    @property
+    def link_density(self):
+        """Share of the text that is inside links"""
+        return self.link_text_length / self.text_length if self.text_length else 0.0
+
+    @property
+    def paragraph_text_length(self):
+        """len(' '.join(p.get_text().strip() for p in element.find_all('p')))"""
+        return self.p_text_length + self.p_count - 1 if self.p_count else 0
+
+    def _add_text(self, length, leading, trailing, blank):
+        if blank:
+            if self.blank:
+                self.leading_space += length
+            self.trailing_space += length
+        else:
+            if self.blank:
+                self.leading_space += leading
+            self.trailing_space = trailing
+            self.blank = False
+        self.text_length += length
+
+    def add_string(self, text):
+        length = len(text)
+        leading = length - len(text.lstrip())
+        if leading == length:
+            self._add_text(length, length, length, True)
+        else:
+            self._add_text(length, leading, length - len(text.rstrip()), False)
+
+    def add_child(self, child):
+        """Fold a finished child element into this one"""
+        self._add_text(child.text_length, child.leading_space, child.trailing_space, child.blank)
+        self.markup_length += child.markup_length
+        name = child.element.name
+        self.p_count += child.p_count + (name == "p")
+        self.p_text_length += child.p_text_length + (child.stripped_length if name == "p" else 0)
+        self.link_text_length += child.text_length if name == "a" else child.link_text_length
+
+
+class DomStats:
+    """Statistics of every element below a root, computed in one walk"""
+
+    def __init__(self, root):
+        self.root = root
+        self.nodes = []  # document order
+        self._by_element = {}
+        self._walk(root)
+
+    def _walk(self, root):
+        root_stats = NodeStats(root)
+        self._by_element[id(root)] = root_stats
+        # (element, its stats, iterator over its children); explicit stack for deeply nested pages
+        stack = [(root, root_stats, iter(root.contents))]
+        while stack:
+            element, stats, children = stack[-1]
+            for child in children:
+                if isinstance(child, Tag):
+                    child_stats = NodeStats(child)
+                    self.nodes.append(child_stats)
+                    self._by_element[id(child)] = child_stats
+                    stack.append((child, child_stats, iter(child.contents)))
+                    break
+                if isinstance(child, PreformattedString):
+                    # Comments, CDATA, doctypes...: written as they are between prefix and suffix
+                    stats.markup_length += len(child.PREFIX) + len(child) + len(child.SUFFIX)
+                    if type(child) in TEXT_TYPES:
+                        stats.add_string(child)
+                elif isinstance(child, NavigableString):
+                    if element.name in CDATA_CONTAINING_TAGS:
+                        stats.markup_length += len(child)
+                    else:
+                        stats.markup_length += _escaped_length(child)
+                    if type(child) in TEXT_TYPES:
+                        stats.add_string(child)
+            else:
+                stack.pop()
+                if element is root:
+                    continue
+                self._close(element, stats)
+                stack[-1][1].add_child(stats)
+
+    @staticmethod
+    def _close(element, stats):
+        """Add the element's own start and end tags to its markup length"""
+        name = element.name
+        if element.prefix:
+            name = f"{element.prefix}:{name}"
+        start = 1 + len(name) + sum(_attribute_length(key, value) for key, value in element.attrs.items())
+        if element.is_empty_element:
+            stats.markup_length += start + 2
+        else:
+            stats.markup_length += start + 1 + 3 + len(name)
+
+    def __getitem__(self, element):
+        return self._by_element[id(element)]
+
+    def get(self, element):
+        return self._by_element.get(id(element))
+
+    def find_all(self, names):
+        """Statistics of all elements with one of the given tag names, in document order"""
+        names = frozenset(names)
+        return [stats for stats in self.nodes if stats.element.name in names]
@@ -0,0 +1,149 @@
+"""
+Process-wide cache of extraction results.
+Stores the final (title, content, prev_chapter_url, next_chapter_url) tuple of
+an extraction so that every user reading the same chapter shares one fetch,
+parse and clean. The cache is bounded by total bytes, evicts least recently
+used entries, can store values compressed, and is snapshotted to disk on
+shutdown and reloaded on start.
+"""
+
+import atexit
+import json
+import logging
+import os
+import pickle
+import threading
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+
+from http_cache import normalize_url
+
+logger = logging.getLogger("content_extractor")
+
+DEFAULT_MAX_BYTES = int(os.environ.get("EXTRACTION_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+DEFAULT_COMPRESS = os.environ.get("EXTRACTION_CACHE_COMPRESS", "1") != "0"
+SNAPSHOT_PATH = Path(os.environ.get("EXTRACTION_CACHE_SNAPSHOT", ".cache/extraction_cache.pkl"))
+
+
+class ExtractionCache:
+    """Thread-safe LRU cache bounded by the total size of the stored values"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, compress=DEFAULT_COMPRESS):
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (compressed flag, encoded bytes)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(url, version):
+        """Cache key for a URL under a given extractor/ruleset version"""
+        return f"{version}|{normalize_url(url)}"
+
+    def _encode(self, value):
+        data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        if self.compress:
+            return True, zlib.compress(data, 6)
+        return False, data
+
+    @staticmethod
+    def _decode(compressed, data):
+        if compressed:
+            data = zlib.decompress(data)
+        return tuple(json.loads(data.decode("utf-8")))
+
+    def get(self, url, version):
+        """Return the cached result tuple or None"""
+        key = self.make_key(url, version)
+        with self._lock:
+            stored = self._entries.get(key)
+            if stored is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return self._decode(*stored)
+
+    def put(self, url, version, value):
+        """Store a result tuple, evicting least recently used entries to stay within max_bytes"""
+        key = self.make_key(url, version)
+        compressed, data = self._encode(list(value))
+        size = len(data)
+        if size > self.max_bytes:
+            return False
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= len(old[1])
+            self._entries[key] = (compressed, data)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes and self._entries:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.total_bytes -= len(evicted)
+        return True
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def snapshot(self, path=SNAPSHOT_PATH):
+        """Write all entries (in LRU order) to disk"""
+        try:
+            path = Path(path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with self._lock:
+                items = list(self._entries.items())
+            tmp_path = path.with_suffix(".tmp")
+            with open(tmp_path, "wb") as f:
+                pickle.dump(items, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+            logger.info(f"Saved extraction cache snapshot with {len(items)} entries to {path}")
+            return True
+        except Exception as e:
+            logger.error(f"Error saving extraction cache snapshot: {str(e)}")
+            return False
+
+    def load(self, path=SNAPSHOT_PATH):
+        """Reload entries from a snapshot written by snapshot()"""
+        try:
+            path = Path(path)
+            if not path.exists():
+                return 0
+            with open(path, "rb") as f:
+                items = pickle.load(f)
+            with self._lock:
+                for key, (compressed, data) in items:
+                    old = self._entries.pop(key, None)
+                    if old is not None:
+                        self.total_bytes -= len(old[1])
+                    self._entries[key] = (compressed, data)
+                    self.total_bytes += len(data)
+                while self.total_bytes > self.max_bytes and self._entries:
+                    _, (_, evicted) = self._entries.popitem(last=False)
+                    self.total_bytes -= len(evicted)
+            logger.info(f"Loaded extraction cache snapshot with {len(items)} entries from {path}")
+            return len(items)
+        except Exception as e:
+            logger.error(f"Error loading extraction cache snapshot: {str(e)}")
+            return 0
+
+
+_extraction_cache = None
+_extraction_cache_lock = threading.Lock()
+
+
+def get_extraction_cache():
+    """Return the process-wide extraction cache, loading the last snapshot on first use"""
+    global _extraction_cache
+    if _extraction_cache is None:
+        with _extraction_cache_lock:
+            if _extraction_cache is None:
+                cache = ExtractionCache()
+                cache.load()
+                atexit.register(cache.snapshot)
+                _extraction_cache = cache
+    return _extraction_cache
@@ -0,0 +1,139 @@
+"""
+Incremental HTML watching for early download termination.
+For sites whose chapter text lives in a known container, the response is fed
+into a tokenizer as it arrives. Once the container has closed and the chapter
+navigation links have been seen, the rest of the page (comments,
+recommendation widgets, footers) is not needed and the download is stopped.
+"""
+
+import codecs
+from html.parser import HTMLParser
+from urllib.parse import urlparse
+
+from http_client import detect_charset, CHARSET_SNIFF_BYTES
+
+# Per-site description of the chapter container: element ids and classes that mark it
+STREAMING_RULES = {
+    "metruyencv.com": {
+        "ids": {"article"},
+        "classes": {"chapter-content", "nh-read__content", "chapter-c"},
+    },
+}
+
+# Anchor texts identifying chapter navigation links
+NEXT_LINK_TERMS = ('chương sau', 'chương tiếp', 'tiếp theo', 'next chapter')
+PREV_LINK_TERMS = ('chương trước', 'quay lại', 'previous chapter')
+
+# Once the container has closed, keep reading at most this many bytes looking for navigation links
+NAVIGATION_TAIL_BYTES = 64 * 1024
+
+
+class _ChapterTokenizer(HTMLParser):
+    """Tracks the chapter container and navigation anchors while the page streams in"""
+
+    def __init__(self, rule):
+        super().__init__(convert_charrefs=True)
+        self.rule = rule
+        self.container_tag = None
+        self.container_depth = 0
+        self.container_closed = False
+        self.in_anchor = False
+        self.anchor_text = []
+        self.next_seen = False
+        self.prev_seen = False
+
+    def _is_container(self, attrs):
+        attributes = dict(attrs)
+        if attributes.get("id") in self.rule["ids"]:
+            return True
+        classes = set((attributes.get("class") or "").split())
+        return bool(classes & self.rule["classes"])
+
+    def handle_starttag(self, tag, attrs):
+        if self.container_tag is None and not self.container_closed and self._is_container(attrs):
+            self.container_tag = tag
+            self.container_depth = 1
+        elif self.container_tag == tag:
+            self.container_depth += 1
+
+        if tag == "a":
+            self.in_anchor = True
+            self.anchor_text = []
+
+    def handle_endtag(self, tag):
+        if self.container_tag == tag:
+            self.container_depth -= 1
+            if self.container_depth == 0:
+                self.container_tag = None
+                self.container_closed = True
+
+        if tag == "a" and self.in_anchor:
+            self.in_anchor = False
+            text = " ".join(self.anchor_text).lower().strip()
+            if any(term in text for term in NEXT_LINK_TERMS):
+                self.next_seen = True
+            elif any(term in text for term in PREV_LINK_TERMS):
+                self.prev_seen = True
+
+    def handle_data(self, data):
+        if self.in_anchor:
+            self.anchor_text.append(data)
+
+
+class ChapterStreamWatcher:
+    """
+    Decides when enough of a chapter page has arrived.
+    feed() takes raw response bytes and returns True once the download can stop.
+    """
+
+    def __init__(self, rule):
+        self._tokenizer = _ChapterTokenizer(rule)
+        self._decoder = None
+        self._pending = bytearray()
+        self._content_type = None
+        self.bytes_seen = 0
+        self.bytes_at_close = None
+        self.stopped_early = False
+
+    def start(self, content_type=None):
+        """Called with the response Content-Type before the first chunk"""
+        self._content_type = content_type
+
+    def feed(self, chunk):
+        self.bytes_seen += len(chunk)
+
+        if self._decoder is None:
+            # Wait for enough bytes to sniff the charset before tokenizing
+            self._pending += chunk
+            if len(self._pending) < CHARSET_SNIFF_BYTES:
+                return False
+            self._start_decoder()
+            chunk, self._pending = bytes(self._pending), bytearray()
+
+        self._tokenizer.feed(self._decoder.decode(chunk))
+        return self._should_stop()
+
+    def _start_decoder(self):
+        charset = detect_charset(self._pending, self._content_type)
+        self._decoder = codecs.getincrementaldecoder(charset)(errors="replace")
+
+    def _should_stop(self):
+        tokenizer = self._tokenizer
+        if not tokenizer.container_closed:
+            return False
+        if self.bytes_at_close is None:
+            self.bytes_at_close = self.bytes_seen
+        if tokenizer.next_seen and tokenizer.prev_seen:
+            self.stopped_early = True
+        elif self.bytes_seen - self.bytes_at_close > NAVIGATION_TAIL_BYTES:
+            self.stopped_early = True
+        return self.stopped_early
+
+
+def watcher_for_url(url):
+    """Return a new ChapterStreamWatcher for sites with a known chapter container, else None"""
+    domain = urlparse(url).netloc.lower()
+    for site, rule in STREAMING_RULES.items():
+        if site in domain:
+            return ChapterStreamWatcher(rule)
+    return None
@@ -0,0 +1,204 @@
+"""
+Optional HTTP/2 transport.
+With HTTP2=1 (or set_http2_enabled(True)) and httpx installed with its h2
+extra (pip install "httpx[h2]"), https downloads go through shared httpx
+clients that negotiate HTTP/2, so concurrent chapter fetches from one origin
+are multiplexed over a single TLS connection instead of each needing its own.
+Servers that do not offer HTTP/2 are spoken to over HTTP/1.1 by the same
+clients, and an origin whose HTTP/2 connection fails at the protocol level
+is sent back to the regular requests/aiohttp path for a while.
+Plain http:// URLs and downloads through the proxy pool always use the
+regular path. Errors are raised as the equivalent requests exceptions so
+retries, SSL fallback and the concurrency controller work unchanged.
+"""
+
+import asyncio
+import logging
+import os
+import ssl
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+
+import http_client
+from cookie_store import get_cookie_jar
+from latency_tracker import get_latency_tracker
+from proxy_pool import get_proxy_pool
+from retry_policy import check_status, check_deadline
+
+try:
+    import httpx
+    import h2  # noqa: F401 - httpx needs it for http2=True
+except ImportError:
+    httpx = None
+
+logger = logging.getLogger("content_extractor")
+
+HTTP2_ENABLED = os.environ.get("HTTP2", "0") == "1"
+# Connections kept per client; with HTTP/2 one connection per origin is usually enough
+HTTP2_MAX_CONNECTIONS = int(os.environ.get("HTTP2_MAX_CONNECTIONS", 20))
+# An origin whose HTTP/2 connection broke uses the regular path for this long
+HTTP2_RETRY_SECONDS = 3600
+
+_enabled = HTTP2_ENABLED
+_failed_origins = {}  # origin -> time its HTTP/2 connection failed
+_clients = {}  # verify -> httpx.Client
+_async_clients = {}  # (event loop, verify) -> httpx.AsyncClient
+_lock = threading.Lock()
+
+
+class Http2Unavailable(Exception):
+    """Raised when a download has to be repeated over the regular HTTP/1.1 path"""
+
+
+def is_available():
+    """Whether httpx with HTTP/2 support is installed"""
+    return httpx is not None
+
+
+def set_http2_enabled(enabled):
+    """Switch the HTTP/2 transport on or off for the whole process"""
+    global _enabled
+    if enabled and httpx is None:
+        logger.warning("HTTP/2 requested but httpx[h2] is not installed, staying on HTTP/1.1")
+    _enabled = bool(enabled)
+
+
+def _origin(url):
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}".lower()
+
+
+def enabled_for(url):
+    """Whether a download of url should use the HTTP/2 transport"""
+    if not _enabled or httpx is None or not url.lower().startswith("https://"):
+        return False
+    if get_proxy_pool().proxies:
+        return False
+    failed_at = _failed_origins.get(_origin(url))
+    return failed_at is None or time.monotonic() - failed_at > HTTP2_RETRY_SECONDS
+
+
+def _client_options(verify):
+    return dict(
+        http2=True,
+        verify=verify,
+        follow_redirects=True,
+        # The shared cookie jar, so cookies are the same whichever transport fetched a page
+        cookies=get_cookie_jar(),
+        limits=httpx.Limits(max_connections=HTTP2_MAX_CONNECTIONS, max_keepalive_connections=HTTP2_MAX_CONNECTIONS),
+    )
+
+
+def get_client(verify=True):
+    """Return the shared httpx.Client for a verification mode"""
+    verify = bool(verify)
+    client = _clients.get(verify)
+    if client is None:
+        with _lock:
+            client = _clients.get(verify)
+            if client is None:
+                client = _clients[verify] = httpx.Client(**_client_options(verify))
+    return client
+
+
+def get_async_client(verify=True):
+    """Return the httpx.AsyncClient of the running event loop for a verification mode"""
+    key = (asyncio.get_running_loop(), bool(verify))
+    client = _async_clients.get(key)
+    if client is None:
+        client = _async_clients[key] = httpx.AsyncClient(**_client_options(bool(verify)))
+    return client
+
+
+async def close_async_clients():
+    """Close the async clients of the running event loop"""
+    loop = asyncio.get_running_loop()
+    for key in [key for key in _async_clients if key[0] is loop]:
+        await _async_clients.pop(key).aclose()
+
+
+def _timeout(timeout):
+    connect_timeout, read_timeout = timeout
+    return httpx.Timeout(connect=connect_timeout, read=read_timeout, write=read_timeout, pool=read_timeout)
+
+
+def _translate(error, url):
+    """Map an httpx error onto the requests exception the callers handle"""
+    if isinstance(error, httpx.ConnectTimeout):
+        return requests.exceptions.ConnectTimeout(str(error))
+    if isinstance(error, httpx.TimeoutException):
+        return requests.exceptions.ReadTimeout(str(error))
+    if isinstance(error, httpx.ProtocolError):
+        # Protocol-level trouble: remember it and repeat the download over HTTP/1.1
+        _failed_origins[_origin(url)] = time.monotonic()
+        logger.warning(f"HTTP/2 failed for {_origin(url)}, using HTTP/1.1 for it: {str(error)}")
+        return Http2Unavailable(str(error))
+    if isinstance(error, httpx.ConnectError) and (
+            isinstance(error.__cause__, ssl.SSLError) or "CERTIFICATE_VERIFY_FAILED" in str(error)):
+        return requests.exceptions.SSLError(str(error))
+    if isinstance(error, httpx.TransportError):
+        return requests.exceptions.ConnectionError(str(error))
+    return error
+
+
+def _finish(response, stats, sent_at, url):
+    """Bookkeeping shared by the sync and async downloads once the headers have arrived"""
+    get_latency_tracker().record_first_byte(url, time.monotonic() - sent_at)
+    if stats is not None:
+        stats.protocol = response.http_version
+    http_client.record_redirects(response)
+    check_status(response.status_code, response.headers)
+
+
+def download(url, headers, timeout, verify, watcher=None, stats=None, content_types=None, deadline=None):
+    """
+    Stream a page through the shared httpx client and return (response, body bytes).
+    Raises Http2Unavailable when the caller should retry over HTTP/1.1.
+    """
+    sent_at = time.monotonic()
+    try:
+        with get_client(verify).stream("GET", url, headers=headers, timeout=_timeout(timeout)) as response:
+            _finish(response, stats, sent_at, url)
+            body = http_client.read_response_body(
+                response, watcher=watcher, stats=stats,
+                content_types=content_types or http_client.HTML_CONTENT_TYPES, deadline=deadline
+            )
+    except httpx.HTTPError as e:
+        raise _translate(e, url) from e
+    return response, body
+
+
+async def download_async(url, headers, timeout, verify, watcher=None, stats=None, content_types=None,
+                         deadline=None):
+    """Coroutine version of download() using the event loop's httpx.AsyncClient"""
+    sent_at = time.monotonic()
+    try:
+        async with get_async_client(verify).stream("GET", url, headers=headers,
+                                                   timeout=_timeout(timeout)) as response:
+            _finish(response, stats, sent_at, url)
+            expected_length = http_client.check_response_headers(
+                response.headers, content_types or http_client.HTML_CONTENT_TYPES
+            )
+            buffer = http_client.BodyBuffer(expected_length)
+            decoder = http_client.ContentDecoder(response.headers.get("Content-Encoding"))
+            stats.encoding = decoder.encoding
+            if watcher:
+                watcher.start(response.headers.get("Content-Type"))
+            stopped = False
+            async for raw_chunk in response.aiter_raw(65536):
+                check_deadline(deadline)
+                stats.transferred += len(raw_chunk)
+                chunk = decoder.decompress(raw_chunk)
+                buffer.append(chunk)
+                if watcher and chunk and watcher.feed(chunk):
+                    stopped = True
+                    break
+            if not stopped:
+                buffer.append(decoder.flush())
+            stats.decoded = buffer.size
+    except httpx.HTTPError as e:
+        raise _translate(e, url) from e
+    return response, buffer.getvalue()
@@ -0,0 +1,285 @@
+"""
+Persistent on-disk HTTP response cache for chapter pages.
+Responses are keyed by a normalized URL (plus a variant name for pages
+requested differently, e.g. with a mobile User-Agent) and stored together
+with their ETag/Last-Modified validators. Cached copies are served immediately and
+revalidated in the background (stale-while-revalidate) with
+If-None-Match/If-Modified-Since, so re-opening a chapter costs a 304 or nothing.
+Responses marked Cache-Control: no-cache or max-age=0 are revalidated before
+every use instead.
+Permanent (301/308) redirects are remembered as well.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
+logger = logging.getLogger("content_extractor")
+
+CACHE_DIR = Path(os.environ.get("HTTP_CACHE_DIR", ".cache/http"))
+REDIRECTS_PATH = CACHE_DIR / "redirects.json"
+
+# Entries younger than this are served without any revalidation
+FRESH_SECONDS = 300
+# Entries older than this are revalidated synchronously instead of served stale
+MAX_STALE_SECONDS = 7 * 24 * 3600
+
+# Click-tracking parameters that never change the page content (generic names
+# such as ref or source are left alone, sites use them for real content)
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid",
+    "ref_src", "_ga", "_gl",
+}
+TRACKING_PREFIXES = ("utm_",)
+
+
+def must_revalidate(cache_control):
+    """True when a Cache-Control header allows storing but not serving without revalidation"""
+    directives = {directive.strip() for directive in (cache_control or "").lower().split(",")}
+    return "no-cache" in directives or "max-age=0" in directives
+
+
+def normalize_url(url):
+    """
+    Normalize a URL for use as a cache key.
+    Lowercases scheme and host, drops default ports, fragments, tracking
+    parameters and trailing slashes, and sorts the remaining query parameters.
+    """
+    parsed = urlparse(url.strip())
+    scheme = (parsed.scheme or "http").lower()
+    netloc = parsed.netloc.lower()
+    if (scheme == "http" and netloc.endswith(":80")) or (scheme == "https" and netloc.endswith(":443")):
+        netloc = netloc.rsplit(":", 1)[0]
+
+    path = parsed.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/") or "/"
+
+    query_items = [
+        (key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)
+    ]
+    query = urlencode(sorted(query_items))
+
+    return urlunparse((scheme, netloc, path, "", query, ""))
+
+
+class HttpCache:
+    """Disk-backed store of response bodies plus their validators"""
+
+    def __init__(self, directory=CACHE_DIR, fresh_seconds=FRESH_SECONDS, max_stale_seconds=MAX_STALE_SECONDS):
+        self.directory = Path(directory)
+        self.fresh_seconds = fresh_seconds
+        self.max_stale_seconds = max_stale_seconds
+        self._lock = threading.Lock()
+        self._revalidating = set()
+
+    def _paths(self, url, variant=None):
+        key = normalize_url(url) if not variant else f"{normalize_url(url)} {variant}"
+        key = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return self.directory / f"{key}.json", self.directory / f"{key}.body"
+
+    def get(self, url, variant=None):
+        """Return the cached entry for a URL (metadata dict with a 'body' key) or None"""
+        meta_path, body_path = self._paths(url, variant)
+        try:
+            if not meta_path.exists() or not body_path.exists():
+                return None
+            with open(meta_path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            entry["body"] = body_path.read_bytes()
+            return entry
+        except Exception as e:
+            logger.warning(f"Error reading HTTP cache entry for {url}: {str(e)}")
+            return None
+
+    def put(self, url, body, headers, partial=False, variant=None, final_url=None):
+        """
+        Store a 200 response body with its ETag/Last-Modified validators.
+        partial marks bodies whose download was deliberately stopped early;
+        final_url is where the body came from after redirects.
+        """
+        cache_control = headers.get("Cache-Control", "").lower()
+        if "no-store" in cache_control:
+            return False
+
+        meta_path, body_path = self._paths(url, variant)
+        entry = {
+            "url": normalize_url(url),
+            "variant": variant,
+            "final_url": final_url,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "content_type": headers.get("Content-Type"),
+            "partial": partial,
+            "revalidate": must_revalidate(cache_control),
+            "stored_at": time.time(),
+        }
+        try:
+            with self._lock:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                # Write to temp files and rename so readers never see half an entry
+                tmp_body = body_path.with_suffix(".body.tmp")
+                tmp_meta = meta_path.with_suffix(".json.tmp")
+                tmp_body.write_bytes(body)
+                with open(tmp_meta, "w", encoding="utf-8") as f:
+                    json.dump(entry, f)
+                os.replace(tmp_body, body_path)
+                os.replace(tmp_meta, meta_path)
+            return True
+        except Exception as e:
+            logger.warning(f"Error writing HTTP cache entry for {url}: {str(e)}")
+            return False
+
+    def touch(self, url, variant=None, headers=None):
+        """Mark an entry as freshly validated after a 304 response (with the 304's headers, if given)"""
+        meta_path, _ = self._paths(url, variant)
+        try:
+            with self._lock:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+                entry["stored_at"] = time.time()
+                if headers and headers.get("Cache-Control") is not None:
+                    entry["revalidate"] = must_revalidate(headers["Cache-Control"])
+                with open(meta_path, "w", encoding="utf-8") as f:
+                    json.dump(entry, f)
+        except Exception as e:
+            logger.warning(f"Error refreshing HTTP cache entry for {url}: {str(e)}")
+
+    def age(self, entry):
+        """Seconds since the entry was last stored or validated"""
+        return time.time() - entry.get("stored_at", 0)
+
+    def conditional_headers(self, entry):
+        """Build If-None-Match/If-Modified-Since headers for an entry"""
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def start_revalidation(self, url, revalidate, variant=None):
+        """
+        Run revalidate(url) in a background thread unless one is already running
+        for the same URL and variant. Returns True when a new revalidation was started.
+        """
+        key = (normalize_url(url), variant)
+        with self._lock:
+            if key in self._revalidating:
+                return False
+            self._revalidating.add(key)
+
+        def worker():
+            try:
+                revalidate(url)
+            except Exception as e:
+                logger.warning(f"Background revalidation failed for {url}: {str(e)}")
+            finally:
+                with self._lock:
+                    self._revalidating.discard(key)
+
+        threading.Thread(target=worker, name="http-cache-revalidate", daemon=True).start()
+        return True
+
+
+class RedirectCache:
+    """
+    Persisted map of URLs that answered 301/308 to where they point, so later
+    fetches go straight to the final URL instead of repeating the redirect hops.
+    """
+
+    PERMANENT_STATUSES = (301, 308)
+    # Permanent redirects are still re-checked after this long
+    MAX_AGE_SECONDS = 30 * 24 * 3600
+
+    def __init__(self, path=REDIRECTS_PATH):
+        self.path = Path(path)
+        self._redirects = None  # normalized source URL -> [target URL, stored_at]
+        self._lock = threading.Lock()
+
+    def _load(self):
+        # Called with the lock held
+        if self._redirects is None:
+            self._redirects = {}
+            try:
+                if self.path.exists():
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        self._redirects = json.load(f)
+            except Exception as e:
+                logger.warning(f"Error reading redirect cache: {str(e)}")
+        return self._redirects
+
+    def _save(self):
+        # Called with the lock held
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._redirects, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"Error writing redirect cache: {str(e)}")
+
+    def resolve(self, url):
+        """Follow remembered permanent redirects from url and return the final URL"""
+        with self._lock:
+            redirects = self._load()
+            seen = set()
+            current = url
+            while True:
+                key = normalize_url(current)
+                entry = redirects.get(key)
+                if not entry or key in seen or time.time() - entry[1] > self.MAX_AGE_SECONDS:
+                    return current
+                seen.add(key)
+                current = entry[0]
+
+    def record(self, hops, final_url):
+        """
+        Remember the permanent hops of a followed redirect chain.
+        hops is a list of (status, url) for each redirect response, in order.
+        """
+        added = False
+        with self._lock:
+            redirects = self._load()
+            for index, (status, url) in enumerate(hops):
+                if status not in self.PERMANENT_STATUSES:
+                    continue
+                target = hops[index + 1][1] if index + 1 < len(hops) else final_url
+                if normalize_url(target) != normalize_url(url):
+                    redirects[normalize_url(url)] = [target, time.time()]
+                    added = True
+            if added:
+                self._save()
+        return added
+
+
+_http_cache = None
+_http_cache_lock = threading.Lock()
+_redirect_cache = None
+
+
+def get_http_cache():
+    """Return the process-wide HTTP cache"""
+    global _http_cache
+    if _http_cache is None:
+        with _http_cache_lock:
+            if _http_cache is None:
+                _http_cache = HttpCache()
+    return _http_cache
+
+
+def get_redirect_cache():
+    """Return the process-wide permanent redirect cache"""
+    global _redirect_cache
+    if _redirect_cache is None:
+        with _http_cache_lock:
+            if _redirect_cache is None:
+                _redirect_cache = RedirectCache()
+    return _redirect_cache
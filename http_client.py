@@ -0,0 +1,607 @@
+"""
+Shared HTTP client for the content extractor.
+Keeps one pooled requests.Session alive for the whole server process so that
+sequential chapter reads reuse warm keep-alive connections instead of paying
+for a fresh DNS lookup, TCP connect and TLS handshake on every call.
+"""
+
+import codecs
+import os
+import re
+import threading
+import time
+import logging
+import zlib
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from http_cache import get_http_cache, get_redirect_cache
+from cookie_store import get_cookie_jar
+from latency_tracker import get_latency_tracker, install_connect_timing
+from transport_profile import get_transport_profiles
+from retry_policy import check_status, check_deadline
+from proxy_pool import get_proxy_pool
+from concurrency_control import get_domain_concurrency
+import http2_transport
+import dns_cache
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger("content_extractor")
+
+# Pool sizing - can be overridden with environment variables on the server
+# pool_connections: number of per-host pools kept alive
+# pool_maxsize: number of keep-alive connections kept per host
+DEFAULT_POOL_CONNECTIONS = int(os.environ.get("HTTP_POOL_CONNECTIONS", 20))
+DEFAULT_POOL_MAXSIZE = int(os.environ.get("HTTP_POOL_MAXSIZE", 10))
+
+# Largest response body we are willing to hold in memory
+MAX_BODY_BYTES = int(os.environ.get("HTTP_MAX_BODY_BYTES", 10 * 1024 * 1024))
+# Content types accepted as pages; anything else (PDFs, images, archives) is rejected
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml", "application/xml", "text/xml", "text/plain")
+# Additionally accepted from JSON chapter endpoints (see light_endpoints)
+JSON_CONTENT_TYPES = ("application/json",)
+# How much of the document is searched for a <meta charset> declaration
+CHARSET_SNIFF_BYTES = 4096
+
+# Content codings we can decode; brotli and zstd only when their packages are installed
+SUPPORTED_ENCODINGS = ("gzip", "deflate") + (("br",) if brotli else ()) + (("zstd",) if zstandard else ())
+# Accept-Encoding header sent by every fetch strategy
+ACCEPT_ENCODING = ", ".join(SUPPORTED_ENCODINGS)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def create_http_session(pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE):
+    """Create a requests.Session with per-host keep-alive pools of the given size"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        pool_block=False
+    )
+    # New connections report their connect time to the latency tracker, and
+    # resolve through the DNS cache and race the host's addresses
+    install_connect_timing(adapter.poolmanager)
+    dns_cache.install(adapter.poolmanager)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    # Cookies persist across requests and restarts
+    session.cookies = get_cookie_jar()
+    return session
+
+
+def get_http_session():
+    """
+    Return the process-wide pooled session, creating it on first use.
+    The underlying urllib3 pools are thread-safe, so the session can be shared
+    by the Streamlit script thread and any background workers.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_http_session()
+                logger.info(
+                    f"Created shared HTTP session (pool_connections={DEFAULT_POOL_CONNECTIONS}, "
+                    f"pool_maxsize={DEFAULT_POOL_MAXSIZE})"
+                )
+    return _session
+
+
+def close_http_session():
+    """Close the shared session and drop all pooled connections"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def prewarm_connections(urls):
+    """
+    Open pooled connections to the domains of the given URLs in the background,
+    once per process, so the first real request skips DNS and the handshakes.
+    """
+    def open_connection(origin):
+        verify = get_transport_profiles().ssl_verification(origin) and "truyensextv" not in origin
+        # The (empty) HEAD response is read in full, leaving the connection in the pool
+        get_http_session().head(origin, timeout=(5, 5), verify=verify, allow_redirects=False)
+
+    return dns_cache.prewarm(urls, open_connection)
+
+
+def get_domain_limit():
+    """Upper bound for simultaneous downloads per domain (0 = unlimited)"""
+    return get_domain_concurrency().ceiling
+
+
+def set_domain_limit(limit):
+    """Change the upper bound for simultaneous downloads per domain (0 = unlimited)"""
+    get_domain_concurrency().set_ceiling(limit)
+
+
+def domain_slot(url):
+    """
+    Return the adaptive (AIMD) limiter for concurrent downloads from the
+    URL's domain (see concurrency_control), or None when downloads are unlimited.
+    """
+    return get_domain_concurrency().limiter(url)
+
+
+class ResponseRejected(Exception):
+    """Raised when a response is not an HTML page or exceeds MAX_BODY_BYTES"""
+
+
+class BodyBuffer:
+    """
+    Collects response chunks into one bytearray, preallocated from
+    Content-Length when it is known, and enforces the body size limit.
+    """
+
+    def __init__(self, expected_length=None, max_bytes=MAX_BODY_BYTES):
+        self.max_bytes = max_bytes
+        if expected_length and expected_length > max_bytes:
+            raise ResponseRejected(f"Response body of {expected_length} bytes exceeds limit of {max_bytes} bytes")
+        self._buffer = bytearray(expected_length) if expected_length else bytearray()
+        self.size = 0
+
+    def append(self, chunk):
+        if not chunk:
+            return
+        end = self.size + len(chunk)
+        if end > self.max_bytes:
+            raise ResponseRejected(f"Response body exceeds limit of {self.max_bytes} bytes")
+        # Overwrites the preallocated space and grows the buffer past it if needed
+        self._buffer[self.size:end] = chunk
+        self.size = end
+
+    def getvalue(self):
+        del self._buffer[self.size:]
+        return self._buffer
+
+
+class _DeflateDecoder:
+    """Decodes "deflate" bodies, which servers send either zlib-wrapped or raw"""
+
+    def __init__(self):
+        self._first_try = True
+        self._data = b""
+        self._obj = zlib.decompressobj()
+
+    def decompress(self, data):
+        if not self._first_try:
+            return self._obj.decompress(data)
+        self._data += data
+        try:
+            decoded = self._obj.decompress(data)
+            if decoded:
+                self._first_try = False
+                self._data = b""
+            return decoded
+        except zlib.error:
+            # Not zlib-wrapped - restart as a raw deflate stream
+            self._first_try = False
+            self._obj = zlib.decompressobj(-zlib.MAX_WBITS)
+            try:
+                return self.decompress(self._data)
+            finally:
+                self._data = b""
+
+    def flush(self):
+        return self._obj.flush()
+
+
+class _BrotliDecoder:
+    def __init__(self):
+        self._obj = brotli.Decompressor()
+        # brotli exposes process(), brotlicffi exposes decompress()
+        self.decompress = getattr(self._obj, "decompress", None) or self._obj.process
+
+    def flush(self):
+        return b""
+
+
+class _ZstdDecoder:
+    def __init__(self):
+        self._obj = zstandard.ZstdDecompressor().decompressobj()
+
+    def decompress(self, data):
+        return self._obj.decompress(data)
+
+    def flush(self):
+        return b""
+
+
+def _make_decoder(coding):
+    if coding in ("gzip", "x-gzip"):
+        # 16 + MAX_WBITS expects a gzip header and trailer
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if coding == "deflate":
+        return _DeflateDecoder()
+    if coding == "br" and brotli:
+        return _BrotliDecoder()
+    if coding == "zstd" and zstandard:
+        return _ZstdDecoder()
+    raise ResponseRejected(f"Unsupported Content-Encoding: {coding}")
+
+
+class ContentDecoder:
+    """
+    Incrementally decodes a response body according to its Content-Encoding.
+    Several codings ("gzip, br") are undone in reverse order of application.
+    """
+
+    def __init__(self, content_encoding=None):
+        codings = [c.strip().lower() for c in (content_encoding or "").split(",")]
+        codings = [c for c in codings if c and c != "identity"]
+        self.encoding = ", ".join(codings) or None
+        self._decoders = [_make_decoder(c) for c in reversed(codings)]
+
+    def decompress(self, data):
+        for decoder in self._decoders:
+            if not data:
+                break
+            data = decoder.decompress(data)
+        return data
+
+    def flush(self):
+        data = b""
+        for decoder in self._decoders:
+            if data:
+                data = decoder.decompress(data)
+            data += decoder.flush()
+        return data
+
+
+class TransferStats:
+    """Bytes received on the wire versus bytes after Content-Encoding decoding, the proxy and protocol used"""
+
+    __slots__ = ("encoding", "transferred", "decoded", "proxy", "protocol")
+
+    def __init__(self):
+        self.encoding = None
+        self.transferred = 0
+        self.decoded = 0
+        self.proxy = None
+        self.protocol = None
+
+    def describe(self):
+        via = f" via proxy {self.proxy}" if self.proxy else ""
+        if self.protocol == "HTTP/2":
+            via += " over HTTP/2"
+        if not self.encoding:
+            return f"{self.transferred} bytes transferred uncompressed{via}"
+        ratio = self.decoded / self.transferred if self.transferred else 0
+        return f"{self.transferred} bytes transferred as {self.encoding} ({ratio:.1f}x){via}"
+
+
+def check_response_headers(headers, content_types=HTML_CONTENT_TYPES):
+    """Reject responses that are not one of content_types or announce a body larger than MAX_BODY_BYTES"""
+    content_type = (headers.get("Content-Type") or "").split(";")[0].strip().lower()
+    if content_type and content_type not in content_types:
+        raise ResponseRejected(f"Unsupported Content-Type: {content_type}")
+    try:
+        content_length = int(headers.get("Content-Length") or 0)
+    except ValueError:
+        content_length = 0
+    if content_length > MAX_BODY_BYTES:
+        raise ResponseRejected(f"Response body of {content_length} bytes exceeds limit of {MAX_BODY_BYTES} bytes")
+    # Content-Length is the compressed size when Content-Encoding is set, so only use it as a size hint otherwise
+    if headers.get("Content-Encoding") not in (None, "", "identity"):
+        return None
+    return content_length or None
+
+
+def _raw_chunks(response, chunk_size):
+    """Iterate over the still-encoded body of a requests, urllib3, http.client or httpx response"""
+    if hasattr(response, "iter_raw"):
+        return response.iter_raw(chunk_size)
+    raw = getattr(response, "raw", response)
+    # read1() returns what has arrived instead of waiting for a whole chunk, so watchers
+    # and deadlines see a slowly sent page as it comes in
+    if hasattr(raw, "stream"):
+        # requests and urllib3 would decode gzip/deflate themselves - we decode every coding in one place instead
+        if hasattr(raw, "read1"):
+            return iter(lambda: raw.read1(chunk_size, decode_content=False), b"")
+        return raw.stream(chunk_size, decode_content=False)
+    if hasattr(raw, "read1"):
+        return iter(lambda: raw.read1(chunk_size), b"")
+    return iter(lambda: raw.read(chunk_size), b"")
+
+
+def read_response_body(response, chunk_size=65536, watcher=None, stats=None, content_types=HTML_CONTENT_TYPES,
+                       deadline=None):
+    """
+    Read a streamed requests, urllib3, http.client or httpx response into one buffer
+    after checking its headers, undoing any gzip/deflate/br/zstd Content-Encoding.
+    When a watcher (see html_stream) is given, the read stops as soon as the
+    watcher reports that the rest of the page is not needed.
+    A TransferStats passed as stats receives the transferred and decoded sizes.
+    deadline (a time.monotonic() value, usually RetryBudget.deadline) bounds the
+    whole read: the read timeout only limits each wait for the next chunk, so a
+    server trickling the page out would otherwise never be stopped.
+    """
+    expected_length = check_response_headers(response.headers, content_types)
+    decoder = ContentDecoder(response.headers.get("Content-Encoding"))
+    buffer = BodyBuffer(expected_length)
+    if stats is None:
+        stats = TransferStats()
+    stats.encoding = decoder.encoding
+    if watcher:
+        watcher.start(response.headers.get("Content-Type"))
+
+    stopped = False
+    for raw_chunk in _raw_chunks(response, chunk_size):
+        check_deadline(deadline)
+        stats.transferred += len(raw_chunk)
+        chunk = decoder.decompress(raw_chunk)
+        buffer.append(chunk)
+        if watcher and chunk and watcher.feed(chunk):
+            stopped = True
+            break
+    if not stopped:
+        buffer.append(decoder.flush())
+    stats.decoded = buffer.size
+    return buffer.getvalue()
+
+
+def _valid_charset(name):
+    if not name:
+        return None
+    name = name.strip().strip('"\'').lower()
+    try:
+        return codecs.lookup(name).name
+    except LookupError:
+        return None
+
+
+META_CHARSET_PATTERN = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([A-Za-z0-9_.:-]+)', re.IGNORECASE)
+
+
+def detect_charset(body, content_type=None):
+    """
+    Work out the character encoding of a page.
+    Checks, in order: byte order mark, charset in the Content-Type header,
+    <meta charset> in the first few KB, then whether the body is valid UTF-8.
+    """
+    if body.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if body.startswith(codecs.BOM_UTF16_LE) or body.startswith(codecs.BOM_UTF16_BE):
+        return "utf-16"
+
+    if content_type:
+        for param in content_type.split(";")[1:]:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "charset":
+                charset = _valid_charset(value)
+                if charset:
+                    return charset
+
+    match = META_CHARSET_PATTERN.search(bytes(body[:CHARSET_SNIFF_BYTES]))
+    if match:
+        charset = _valid_charset(match.group(1).decode("ascii", errors="ignore"))
+        if charset:
+            return charset
+
+    try:
+        body.decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+
+    try:
+        from charset_normalizer import from_bytes
+        best = from_bytes(bytes(body[:65536])).best()
+        if best and _valid_charset(best.encoding):
+            return _valid_charset(best.encoding)
+    except ImportError:
+        pass
+    return "windows-1258"
+
+
+def decode_body(body, content_type=None):
+    """Decode a response body exactly once using the detected charset"""
+    return body.decode(detect_charset(body, content_type), errors='replace')
+
+
+def _download(url, headers, timeout, verify, watcher=None, stats=None, content_types=HTML_CONTENT_TYPES,
+              deadline=None):
+    """
+    Stream a response body through the shared session (and a proxy from the
+    proxy pool, when one is configured) and return (response, body bytes).
+    https pages go over HTTP/2 instead when it is switched on (see http2_transport).
+    """
+    session = get_http_session()
+    slot = domain_slot(url)
+    if slot:
+        slot.acquire(timeout)
+    error = None
+    try:
+        if http2_transport.enabled_for(url):
+            try:
+                return http2_transport.download(url, headers, timeout, verify, watcher, stats, content_types,
+                                                deadline)
+            except http2_transport.Http2Unavailable:
+                # Start over on HTTP/1.1; a watcher that already saw part of the page cannot be reused
+                if getattr(watcher, "bytes_seen", 0):
+                    watcher = None
+                if stats is not None:
+                    stats.transferred = stats.decoded = 0
+                    stats.protocol = None
+        with get_proxy_pool().lease(timeout) as lease:
+            if stats is not None and lease.proxy:
+                stats.proxy = lease.proxy.label
+            try:
+                response = session.get(url, headers=headers, timeout=timeout, verify=verify, stream=True,
+                                       proxies=lease.proxies)
+            except requests.exceptions.ReadTimeout:
+                get_latency_tracker().record_timeout(url, "first_byte")
+                raise
+            get_latency_tracker().record_first_byte(url, response.elapsed.total_seconds())
+            lease.record_latency(response.elapsed.total_seconds())
+            try:
+                record_redirects(response)
+                # 429/503 and similar are raised as RetryableStatus for the retry policy
+                check_status(response.status_code, response.headers)
+                body = read_response_body(response, watcher=watcher, stats=stats, content_types=content_types,
+                                          deadline=deadline)
+            finally:
+                # Closing also drops the connection when the read stopped early
+                response.close()
+    except BaseException as e:
+        # 429/503 and timeouts shrink the domain's concurrency limit
+        error = e
+        raise
+    finally:
+        if slot:
+            slot.release(error)
+        get_cookie_jar().save_if_dirty()
+    return response, body
+
+
+def record_redirects(response):
+    """Remember the 301/308 hops a requests (or httpx) response went through"""
+    if response.history:
+        get_redirect_cache().record([(hop.status_code, str(hop.url)) for hop in response.history], str(response.url))
+
+
+def resolve_redirects(url, debug_info):
+    """Replace url by the final URL of its remembered permanent redirects"""
+    target = get_redirect_cache().resolve(url)
+    if target != url:
+        debug_info.append(f"Following remembered permanent redirect to {target}")
+    return target
+
+
+def _revalidate(url, headers, timeout, verify, entry, variant=None):
+    """Revalidate a cached entry with If-None-Match/If-Modified-Since and update the cache"""
+    cache = get_http_cache()
+    request_headers = dict(headers)
+    request_headers.update(cache.conditional_headers(entry))
+    response, body = _download(url, request_headers, timeout, verify)
+    store_response(url, response.status_code, response.headers, body, entry, variant=variant,
+                   final_url=str(response.url))
+    return response, body
+
+
+def lookup_cache(url, headers, timeout, verify, debug_info, allow_partial=False, variant=None):
+    """
+    Check the HTTP cache for a URL.
+    Returns (html, entry): html is set when the cached copy can be served
+    (stale copies are revalidated in the background); otherwise entry holds
+    an expired copy whose validators should be sent with the request.
+    Pages whose download was stopped early are only used when allow_partial is set.
+    variant selects the copy of a page requested differently (see HttpCache).
+    """
+    cache = get_http_cache()
+    entry = cache.get(url, variant)
+    if not entry or (entry.get("partial") and not allow_partial):
+        return None, None
+    if entry.get("revalidate"):
+        debug_info.append("Cached copy requires revalidation (Cache-Control), revalidating before use")
+        return None, entry
+
+    age = cache.age(entry)
+    if age < cache.fresh_seconds:
+        debug_info.append(f"Serving cached copy ({age:.0f}s old)")
+        return decode_body(entry["body"], entry.get("content_type")), entry
+    if age < cache.max_stale_seconds:
+        started = cache.start_revalidation(
+            url, lambda u: _revalidate(u, headers, timeout, verify, entry, variant), variant
+        )
+        debug_info.append(
+            f"Serving stale cached copy ({age:.0f}s old)"
+            + (", revalidating in background" if started else "")
+        )
+        return decode_body(entry["body"], entry.get("content_type")), entry
+
+    debug_info.append("Cached copy expired, revalidating before use")
+    return None, entry
+
+
+def store_response(url, status_code, headers, body, entry=None, partial=False, variant=None, final_url=None):
+    """
+    Update the HTTP cache with a response and return the HTML to use.
+    A 304 refreshes the cached entry and returns its body.
+    final_url is where the response came from after redirects, kept with the entry.
+    """
+    cache = get_http_cache()
+    if status_code == 304 and entry:
+        cache.touch(url, variant, headers)
+        return decode_body(entry["body"], entry.get("content_type"))
+    if status_code == 200:
+        cache.put(url, body, headers, partial, variant, final_url)
+    return decode_body(body, headers.get("Content-Type"))
+
+
+def fetch_html(url, headers, timeout, verify=True, debug_info=None, use_cache=True, watcher=None,
+               content_types=HTML_CONTENT_TYPES, cache_variant=None, deadline=None):
+    """Fetch a page and return its HTML as text (see fetch_page)"""
+    return fetch_page(url, headers, timeout, verify, debug_info, use_cache, watcher, content_types, cache_variant,
+                      deadline)[0]
+
+
+def fetch_page(url, headers, timeout, verify=True, debug_info=None, use_cache=True, watcher=None,
+               content_types=HTML_CONTENT_TYPES, cache_variant=None, deadline=None):
+    """
+    Fetch a page and return (HTML as text, URL it was finally served from).
+    The final URL follows remembered permanent redirects and live redirects,
+    and is kept in the HTTP cache with the page; relative links in the page
+    are relative to it, not to the requested URL.
+    Cached copies are served straight from disk; stale ones are revalidated in
+    the background, and expired ones are revalidated before returning.
+    Responses whose Content-Type is not in content_types are rejected.
+    With a watcher (see html_stream), the download stops once the chapter
+    content has arrived and the truncated page is returned.
+    cache_variant keeps pages requested differently (e.g. with another
+    User-Agent) apart from the plain page in the HTTP cache.
+    deadline bounds the download end to end (see read_response_body).
+    Network errors (including requests.exceptions.SSLError) are raised to the caller.
+    """
+    if debug_info is None:
+        debug_info = []
+    url = resolve_redirects(url, debug_info)
+
+    stats = TransferStats()
+    if not use_cache:
+        response, body = _download(url, headers, timeout, verify, watcher, stats, content_types, deadline)
+        log_download(response.status_code, body, watcher, debug_info, stats)
+        return decode_body(body, response.headers.get("Content-Type")), str(response.url)
+
+    html, entry = lookup_cache(url, headers, timeout, verify, debug_info, allow_partial=watcher is not None,
+                               variant=cache_variant)
+    if html is not None:
+        return html, entry.get("final_url") or url
+
+    request_headers = dict(headers)
+    if entry:
+        request_headers.update(get_http_cache().conditional_headers(entry))
+    response, body = _download(url, request_headers, timeout, verify, watcher, stats, content_types, deadline)
+    log_download(response.status_code, body, watcher, debug_info, stats)
+    partial = bool(watcher and watcher.stopped_early)
+    final_url = str(response.url)
+    html = store_response(url, response.status_code, response.headers, body, entry, partial, cache_variant, final_url)
+    return html, final_url
+
+
+def log_download(status_code, body, watcher, debug_info, stats=None):
+    """Record the size of a download, noting when it was stopped early"""
+    debug_info.append(f"Downloaded {len(body)} bytes (HTTP {status_code})")
+    if stats:
+        debug_info.append(f"Transfer: {stats.describe()}")
+    if watcher and watcher.stopped_early:
+        debug_info.append("Stopped download early: chapter content and navigation already received")
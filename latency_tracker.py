@@ -0,0 +1,248 @@
+"""
+Per-domain latency tracking for adaptive timeouts.
+Connect times and times to first byte are recorded for every download into
+small log-scale histograms, one pair per domain. Once a domain has enough
+samples, its connect/read timeouts are set from the observed p99 plus
+headroom instead of the fixed 30-60 second values, so a host that has gone
+dead fails within seconds and the fallback strategies start sooner.
+Attempts that time out are counted, not recorded as samples: only a slow
+response that actually arrives widens a domain's timeouts.
+The histograms are saved to disk on shutdown and reloaded on start.
+"""
+
+import atexit
+import json
+import logging
+import math
+import os
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError
+
+logger = logging.getLogger("content_extractor")
+
+STATE_PATH = Path(os.environ.get("LATENCY_STATE_PATH", ".cache/latency.json"))
+
+# Timeouts are the observed p99 multiplied by this factor
+TIMEOUT_HEADROOM = float(os.environ.get("LATENCY_TIMEOUT_HEADROOM", 2.0))
+# Never go below these, however fast a domain has been
+MIN_CONNECT_TIMEOUT = float(os.environ.get("LATENCY_MIN_CONNECT_TIMEOUT", 3.0))
+MIN_READ_TIMEOUT = float(os.environ.get("LATENCY_MIN_READ_TIMEOUT", 5.0))
+# Samples needed before a domain's learned timeouts replace the configured ones
+MIN_SAMPLES = 20
+# Histogram counts are halved after this many samples so old behaviour fades out
+DECAY_EVERY = 500
+
+# Log-scale buckets from 10ms up to ~150s, each 25% wider than the last
+BUCKET_BASE = 0.01
+BUCKET_GROWTH = 1.25
+BUCKET_COUNT = 44
+
+
+class LatencyHistogram:
+    """Streaming histogram of durations with roughly 12% relative error on quantiles"""
+
+    def __init__(self, counts=None):
+        self.counts = list(counts) if counts else [0.0] * BUCKET_COUNT
+        self.total = sum(self.counts)
+        self.added = 0
+
+    @staticmethod
+    def _bucket(seconds):
+        if seconds <= BUCKET_BASE:
+            return 0
+        index = int(math.log(seconds / BUCKET_BASE, BUCKET_GROWTH)) + 1
+        return min(index, BUCKET_COUNT - 1)
+
+    def add(self, seconds):
+        self.counts[self._bucket(seconds)] += 1
+        self.total += 1
+        self.added += 1
+        if self.added % DECAY_EVERY == 0:
+            self.counts = [count / 2 for count in self.counts]
+            self.total = sum(self.counts)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile, or None when empty"""
+        if not self.total:
+            return None
+        threshold = q * self.total
+        running = 0.0
+        for index, count in enumerate(self.counts):
+            running += count
+            if running >= threshold:
+                return BUCKET_BASE * BUCKET_GROWTH ** index
+        return BUCKET_BASE * BUCKET_GROWTH ** (BUCKET_COUNT - 1)
+
+
+class DomainLatencyTracker:
+    """Thread-safe per-domain connect and first-byte latency histograms"""
+
+    def __init__(self):
+        self._connect = {}
+        self._first_byte = {}
+        # (kind, domain) -> attempts that timed out since the last sample of that kind
+        self._timeouts = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(domain_or_url):
+        if "://" in domain_or_url:
+            domain_or_url = urlparse(domain_or_url).hostname or ""
+        return domain_or_url.lower()
+
+    def _record(self, histograms, domain, seconds):
+        kind = "connect" if histograms is self._connect else "first_byte"
+        with self._lock:
+            self._timeouts.pop((kind, domain), None)
+            histogram = histograms.get(domain)
+            if histogram is None:
+                histogram = histograms[domain] = LatencyHistogram()
+            histogram.add(seconds)
+
+    def record_connect(self, domain, seconds):
+        """Record the time taken to open a connection (TCP plus TLS handshake)"""
+        self._record(self._connect, self._key(domain), seconds)
+
+    def record_first_byte(self, domain, seconds):
+        """Record the time from sending a request until the response headers arrived"""
+        self._record(self._first_byte, self._key(domain), seconds)
+
+    def record_timeout(self, domain, kind="first_byte"):
+        """
+        Count an attempt that timed out while connecting ("connect") or waiting
+        for the response headers ("first_byte"). The wait is not a latency sample:
+        it only says the host did not answer within the timeout it was given, and
+        recording it would push p99 up to that timeout and widen the next one.
+        """
+        key = (kind, self._key(domain))
+        with self._lock:
+            self._timeouts[key] = self._timeouts.get(key, 0) + 1
+
+    def consecutive_timeouts(self, domain, kind="first_byte"):
+        """Attempts on a domain that timed out since its last sample of this kind"""
+        with self._lock:
+            return self._timeouts.get((kind, self._key(domain)), 0)
+
+    def percentile(self, domain, kind="first_byte", q=0.99):
+        histograms = self._connect if kind == "connect" else self._first_byte
+        with self._lock:
+            histogram = histograms.get(self._key(domain))
+            if histogram is None or histogram.total < MIN_SAMPLES:
+                return None
+            return histogram.quantile(q)
+
+    def suggest_timeouts(self, domain, ceiling):
+        """
+        Return (connect, read) timeouts for a domain from its p99 latencies.
+        `ceiling` is the configured (connect, read) pair; learned values never
+        exceed it, and it is returned unchanged for domains with too few samples.
+        """
+        connect_p99 = self.percentile(domain, "connect")
+        first_byte_p99 = self.percentile(domain, "first_byte")
+        connect_ceiling, read_ceiling = ceiling
+        connect_timeout = connect_ceiling
+        read_timeout = read_ceiling
+        if connect_p99 is not None:
+            connect_timeout = min(connect_ceiling, max(MIN_CONNECT_TIMEOUT, connect_p99 * TIMEOUT_HEADROOM))
+        if first_byte_p99 is not None:
+            read_timeout = min(read_ceiling, max(MIN_READ_TIMEOUT, first_byte_p99 * TIMEOUT_HEADROOM))
+        return round(connect_timeout, 1), round(read_timeout, 1)
+
+    def snapshot(self, path=STATE_PATH):
+        """Write all histograms to disk as JSON"""
+        try:
+            path = Path(path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with self._lock:
+                state = {
+                    "connect": {domain: h.counts for domain, h in self._connect.items()},
+                    "first_byte": {domain: h.counts for domain, h in self._first_byte.items()},
+                }
+            tmp_path = path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, path)
+            return True
+        except Exception as e:
+            logger.error(f"Error saving latency statistics: {str(e)}")
+            return False
+
+    def load(self, path=STATE_PATH):
+        """Reload histograms written by snapshot()"""
+        try:
+            path = Path(path)
+            if not path.exists():
+                return 0
+            with open(path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            with self._lock:
+                for kind, histograms in (("connect", self._connect), ("first_byte", self._first_byte)):
+                    for domain, counts in state.get(kind, {}).items():
+                        if len(counts) == BUCKET_COUNT:
+                            histograms[domain] = LatencyHistogram(counts)
+            logger.info(f"Loaded latency statistics for {len(state.get('first_byte', {}))} domains from {path}")
+            return len(state.get("first_byte", {}))
+        except Exception as e:
+            logger.error(f"Error loading latency statistics: {str(e)}")
+            return 0
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def get_latency_tracker():
+    """Return the process-wide latency tracker, loading saved statistics on first use"""
+    global _tracker
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                tracker = DomainLatencyTracker()
+                tracker.load()
+                atexit.register(tracker.snapshot)
+                _tracker = tracker
+    return _tracker
+
+
+class _TimedConnectMixin:
+    """Records how long urllib3 takes to open each new connection"""
+
+    def connect(self):
+        start = time.monotonic()
+        try:
+            super().connect()
+        except (ConnectTimeoutError, TimeoutError):
+            get_latency_tracker().record_timeout(self.host, "connect")
+            raise
+        get_latency_tracker().record_connect(self.host, time.monotonic() - start)
+
+
+class TimedHTTPConnection(_TimedConnectMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimedConnectMixin, HTTPSConnection):
+    pass
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+def install_connect_timing(pool_manager):
+    """Make a urllib3 PoolManager (or requests adapter's pool manager) record connect times"""
+    pool_manager.pool_classes_by_scheme = {
+        "http": TimedHTTPConnectionPool,
+        "https": TimedHTTPSConnectionPool,
+    }
+    return pool_manager
@@ -0,0 +1,287 @@
+"""
+Lighter chapter endpoints.
+Many novel sites serve the same chapter in a much smaller form than the
+desktop reader page: an AMP or mobile page, a print view, a JSON API behind
+the reader, or simply a leaner page for a mobile User-Agent. Sites can
+declare such an endpoint in SITE_ENDPOINTS; for other sites the full page is
+scanned for <link rel="amphtml"> and mobile/print rel="alternate" links, and
+the URL pattern of the first one found is remembered for the domain in its
+transport profile. Later chapters are fetched from the lighter endpoint, and
+the full page is used whenever it does not yield the chapter. An endpoint
+that keeps failing, or turns out not to be smaller, is dropped.
+"""
+
+import json
+import logging
+import os
+import re
+import time
+from urllib.parse import urlsplit, urlunsplit, urljoin, parse_qsl, urlencode
+
+from http_client import HTML_CONTENT_TYPES, JSON_CONTENT_TYPES
+from html_stream import watcher_for_url
+from transport_profile import get_transport_profiles
+
+logger = logging.getLogger("content_extractor")
+
+# Set to 0 to always fetch the full desktop page
+LIGHT_ENDPOINTS_ENABLED = os.environ.get("LIGHT_ENDPOINTS", "1") != "0"
+# Consecutive failures after which a domain's lighter endpoint is dropped
+MAX_LIGHT_FAILURES = 3
+# Domains without a lighter endpoint are looked at again after this long
+LIGHT_RECHECK_SECONDS = 7 * 24 * 3600
+# A lighter page must yield at least this much chapter text to be used
+MIN_LIGHT_CONTENT = 500
+# How much of a page is searched for <link> declarations
+LINK_SCAN_CHARS = 64 * 1024
+# Share of the remaining time budget a lighter endpoint may use, so the full page can still be fetched
+LIGHT_BUDGET_SHARE = 0.4
+
+MOBILE_USER_AGENT = ('Mozilla/5.0 (Linux; Android 13; SM-S911B) AppleWebKit/537.36 '
+                     '(KHTML, like Gecko) Chrome/120.0.0.0 Mobile Safari/537.36')
+
+# Declared endpoints, tried before auto-detection. Kinds:
+#   mobile_ua - same URL requested with MOBILE_USER_AGENT
+#   amp / mobile / print - URL derived with "rule" (see apply_rule)
+#   json - URL derived with "rule", response turned into HTML by JSON_CONVERTERS[converter]
+SITE_ENDPOINTS = {
+    # The desktop reader embeds large settings panels (the source of the
+    # ui_strings noise removed in extract_metruyencv)
+    "metruyencv.com": {"kind": "mobile_ua"},
+}
+
+# name -> function(parsed JSON) returning an HTML document, for "json" endpoints
+JSON_CONVERTERS = {}
+
+LINK_TAG_PATTERN = re.compile(r'<link\b[^>]*>', re.IGNORECASE)
+ATTRIBUTE_PATTERN = re.compile(r'([a-zA-Z-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+
+
+def _link_attributes(tag):
+    return {name.lower(): first or second for name, first, second in ATTRIBUTE_PATTERN.findall(tag)}
+
+
+def derive_rule(page_url, alternate_url):
+    """
+    Describe how alternate_url is built from page_url so it can be applied to
+    other chapters of the site. Returns None for URLs with no reusable pattern
+    (e.g. ones built from a post id).
+    """
+    page = urlsplit(page_url)
+    alternate = urlsplit(alternate_url)
+    if alternate.netloc != page.netloc:
+        if alternate.path == page.path and alternate.query == page.query:
+            return {"type": "host", "value": alternate.netloc, "origin": page.netloc}
+        return None
+    if alternate.path == page.path:
+        page_params = parse_qsl(page.query, keep_blank_values=True)
+        alternate_params = parse_qsl(alternate.query, keep_blank_values=True)
+        extra = [param for param in alternate_params if param not in page_params]
+        if extra and all(param in alternate_params for param in page_params):
+            return {"type": "query", "value": extra}
+        return None
+    if alternate.query != page.query:
+        return None
+    base = page.path.rstrip("/")
+    if base and alternate.path.startswith(base + "/"):
+        return {"type": "path_suffix", "value": alternate.path[len(base):]}
+    if page.path and alternate.path.endswith(page.path):
+        return {"type": "path_prefix", "value": alternate.path[:-len(page.path)]}
+    return None
+
+
+def apply_rule(rule, url):
+    """Build the lighter URL of a chapter from its canonical URL"""
+    parts = urlsplit(url)
+    kind = rule["type"]
+    value = rule["value"]
+    if kind == "host":
+        return urlunsplit(parts._replace(netloc=value))
+    if kind == "query":
+        params = parse_qsl(parts.query, keep_blank_values=True)
+        params += [tuple(param) for param in value if tuple(param) not in params]
+        return urlunsplit(parts._replace(query=urlencode(params)))
+    if kind == "path_suffix":
+        return urlunsplit(parts._replace(path=parts.path.rstrip("/") + value))
+    if kind == "path_prefix":
+        return urlunsplit(parts._replace(path=value + parts.path))
+    return url
+
+
+def canonical_url(rule, url):
+    """Undo apply_rule on a link found in a lighter page, so navigation keeps canonical URLs"""
+    if not url or not rule:
+        return url
+    parts = urlsplit(url)
+    kind = rule["type"]
+    value = rule["value"]
+    if kind == "host" and parts.netloc == value:
+        return urlunsplit(parts._replace(netloc=rule["origin"]))
+    if kind == "query":
+        extra = [tuple(param) for param in value]
+        params = [param for param in parse_qsl(parts.query, keep_blank_values=True) if param not in extra]
+        return urlunsplit(parts._replace(query=urlencode(params)))
+    if kind == "path_suffix" and parts.path.endswith(value):
+        path = parts.path[:-len(value)] + ("/" if value.endswith("/") else "")
+        return urlunsplit(parts._replace(path=path))
+    if kind == "path_prefix" and parts.path.startswith(value + "/"):
+        return urlunsplit(parts._replace(path=parts.path[len(value):]))
+    return url
+
+
+def discover(url, html):
+    """Find an AMP, mobile or print version declared in a page's <link> tags"""
+    found = {}
+    for tag in LINK_TAG_PATTERN.findall(html[:LINK_SCAN_CHARS]):
+        attributes = _link_attributes(tag)
+        rel = attributes.get("rel", "").lower().split()
+        href = attributes.get("href")
+        if not href:
+            continue
+        media = attributes.get("media", "").lower()
+        if "amphtml" in rel:
+            found.setdefault("amp", href)
+        elif "alternate" in rel and ("handheld" in media or "max-width" in media):
+            found.setdefault("mobile", href)
+        elif "alternate" in rel and media == "print":
+            found.setdefault("print", href)
+
+    for kind in ("amp", "mobile", "print"):
+        if kind in found:
+            rule = derive_rule(url, urljoin(url, found[kind]))
+            if rule:
+                return {"kind": kind, "rule": rule}
+    return None
+
+
+def declared_endpoint(url):
+    """Copy of the SITE_ENDPOINTS entry for a URL's domain, or None"""
+    domain = urlsplit(url).netloc.lower()
+    for site, endpoint in SITE_ENDPOINTS.items():
+        if site in domain:
+            return dict(endpoint)
+    return None
+
+
+def learn_from_page(url, html, debug_info):
+    """
+    Called with every full page fetched. Records the page size the lighter
+    endpoint has to beat and, for domains without one, looks for an endpoint.
+    For sites with a streaming rule the page was cut off once the chapter had
+    arrived; lighter pages of such sites are fetched with the same watcher,
+    so both sizes are measured the same way.
+    """
+    if not LIGHT_ENDPOINTS_ENABLED:
+        return
+    profiles = get_transport_profiles()
+    profile = profiles.get(url)
+    endpoint = profile.get("light_endpoint")
+    if endpoint:
+        if not endpoint.get("full_size"):
+            profiles.record_light_endpoint(url, dict(endpoint, full_size=len(html)))
+        return
+    if "light_endpoint" in profile and time.time() - profile.get("light_checked_at", 0) < LIGHT_RECHECK_SECONDS:
+        return
+
+    endpoint = declared_endpoint(url) or discover(url, html)
+    if endpoint:
+        endpoint["full_size"] = len(html)
+        debug_info.append(f"Found lighter {endpoint['kind']} endpoint for this domain, using it from the next chapter")
+    profiles.record_light_endpoint(url, endpoint)
+
+
+class LightAttempt:
+    """One fetch of a chapter from its domain's lighter endpoint"""
+
+    __slots__ = ("page_url", "url", "headers", "endpoint", "content_types", "cache_variant", "watcher")
+
+    def __init__(self, page_url, headers, endpoint):
+        self.page_url = page_url
+        self.endpoint = endpoint
+        self.headers = dict(headers)
+        self.content_types = HTML_CONTENT_TYPES
+        # The mobile page has the desktop page's URL, so it is cached as a variant of it
+        self.cache_variant = None
+        if endpoint["kind"] == "mobile_ua":
+            self.url = page_url
+            self.headers["User-Agent"] = MOBILE_USER_AGENT
+            self.cache_variant = "mobile"
+        else:
+            self.url = apply_rule(endpoint["rule"], page_url)
+        self.watcher = None
+        if endpoint["kind"] == "json":
+            self.headers["Accept"] = "application/json"
+            self.content_types = HTML_CONTENT_TYPES + JSON_CONTENT_TYPES
+        else:
+            # Stop where the full page download stops too (see learn_from_page)
+            self.watcher = watcher_for_url(self.url)
+
+    def describe(self):
+        if self.endpoint["kind"] == "mobile_ua":
+            return "Trying lighter endpoint: mobile User-Agent"
+        return f"Trying lighter {self.endpoint['kind']} endpoint: {self.url}"
+
+    def limits(self, budget, timeouts):
+        """
+        (connect, read) timeouts and the time.monotonic() deadline of the
+        attempt: cut down to the budget, and to a share of what is left of it
+        so a hanging or trickling endpoint leaves time for the full page.
+        """
+        connect_timeout, read_timeout = budget.attempt_timeouts(timeouts)
+        cap = round(budget.remaining() * LIGHT_BUDGET_SHARE, 2)
+        return (min(connect_timeout, cap), min(read_timeout, cap)), time.monotonic() + cap
+
+    def to_html(self, text):
+        """Turn the response into an HTML document for extract_from_html"""
+        if self.endpoint["kind"] == "json":
+            return JSON_CONVERTERS[self.endpoint["converter"]](json.loads(text))
+        return text
+
+    def accept_page(self, html, debug_info):
+        """Reject pages that are not actually smaller than the full page"""
+        full_size = self.endpoint.get("full_size")
+        if full_size and len(html) >= full_size:
+            debug_info.append(f"Lighter endpoint returned {len(html)} characters, no smaller than the full page")
+            self.fail("not smaller than the full page", debug_info, drop=True)
+            return False
+        return True
+
+    def accept_result(self, result, debug_info):
+        """
+        Return the extraction result with navigation links mapped back to
+        canonical URLs, or None when the full page has to be fetched instead.
+        """
+        title, content, execution_time, debug_text, prev_chapter_url, next_chapter_url = result
+        if not content or len(content) < MIN_LIGHT_CONTENT:
+            self.fail("no chapter content", debug_info)
+            return None
+        if not prev_chapter_url and not next_chapter_url:
+            self.fail("no chapter navigation", debug_info)
+            return None
+        if self.endpoint.get("failures"):
+            get_transport_profiles().record_light_endpoint(self.page_url, dict(self.endpoint, failures=0))
+        rule = self.endpoint.get("rule")
+        return (title, content, execution_time, debug_text,
+                canonical_url(rule, prev_chapter_url), canonical_url(rule, next_chapter_url))
+
+    def fail(self, reason, debug_info, drop=False):
+        failures = self.endpoint.get("failures", 0) + 1
+        debug_info.append(f"Lighter endpoint failed ({reason}), falling back to the full page")
+        if drop or failures >= MAX_LIGHT_FAILURES:
+            debug_info.append("Dropping the lighter endpoint for this domain")
+            get_transport_profiles().record_light_endpoint(self.page_url, None)
+        else:
+            get_transport_profiles().record_light_endpoint(self.page_url, dict(self.endpoint, failures=failures))
+
+
+def plan(url, headers):
+    """Return a LightAttempt for a chapter URL, or None when the full page should be fetched"""
+    if not LIGHT_ENDPOINTS_ENABLED:
+        return None
+    endpoint = get_transport_profiles().get(url).get("light_endpoint")
+    # Endpoints are only used once the size of the full page is known
+    if not endpoint or not endpoint.get("full_size"):
+        return None
+    if endpoint["kind"] == "json" and endpoint.get("converter") not in JSON_CONVERTERS:
+        return None
+    return LightAttempt(url, headers, endpoint)
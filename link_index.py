@@ -0,0 +1,129 @@
+"""
+Index of a page's links for chapter navigation.
+LinkIndex collects every <a> of a parsed page once, with its lowercased and
+stripped text, rel, classes, id and the absolute URL of its href (resolved
+against the page URL and <base>, with urljoin). The navigation strategies
+(site-specific classes, markup conventions, link text) query the index
+instead of each searching the tree and reading every link's text again.
+"""
+
+from urllib.parse import urljoin, urlsplit
+
+# Markup conventions for chapter navigation links, tried in order (see LinkIndex.first)
+NEXT_LINK_PATTERNS = [
+    {"classes": ["next-chap", "next_chapter", "next", "next-chapter"], "rel": "next"},
+    {"inside": ["next-chap", "next_chapter", "next", "next-chapter"]},
+    {"ids": ["next_chap", "next_chapter", "next"]},
+]
+PREV_LINK_PATTERNS = [
+    {"classes": ["prev-chap", "prev_chapter", "prev", "previous-chapter"], "rel": "prev"},
+    {"inside": ["prev-chap", "prev_chapter", "prev", "previous-chapter"]},
+    {"ids": ["prev_chap", "prev_chapter", "previous"]},
+]
+
+
+def _classes(element):
+    classes = element.get("class") or ()
+    if isinstance(classes, str):
+        classes = classes.split()
+    return frozenset(classes)
+
+
+def resolve_url(base, href):
+    """Absolute http(s) URL of an href, or None (no href, javascript:, mailto:...)"""
+    if not href:
+        return None
+    href = href.strip()
+    if not href:
+        return None
+    url = urljoin(base, href)
+    return url if urlsplit(url).scheme in ("http", "https") else None
+
+
+class Anchor:
+    """One link of a page"""
+
+    __slots__ = ("element", "text", "href", "url", "rel", "classes", "id")
+
+    def __init__(self, element, base):
+        self.element = element
+        # As the navigation matching compares it
+        self.text = element.get_text().lower().strip()
+        self.href = element.get("href")
+        self.url = resolve_url(base, self.href)
+        rel = element.get("rel") or ()
+        if isinstance(rel, str):
+            rel = rel.split()
+        self.rel = frozenset(value.lower() for value in rel)
+        self.classes = _classes(element)
+        self.id = element.get("id")
+
+
+class LinkIndex:
+    """The links of a page in document order, built in one search of the tree"""
+
+    def __init__(self, soup, page_url):
+        self.page_url = page_url
+        self.anchors = []
+        # id(element) -> classes of the element and all its ancestors, filled on demand by inside()
+        self._ancestor_classes = {}
+        base = page_url
+        for element in soup.find_all(["base", "a"]):
+            if element.name == "base":
+                if base is page_url and element.get("href"):
+                    base = urljoin(page_url, element["href"].strip())
+                continue
+            self.anchors.append(Anchor(element, base))
+
+    def __len__(self):
+        return len(self.anchors)
+
+    def _classes_up_from(self, element):
+        """Classes of an element and its ancestors, sharing the work between links in the same blocks"""
+        chain = []
+        while element is not None and id(element) not in self._ancestor_classes:
+            chain.append(element)
+            element = element.parent
+        classes = self._ancestor_classes[id(element)] if element is not None else frozenset()
+        for element in reversed(chain):
+            own = _classes(element)
+            if own:
+                classes = classes | own
+            self._ancestor_classes[id(element)] = classes
+        return classes
+
+    def with_text(self, terms):
+        """Links whose text contains one of terms"""
+        return [anchor for anchor in self.anchors if any(term in anchor.text for term in terms)]
+
+    def first_with_text(self, terms):
+        """The first link with a URL whose text contains one of terms, or None"""
+        for anchor in self.anchors:
+            if anchor.url and any(term in anchor.text for term in terms):
+                return anchor
+        return None
+
+    def with_class(self, classes):
+        """Links with one of classes"""
+        classes = frozenset(classes)
+        return [anchor for anchor in self.anchors if not classes.isdisjoint(anchor.classes)]
+
+    def inside(self, classes):
+        """Links inside an element with one of classes"""
+        classes = frozenset(classes)
+        return [anchor for anchor in self.anchors
+                if not classes.isdisjoint(self._classes_up_from(anchor.element.parent))]
+
+    def first(self, classes=(), rel=None, inside=(), ids=()):
+        """
+        The first link that has one of classes, has rel, is inside an element
+        with one of the inside classes or has one of ids; None if none does.
+        """
+        classes, inside, ids = frozenset(classes), frozenset(inside), frozenset(ids)
+        for anchor in self.anchors:
+            if (not classes.isdisjoint(anchor.classes)
+                    or (rel and rel in anchor.rel)
+                    or (ids and anchor.id in ids)
+                    or (inside and not inside.isdisjoint(self._classes_up_from(anchor.element.parent)))):
+                return anchor
+        return None
@@ -0,0 +1,142 @@
+"""
+Pre-parse page slimming and partial parsing.
+Chapter pages are mostly markup the extractors throw away: inline scripts
+and JSON, styles, SVG icons, comments and the <head>. slim_html() cuts these
+out of the raw HTML with one regular-expression pass before any tree is
+built, keeping only <title> and <base> of the head. For sites with a parse
+rule in SITE_PARSE_RULES, parse_page() additionally parses only the chapter
+container, the navigation blocks and the links (a SoupStrainer), and parses
+the whole page again if the container is not found.
+"""
+
+import re
+from urllib.parse import urlparse
+
+from bs4 import SoupStrainer
+from bs4.element import Tag
+
+from parser_backend import make_soup
+
+# Comments, raw-text blocks, SVG and the document head, in one left-to-right pass
+SLIM_PATTERN = re.compile(
+    r'<!--.*?-->'
+    r'|<(script|style|template)\b[^>]*>.*?</\1\s*>'
+    r'|<svg\b[^>]*/>'
+    r'|<svg\b[^>]*>.*?</svg\s*>'
+    r'|<head\b[^>]*>.*?</head\s*>',
+    re.IGNORECASE | re.DOTALL,
+)
+HEAD_KEEP_PATTERN = re.compile(r'<title\b[^>]*>.*?</title\s*>|<base\b[^>]*>', re.IGNORECASE | re.DOTALL)
+
+# Elements parsed for a site; everything inside a kept element is kept too.
+#   containers - where the chapter text is; without one the whole page is parsed
+#   keep       - other elements the extractors read (title, base, navigation blocks, links)
+# Each is a dict of "tags", "ids" and "classes".
+SITE_PARSE_RULES = {
+    "metruyencv.com": {
+        "containers": {"tags": ["main", "article"], "ids": ["article"],
+                       "classes": ["nh-read__content", "chapter-c", "chapter-content"]},
+        "keep": {"tags": ["title", "base", "h1", "a"],
+                 "classes": ["chapter-nav", "chapter-header", "chapter-actions", "btn-chap"]},
+    },
+    "truyensextv": {
+        "containers": {"tags": ["article"], "ids": ["chapter-content"], "classes": ["chapter-c", "chapter-content"]},
+        "keep": {"tags": ["title", "base", "h1", "a"]},
+    },
+}
+
+
+def _replace(match):
+    text = match.group(0)
+    if text[:5].lower() == "<head":
+        return "<head>" + "".join(HEAD_KEEP_PATTERN.findall(text)) + "</head>"
+    return ""
+
+
+def slim_html(html):
+    """The page without comments, scripts, styles, templates, SVG and all of <head> but title and base"""
+    return SLIM_PATTERN.sub(_replace, html)
+
+
+class _ElementSet:
+    """Tag names, ids and classes from one part of a parse rule"""
+
+    __slots__ = ("tags", "ids", "classes")
+
+    def __init__(self, spec):
+        self.tags = frozenset(spec.get("tags", ()))
+        self.ids = frozenset(spec.get("ids", ()))
+        self.classes = frozenset(spec.get("classes", ()))
+
+    def matches(self, name, attrs):
+        if name in self.tags:
+            return True
+        if self.ids and attrs.get("id") in self.ids:
+            return True
+        if self.classes:
+            classes = attrs.get("class") or ()
+            if isinstance(classes, str):
+                classes = classes.split()
+            return not self.classes.isdisjoint(classes)
+        return False
+
+
+class PartialParse(SoupStrainer):
+    """
+    SoupStrainer for a site's parse rule: keeps matching elements (with
+    everything inside them) and drops the rest of the page. Records whether
+    a chapter container was kept.
+    """
+
+    def __init__(self, rule):
+        super().__init__()
+        self.containers = _ElementSet(rule["containers"])
+        self.keep = _ElementSet(rule.get("keep", {}))
+        self.found_container = False
+
+    def _allows(self, name, attrs):
+        if self.containers.matches(name, attrs):
+            self.found_container = True
+            return True
+        return self.keep.matches(name, attrs)
+
+    # BeautifulSoup 4.13 and later
+    def allow_tag_creation(self, nsprefix, name, attrs):
+        return self._allows(name, attrs or {})
+
+    def allow_string_creation(self, string):
+        return False
+
+    # Earlier versions
+    def search_tag(self, markup_name=None, markup_attrs={}):
+        if isinstance(markup_name, Tag):
+            markup_name, markup_attrs = markup_name.name, markup_name.attrs
+        return markup_name if self._allows(markup_name, markup_attrs or {}) else None
+
+
+def parse_rule_for(url):
+    """The SITE_PARSE_RULES entry for a URL's domain, or None"""
+    domain = urlparse(url).netloc.lower()
+    for site, rule in SITE_PARSE_RULES.items():
+        if site in domain:
+            return rule
+    return None
+
+
+def parse_page(url, html, debug_info):
+    """
+    Slim a page and parse it, only the parts named by the site's parse rule
+    when there is one. Returns the BeautifulSoup tree.
+    """
+    slim = slim_html(html)
+    if len(slim) < len(html):
+        debug_info.append(f"Slimmed page from {len(html)} to {len(slim)} characters before parsing")
+    rule = parse_rule_for(url)
+    if rule:
+        strainer = PartialParse(rule)
+        soup = make_soup(slim, parse_only=strainer)
+        if strainer.found_container:
+            debug_info.append("Parsed only the chapter container and navigation")
+            return soup
+        debug_info.append("Chapter container not found in the partial parse, parsing the whole page")
+    return make_soup(slim)
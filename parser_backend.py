@@ -0,0 +1,138 @@
+"""
+HTML parser backends for extraction.
+All extractors work on BeautifulSoup trees (select, find_all, get_text, ...),
+but the tree can be built by different parsers:
+  lexbor      - selectolax's lexbor engine parses the page and the finished
+                tree is handed to BeautifulSoup (needs selectolax)
+  lxml        - BeautifulSoup's lxml tree builder (needs lxml)
+  html.parser - Python's built-in parser, always available and the slowest
+PARSER_BACKEND picks one; the default "auto" uses the first installed one in
+that order. A configured backend that is not installed falls back the same
+way. bench_parsers.py compares the backends on saved pages.
+"""
+
+import logging
+import os
+import threading
+
+from bs4 import BeautifulSoup, Comment, Doctype
+from bs4.builder import HTMLTreeBuilder
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+try:
+    import lxml  # noqa: F401 - only needed by BeautifulSoup's lxml tree builder
+except ImportError:
+    lxml = None
+
+logger = logging.getLogger("content_extractor")
+
+# "auto", "lexbor", "lxml" or "html.parser"
+PARSER_BACKEND = os.environ.get("PARSER_BACKEND", "auto")
+
+# Fastest first
+BACKENDS = ("lexbor", "lxml", "html.parser")
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+class LexborTreeBuilder(HTMLTreeBuilder):
+    """
+    BeautifulSoup tree builder that lets lexbor do the parsing and replays
+    the resulting tree as start tag / data / end tag events.
+    """
+
+    NAME = "lexbor"
+    ALTERNATE_NAMES = []
+    features = [NAME, "html", "fast"]
+
+    def prepare_markup(self, markup, user_specified_encoding=None, document_declared_encoding=None,
+                       exclude_encodings=None):
+        if isinstance(markup, bytes):
+            # Pages reach the extractors already decoded; bytes are taken as UTF-8
+            markup = markup.decode(user_specified_encoding or "utf-8", errors="replace")
+        yield markup, None, None, False
+
+    def feed(self, markup):
+        document = LexborHTMLParser(markup).root.parent
+        soup = self.soup
+        # Iterative walk: chapter pages can be nested far deeper than the recursion limit
+        stack = [(document.child, None)]
+        while stack:
+            node, closing = stack.pop()
+            if closing is not None:
+                soup.endData()
+                soup.handle_endtag(closing)
+                continue
+            if node is None:
+                continue
+            stack.append((node.next, None))
+            tag = node.tag
+            if node.is_element_node:
+                attributes = {name: "" if value is None else value for name, value in node.attributes.items()}
+                soup.handle_starttag(tag, None, None, attributes)
+                stack.append((None, tag))
+                stack.append((node.child, None))
+            elif tag == "-text":
+                soup.handle_data(node.text_content or "")
+            elif tag == "-comment":
+                soup.endData()
+                soup.handle_data(node.comment_content or "")
+                soup.endData(Comment)
+            elif tag == "-doctype":
+                soup.endData()
+                soup.handle_data("html")
+                soup.endData(Doctype)
+
+    def test_fragment_to_document(self, fragment):
+        return f"<html><body>{fragment}</body></html>"
+
+
+def available_backends():
+    """Names of the installed backends, fastest first"""
+    installed = {"lexbor": LexborHTMLParser is not None, "lxml": lxml is not None, "html.parser": True}
+    return [name for name in BACKENDS if installed[name]]
+
+
+def _resolve(name):
+    """The backend to use for a configured name, falling back to the fastest installed one"""
+    installed = available_backends()
+    if name in installed:
+        return name
+    if name != "auto":
+        logger.warning(f"Parser backend {name} is not available, using {installed[0]}")
+    return installed[0]
+
+
+def get_parser_backend():
+    """Name of the backend used by make_soup()"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _resolve(PARSER_BACKEND)
+                logger.info(f"Using the {_backend} HTML parser backend")
+    return _backend
+
+
+def set_parser_backend(name):
+    """Switch the backend for the whole process ("auto" for the fastest installed); returns the one chosen"""
+    global _backend
+    with _backend_lock:
+        _backend = _resolve(name)
+    return _backend
+
+
+def make_soup(html, backend=None, parse_only=None):
+    """
+    Parse a page into a BeautifulSoup tree with the configured (or the given)
+    backend. parse_only is passed through as BeautifulSoup's SoupStrainer.
+    """
+    backend = _resolve(backend) if backend else get_parser_backend()
+    if backend == "lexbor":
+        return BeautifulSoup(html, builder=LexborTreeBuilder, parse_only=parse_only)
+    return BeautifulSoup(html, backend, parse_only=parse_only)
@@ -0,0 +1,176 @@
+"""
+Deadline-aware retry policy shared by every fetch path.
+Each extraction gets a RetryBudget: an overall deadline plus a maximum number
+of attempts. Every attempt's connect/read timeouts are cut down to the time
+left, only transient failures (connection errors, timeouts and retryable
+HTTP statuses) are retried, and the wait between attempts is an exponential
+backoff with full jitter that honours Retry-After. Interactive reads use a
+short budget so the reader never waits more than ~10s; batch crawls and
+background prefetching get a larger one.
+"""
+
+import asyncio
+import os
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+import urllib3
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# Total seconds one extraction may spend fetching, retries included
+INTERACTIVE_BUDGET = float(os.environ.get("RETRY_INTERACTIVE_BUDGET", 10))
+BATCH_BUDGET = float(os.environ.get("RETRY_BATCH_BUDGET", 120))
+MAX_ATTEMPTS = int(os.environ.get("RETRY_MAX_ATTEMPTS", 4))
+
+# Backoff before retry n is a random delay in [0, min(BACKOFF_MAX, BACKOFF_BASE * 2**n)]
+BACKOFF_BASE = 0.25
+BACKOFF_MAX = 4.0
+# An attempt is not started with less time than this left
+MIN_ATTEMPT_SECONDS = 1.0
+
+RETRYABLE_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+
+def check_deadline(deadline):
+    """Raise BudgetExhausted once time.monotonic() has passed deadline (None: no deadline)"""
+    if deadline is not None and time.monotonic() > deadline:
+        raise BudgetExhausted("Time budget exhausted while reading the response")
+
+
+class RetryableStatus(Exception):
+    """Raised for responses whose status is worth retrying (429, 503, ...)"""
+
+    def __init__(self, status, retry_after=None):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class BudgetExhausted(Exception):
+    """Raised when the time budget of an extraction has run out"""
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def check_status(status, headers):
+    """Raise RetryableStatus for statuses in RETRYABLE_STATUSES"""
+    if status in RETRYABLE_STATUSES:
+        raise RetryableStatus(status, parse_retry_after(headers.get("Retry-After")))
+
+
+def is_retryable(error):
+    """Whether a fetch error is transient; certificate failures and rejected responses are not"""
+    if isinstance(error, RetryableStatus):
+        return True
+    if isinstance(error, requests.exceptions.SSLError):
+        return False
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                          requests.exceptions.ChunkedEncodingError)):
+        return True
+    if isinstance(error, (urllib3.exceptions.TimeoutError, urllib3.exceptions.ProtocolError,
+                          urllib3.exceptions.NewConnectionError)):
+        return True
+    if aiohttp is not None:
+        if isinstance(error, aiohttp.ClientSSLError):
+            return False
+        if isinstance(error, (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError)):
+            return True
+    return isinstance(error, (asyncio.TimeoutError, ConnectionError, TimeoutError))
+
+
+class RetryBudget:
+    """Deadline and attempt count for one extraction"""
+
+    def __init__(self, seconds=INTERACTIVE_BUDGET, max_attempts=MAX_ATTEMPTS):
+        self.seconds = seconds
+        self.max_attempts = max_attempts
+        self.deadline = time.monotonic() + seconds
+        self.attempts = 0
+
+    def remaining(self):
+        return max(0.0, self.deadline - time.monotonic())
+
+    def attempt_timeouts(self, timeouts):
+        """
+        Cut a (connect, read) timeout pair down to the remaining budget.
+        Raises BudgetExhausted when too little time is left for another attempt.
+        """
+        remaining = self.remaining()
+        if remaining < MIN_ATTEMPT_SECONDS:
+            raise BudgetExhausted(f"Time budget of {self.seconds:.0f}s exhausted")
+        connect_timeout, read_timeout = timeouts
+        return round(min(connect_timeout, remaining), 2), round(min(read_timeout, remaining), 2)
+
+    def backoff(self, error):
+        """
+        Delay before the next attempt, or None when no further attempt fits:
+        attempts used up, or the wait (including Retry-After) would leave too little budget.
+        """
+        if self.attempts >= self.max_attempts:
+            return None
+        delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (self.attempts - 1)))
+        retry_after = getattr(error, "retry_after", None)
+        if retry_after:
+            delay = max(delay, retry_after)
+        if self.remaining() - delay < MIN_ATTEMPT_SECONDS:
+            return None
+        return delay
+
+    def run(self, fetch, timeouts, debug_info):
+        """
+        Call fetch(attempt_timeouts) until it succeeds, a non-retryable error
+        occurs, or the budget runs out. The last error is re-raised.
+        """
+        while True:
+            attempt_timeouts = self.attempt_timeouts(timeouts)
+            self.attempts += 1
+            try:
+                return fetch(attempt_timeouts)
+            except Exception as e:
+                delay = self._next_delay(e, debug_info)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+
+    async def run_async(self, fetch, timeouts, debug_info):
+        """Async variant of run(); fetch(attempt_timeouts) returns an awaitable"""
+        while True:
+            attempt_timeouts = self.attempt_timeouts(timeouts)
+            self.attempts += 1
+            try:
+                return await fetch(attempt_timeouts)
+            except Exception as e:
+                delay = self._next_delay(e, debug_info)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+    def _next_delay(self, error, debug_info):
+        if not is_retryable(error):
+            return None
+        delay = self.backoff(error)
+        if delay is None:
+            debug_info.append(f"Attempt {self.attempts} failed ({str(error)}), giving up")
+            return None
+        debug_info.append(
+            f"Attempt {self.attempts} failed ({str(error)}), retrying in {delay:.2f}s "
+            f"({self.remaining():.1f}s of budget left)"
+        )
+        return delay
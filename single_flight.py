@@ -0,0 +1,142 @@
+"""
+Coalescing of concurrent extractions of the same chapter.
+When several sessions (or a session and the prefetcher) ask for a chapter
+that is not cached yet, only the first caller - the leader - fetches, parses
+and cleans it; callers arriving while it runs wait for and share its result.
+Flights are keyed like the extraction cache (extractor version plus
+normalized URL) and work across threads and the async engine. Followers wait
+at most for their own time budget plus a grace period and then extract the
+chapter themselves, and a leader that has run for far too long no longer
+collects followers, so a stuck extraction never hangs anyone else.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+
+from extraction_cache import ExtractionCache
+from retry_policy import BATCH_BUDGET
+
+logger = logging.getLogger("content_extractor")
+
+# Set to 0 to let every caller run its own extraction
+COALESCING_ENABLED = os.environ.get("COALESCE_EXTRACTIONS", "1") != "0"
+# Followers wait for their own retry budget plus this long (parsing and cleaning time)
+FOLLOWER_GRACE_SECONDS = float(os.environ.get("COALESCE_GRACE_SECONDS", 15))
+# A flight older than this is considered stuck; new callers start their own
+STALE_FLIGHT_SECONDS = BATCH_BUDGET + 60
+
+
+class Flight:
+    """One running extraction and the result it hands to its followers"""
+
+    __slots__ = ("key", "started", "followers", "result", "error", "_done")
+
+    def __init__(self, key):
+        self.key = key
+        self.started = time.monotonic()
+        self.followers = 0
+        self.result = None
+        self.error = None
+        self._done = threading.Event()
+
+    def done(self):
+        return self._done.is_set()
+
+    def shareable(self):
+        """Finished with a result or an ordinary error - not cancelled or interrupted"""
+        return self._done.is_set() and (self.error is None or isinstance(self.error, Exception))
+
+    def outcome(self):
+        """The leader's result; re-raises the leader's exception"""
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SingleFlight:
+    """Thread-safe registry of running extractions"""
+
+    def __init__(self, enabled=COALESCING_ENABLED):
+        self.enabled = enabled
+        self.coalesced = 0
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def join(self, url, version):
+        """
+        Return (flight, leader). The leader must call finish() with its
+        outcome; anyone else waits for the flight. Returns (None, True) when
+        coalescing is disabled.
+        """
+        if not self.enabled:
+            return None, True
+        key = ExtractionCache.make_key(url, version)
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None and time.monotonic() - flight.started < STALE_FLIGHT_SECONDS:
+                flight.followers += 1
+                self.coalesced += 1
+                return flight, False
+            if flight is not None:
+                logger.warning(f"Extraction of {url} has been running for {time.monotonic() - flight.started:.0f}s, "
+                               f"no longer waiting for it")
+            flight = self._flights[key] = Flight(key)
+            return flight, True
+
+    def finish(self, flight, result=None, error=None):
+        """Publish the leader's outcome and wake its followers"""
+        if flight is None:
+            return
+        flight.result = result
+        flight.error = error
+        with self._lock:
+            # A stale flight may already have been replaced by a newer one
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+        flight._done.set()
+
+    @staticmethod
+    def wait(flight, timeout):
+        """
+        Wait for a flight. Returns False when it did not finish within timeout
+        seconds or its leader was cancelled; the caller then extracts on its own.
+        """
+        return flight._done.wait(timeout) and flight.shareable()
+
+    @staticmethod
+    async def wait_async(flight, timeout, poll_interval=0.05):
+        """Coroutine version of wait() that does not block the event loop"""
+        deadline = time.monotonic() + timeout
+        while not flight.done():
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(poll_interval)
+        return flight.shareable()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._flights)
+
+
+def shared_result(result, waited):
+    """A follower's copy of the leader's result tuple, with its own timing and a debug note"""
+    title, content, execution_time, debug_text, prev_chapter_url, next_chapter_url = result
+    debug_text = f"Shared result of a concurrent extraction of the same URL (waited {waited:.3f} seconds)\n{debug_text}"
+    return title, content, waited, debug_text, prev_chapter_url, next_chapter_url
+
+
+_single_flight = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight():
+    """Return the process-wide extraction coalescing registry"""
+    global _single_flight
+    if _single_flight is None:
+        with _single_flight_lock:
+            if _single_flight is None:
+                _single_flight = SingleFlight()
+    return _single_flight
@@ -0,0 +1,149 @@
+"""
+Per-domain transport profiles.
+Remembers, for every domain, the configuration that last fetched it
+successfully: whether SSL verification has to be disabled, which fetch
+strategy won (for sites with a dedicated handler), the request headers that
+were accepted, and the reason of the last failure. Later requests start from
+that configuration instead of rediscovering it, e.g. a site with a broken
+certificate is no longer hit with a verifying handshake that is bound to fail.
+The lighter chapter endpoint of a domain (see light_endpoints) is kept here too.
+Profiles are shared by all sessions and stored on disk.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+logger = logging.getLogger("content_extractor")
+
+PROFILE_PATH = Path(os.environ.get("TRANSPORT_PROFILE_PATH", ".cache/transport_profiles.json"))
+
+# A remembered "SSL verification disabled" is retried with verification after this long,
+# so a site whose certificate has been fixed goes back to verified connections
+SSL_RECHECK_SECONDS = 24 * 3600
+
+# Timestamps that decisions expire from; a new value is always written to disk
+DECISION_TIMESTAMPS = ("ssl_failed_at", "light_checked_at")
+# The other timestamps (last success and failure) are written at most this often
+TIMESTAMP_SAVE_SECONDS = 300
+
+
+def profile_key(url):
+    """Domain key of a URL (or an already extracted domain)"""
+    if "://" in url:
+        url = urlparse(url).netloc
+    return url.lower()
+
+
+class TransportProfileStore:
+    """Thread-safe, disk-backed map of domain -> profile dict"""
+
+    def __init__(self, path=PROFILE_PATH):
+        self.path = Path(path)
+        self._profiles = {}
+        self._lock = threading.Lock()
+        self._saved_at = 0.0
+
+    def get(self, url):
+        """Return a copy of the profile for a URL's domain (empty dict when unknown)"""
+        with self._lock:
+            return dict(self._profiles.get(profile_key(url), {}))
+
+    def ssl_verification(self, url, default=True):
+        """SSL verification mode to start with for a URL"""
+        profile = self.get(url)
+        if profile.get("ssl_verify") is False:
+            if time.time() - profile.get("ssl_failed_at", 0) < SSL_RECHECK_SECONDS:
+                return False
+        return default
+
+    def _update(self, url, fields, timestamps):
+        key = profile_key(url)
+        with self._lock:
+            profile = self._profiles.setdefault(key, {})
+            changed = any(profile.get(name) != value for name, value in fields.items())
+            changed = changed or any(profile.get(name) != timestamps[name]
+                                     for name in DECISION_TIMESTAMPS if name in timestamps)
+            # Other timestamps alone are not worth a disk write on every chapter
+            changed = changed or (bool(timestamps) and time.monotonic() - self._saved_at > TIMESTAMP_SAVE_SECONDS)
+            profile.update(fields)
+            profile.update(timestamps)
+        if changed:
+            self.save()
+
+    def record_success(self, url, ssl_verify=None, strategy=None, headers=None):
+        """
+        Remember the configuration that just fetched a page from the URL's domain.
+        Pass ssl_verify=False only when verification has just failed, and
+        ssl_verify=True when a verified connection worked.
+        """
+        now = int(time.time())
+        fields = {}
+        timestamps = {"last_success_at": now}
+        if ssl_verify is not None:
+            fields["ssl_verify"] = ssl_verify
+            if not ssl_verify:
+                timestamps["ssl_failed_at"] = now
+        if strategy:
+            fields["strategy"] = strategy
+        if headers:
+            fields["headers"] = {
+                name: value for name, value in headers.items()
+                if name in ("User-Agent", "Accept", "Accept-Language", "Referer")
+            }
+        self._update(url, fields, timestamps)
+
+    def record_light_endpoint(self, url, endpoint):
+        """Remember the lighter chapter endpoint of the URL's domain (None: the domain has none)"""
+        self._update(url, {"light_endpoint": endpoint}, {"light_checked_at": int(time.time())})
+
+    def record_failure(self, url, reason):
+        """Remember why the last fetch from the URL's domain failed"""
+        self._update(url, {"last_failure": str(reason)[:300]}, {"last_failure_at": int(time.time())})
+
+    def save(self):
+        """Write all profiles to disk"""
+        try:
+            with self._lock:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = self.path.with_suffix(".tmp")
+                tmp_path.write_text(json.dumps(self._profiles, ensure_ascii=False, indent=1), encoding="utf-8")
+                os.replace(tmp_path, self.path)
+                self._saved_at = time.monotonic()
+            return True
+        except Exception as e:
+            logger.error(f"Error saving transport profiles: {str(e)}")
+            return False
+
+    def load(self):
+        """Read the profiles saved by an earlier run"""
+        try:
+            if not self.path.exists():
+                return 0
+            profiles = json.loads(self.path.read_text(encoding="utf-8"))
+            with self._lock:
+                self._profiles.update(profiles)
+            return len(profiles)
+        except Exception as e:
+            logger.error(f"Error loading transport profiles: {str(e)}")
+            return 0
+
+
+_profiles = None
+_profiles_lock = threading.Lock()
+
+
+def get_transport_profiles():
+    """Return the process-wide transport profile store, loading saved profiles on first use"""
+    global _profiles
+    if _profiles is None:
+        with _profiles_lock:
+            if _profiles is None:
+                store = TransportProfileStore()
+                store.load()
+                _profiles = store
+    return _profiles
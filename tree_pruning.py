@@ -0,0 +1,103 @@
+"""
+One-pass removal of boilerplate from a parsed page.
+A PruneRules set names the elements that are never chapter text by tag,
+role, class, class substring and id prefix; prune() walks the tree once,
+removes every element that matches (with everything inside it) without
+looking further into it, and drops comment nodes on the way. This replaces
+a selector pass per rule group and a separate scan over every text node.
+"""
+
+import re
+
+from bs4.element import Comment, NavigableString, Tag
+
+
+class PruneRules:
+    """Precompiled rules; an element matching any of them is removed"""
+
+    __slots__ = ("tags", "roles", "classes", "class_substrings", "id_prefixes", "comments")
+
+    def __init__(self, tags=(), roles=(), classes=(), class_substrings=None, id_prefixes=None, comments=False):
+        self.tags = frozenset(tags)
+        # [role="..."]
+        self.roles = frozenset(roles)
+        # .class
+        self.classes = frozenset(classes)
+        # tag[class*="..."], as {tag: substrings}
+        self.class_substrings = {
+            tag: re.compile("|".join(re.escape(substring) for substring in substrings))
+            for tag, substrings in (class_substrings or {}).items()
+        }
+        # tag[id^="..."], as {tag: prefixes}
+        self.id_prefixes = {tag: tuple(prefixes) for tag, prefixes in (id_prefixes or {}).items()}
+        # Also remove comment nodes (and text that still contains comment markup)
+        self.comments = comments
+
+    def matches(self, element):
+        name = element.name
+        if name in self.tags:
+            return True
+        attrs = element.attrs
+        if self.roles and attrs.get("role") in self.roles:
+            return True
+        classes = attrs.get("class")
+        if classes:
+            if isinstance(classes, str):
+                classes = classes.split()
+            if not self.classes.isdisjoint(classes):
+                return True
+            pattern = self.class_substrings.get(name)
+            if pattern is not None and pattern.search(" ".join(classes)):
+                return True
+        prefixes = self.id_prefixes.get(name)
+        if prefixes:
+            element_id = attrs.get("id")
+            if isinstance(element_id, str) and element_id.startswith(prefixes):
+                return True
+        return False
+
+
+# Never content on any page
+BOILERPLATE_RULES = PruneRules(
+    tags=["script", "style", "noscript", "meta", "link", "head", "iframe", "svg", "path", "nav", "header", "footer"],
+    roles=["banner", "navigation", "complementary", "search", "form", "region", "alert"],
+    classes=["ads", "ad-container", "advertisement", "sidebar", "comments", "comment-section"],
+    comments=True,
+)
+
+# Reader controls inside the metruyencv.com chapter container
+METRUYENCV_UI_RULES = PruneRules(
+    classes=["chapter-nav", "chapter-header", "chapter-footer", "ads", "ad-container", "js-button", "button", "btn",
+             "config-panel", "navigate", "nav", "setting", "rating", "comment", "comment-section", "lock-content"],
+    class_substrings={"div": ["rating", "config", "setting", "navigate", "header", "footer", "button"]},
+    id_prefixes={"div": ["ads-"]},
+)
+
+# Inside the truyensextv chapter container
+TRUYENSEXTV_CONTENT_RULES = PruneRules(
+    tags=["script", "style"],
+    classes=["ads", "ad-container", "related", "comments"],
+)
+
+
+def prune(root, rules):
+    """
+    Remove the elements below root that match rules (root itself is kept).
+    Returns the number of elements removed.
+    """
+    removed = 0
+    # Copies of the child lists, since matching children are removed while their siblings are still visited
+    stack = [list(root.contents)]
+    while stack:
+        children = stack.pop()
+        for child in children:
+            if isinstance(child, Tag):
+                if rules.matches(child):
+                    child.decompose()
+                    removed += 1
+                elif child.contents:
+                    stack.append(list(child.contents))
+            elif rules.comments and isinstance(child, NavigableString):
+                if isinstance(child, Comment) or "<!--" in child:
+                    child.extract()
+    return removed
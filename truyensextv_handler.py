@@ -3,18 +3,33 @@ Special handler for truyensextv.com website.
 This script uses multiple approaches to extract content from this problematic site.
 """
 
+import base64
 import requests
 import time
 import re
 import random
-from bs4 import BeautifulSoup
-from urllib.parse import urlparse
+from page_slimming import parse_page
+from link_index import LinkIndex
+from tree_pruning import prune, TRUYENSEXTV_CONTENT_RULES
+from urllib.parse import urlparse, urljoin, unquote
 import urllib3
 import socket
 import ssl
 import http.client
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from fake_useragent import UserAgent
 import os
+from http_client import (get_http_session, read_response_body, decode_body, TransferStats, ACCEPT_ENCODING,
+                         record_redirects, resolve_redirects)
+from http_cache import get_redirect_cache
+from cookie_store import get_cookie_jar
+from latency_tracker import get_latency_tracker, install_connect_timing
+from transport_profile import get_transport_profiles
+from retry_policy import RetryBudget
+from proxy_pool import get_proxy_pool, urllib3_manager
+import dns_cache
 
 # Suppress warnings
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -24,11 +39,63 @@ custom_context = ssl.create_default_context()
 custom_context.check_hostname = False
 custom_context.verify_mode = ssl.CERT_NONE
 
+# Shared urllib3 pool so repeated attempts reuse connections
+_urllib3_pool = None
+
+URLLIB3_POOL_OPTIONS = dict(
+    num_pools=10,
+    maxsize=10,
+    timeout=urllib3.Timeout(connect=30, read=30),
+    # Follow redirects only - retrying is left to hedging within the extraction's RetryBudget
+    retries=urllib3.Retry(total=None, connect=0, read=0, status=0, other=0, redirect=5),
+    ssl_context=custom_context
+)
+
+def get_urllib3_pool(proxy=None):
+    """Return the shared urllib3 PoolManager (or the one for a proxy from the proxy pool), creating it on first use"""
+    global _urllib3_pool
+    if proxy is not None:
+        return urllib3_manager(proxy, **URLLIB3_POOL_OPTIONS)
+    if _urllib3_pool is None:
+        _urllib3_pool = urllib3.PoolManager(**URLLIB3_POOL_OPTIONS)
+        install_connect_timing(_urllib3_pool)
+        dns_cache.install(_urllib3_pool)
+    return _urllib3_pool
+
+# Upper bound for each attempt; domains with latency history get shorter timeouts
+ATTEMPT_TIMEOUTS = (60, 60)
+
+def get_attempt_timeouts(url, debug_info, attempt=None):
+    """
+    (connect, read) timeouts for one attempt, learned from the domain's observed
+    latency and cut down to what is left of the extraction's RetryBudget
+    """
+    timeouts = get_latency_tracker().suggest_timeouts(url, ATTEMPT_TIMEOUTS)
+    if timeouts != ATTEMPT_TIMEOUTS:
+        debug_info.append(f"Adaptive timeouts from observed latency: {timeouts}")
+    if attempt and attempt.budget:
+        timeouts = attempt.budget.attempt_timeouts(timeouts)
+    return timeouts
+
+# UserAgent() loads its browser database on creation, which can be slow - build it once
+_user_agent = None
+_user_agent_lock = threading.Lock()
+
 def get_random_user_agent():
     """Generate a random user agent string"""
+    global _user_agent
     try:
-        ua = UserAgent()
-        return ua.random
+        if _user_agent is None:
+            with _user_agent_lock:
+                if _user_agent is None:
+                    try:
+                        _user_agent = UserAgent()
+                    except Exception:
+                        # Don't retry a failing database load on every attempt
+                        _user_agent = False
+        if not _user_agent:
+            raise RuntimeError("fake_useragent unavailable")
+        return _user_agent.random
     except:
         # Fallback user agents if fake_useragent fails
         user_agents = [
@@ -40,37 +107,82 @@ def get_random_user_agent():
         ]
         return random.choice(user_agents)
 
-def extract_with_requests(url, debug_info=None):
+# How long a strategy may go without receiving a response before the next one is started
+HEDGE_DELAY = float(os.environ.get("TRUYENSEXTV_HEDGE_DELAY", 3.0))
+
+_hedge_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="truyensextv-hedge")
+
+class HedgedAttempt:
+    """
+    Shared state of one strategy running in a hedged fetch.
+    Passed to read_response_body as its watcher: start() marks that the
+    response has begun arriving, and feed() stops the read once another
+    strategy has already won. A strategy that knows where redirects
+    ended sets final_url, which relative links are resolved against.
+    """
+
+    def __init__(self, cancelled, budget=None):
+        self.cancelled = cancelled
+        self.budget = budget
+        self.responding = threading.Event()
+        self.final_url = None
+
+    def start(self, content_type=None):
+        self.responding.set()
+
+    def feed(self, chunk):
+        return self.cancelled.is_set()
+
+    @property
+    def deadline(self):
+        """End of the extraction's RetryBudget, bounding each body read"""
+        return self.budget.deadline if self.budget else None
+
+def extract_with_requests(url, debug_info=None, attempt=None, user_agent=None):
     """Try to extract content using requests library with various settings"""
     if debug_info is None:
         debug_info = []
     
     debug_info.append("Attempt 1: Using requests with SSL verification disabled")
     headers = {
-        'User-Agent': get_random_user_agent(),
+        'User-Agent': user_agent or get_random_user_agent(),
         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
         'Accept-Language': 'vi-VN,vi;q=0.9,en-US;q=0.8,en;q=0.7',
+        'Accept-Encoding': ACCEPT_ENCODING,
         'Cache-Control': 'no-cache',
         'Pragma': 'no-cache',
         'Referer': 'https://google.com/',
     }
     
     try:
-        session = requests.Session()
-        response = session.get(
-            url, 
-            headers=headers, 
-            timeout=60,  # Extended timeout
-            verify=False,
-            stream=True
-        )
-        
-        content_chunks = []
-        for chunk in response.iter_content(chunk_size=8192, decode_unicode=True):
-            if chunk:
-                content_chunks.append(chunk)
-        
-        html = ''.join(content_chunks) if isinstance(content_chunks[0], str) else b''.join(content_chunks).decode('utf-8', errors='ignore')
+        session = get_http_session()
+        timeouts = get_attempt_timeouts(url, debug_info, attempt)
+        stats = TransferStats()
+        with get_proxy_pool().lease(timeouts) as lease:
+            if lease.proxy:
+                stats.proxy = lease.proxy.label
+            response = session.get(
+                url, 
+                headers=headers, 
+                timeout=timeouts,
+                verify=False,
+                stream=True,
+                proxies=lease.proxies
+            )
+            get_latency_tracker().record_first_byte(url, response.elapsed.total_seconds())
+            lease.record_latency(response.elapsed.total_seconds())
+            record_redirects(response)
+            
+            # Collect raw bytes once, undo Content-Encoding and decode with the detected charset
+            try:
+                body = read_response_body(response, watcher=attempt, stats=stats,
+                                          deadline=attempt.deadline if attempt else None)
+            finally:
+                response.close()
+        html = decode_body(body, response.headers.get('Content-Type'))
+        if attempt:
+            attempt.final_url = response.url
+        debug_info.append(f"Downloaded {len(body)} bytes, {stats.describe()}")
         debug_info.append("Successfully retrieved content with requests")
         return html, debug_info
     except Exception as e:
@@ -78,7 +190,7 @@ def extract_with_requests(url, debug_info=None):
     
     return None, debug_info
 
-def extract_with_urllib3(url, debug_info=None):
+def extract_with_urllib3(url, debug_info=None, attempt=None, user_agent=None):
     """Try to extract content using urllib3 directly"""
     if debug_info is None:
         debug_info = []
@@ -90,33 +202,52 @@ def extract_with_urllib3(url, debug_info=None):
         domain = parsed_url.netloc
         path = parsed_url.path or '/'
         
-        http = urllib3.PoolManager(
-            timeout=urllib3.Timeout(connect=30, read=30),
-            retries=urllib3.Retry(
-                total=3,
-                backoff_factor=0.5,
-                status_forcelist=[500, 502, 503, 504]
-            ),
-            ssl_context=custom_context
-        )
+        connect_timeout, read_timeout = get_attempt_timeouts(url, debug_info, attempt)
         
-        response = http.request(
-            'GET',
-            url,
-            headers={
-                'User-Agent': get_random_user_agent(),
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                'Accept-Language': 'vi-VN,vi;q=0.9,en-US;q=0.8,en;q=0.7',
-            },
-            preload_content=False
-        )
-        
-        content_chunks = []
-        for chunk in response.stream(8192):
-            if chunk:
-                content_chunks.append(chunk)
+        headers = {
+            'User-Agent': user_agent or get_random_user_agent(),
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+            'Accept-Language': 'vi-VN,vi;q=0.9,en-US;q=0.8,en;q=0.7',
+            'Accept-Encoding': ACCEPT_ENCODING,
+        }
+        cookie = get_cookie_jar().cookie_header(url)
+        if cookie:
+            headers['Cookie'] = cookie
         
-        html = b''.join(content_chunks).decode('utf-8', errors='ignore')
+        stats = TransferStats()
+        with get_proxy_pool().lease(read_timeout) as lease:
+            http = get_urllib3_pool(lease.proxy)
+            if lease.proxy:
+                stats.proxy = lease.proxy.label
+            sent_at = time.time()
+            response = http.request(
+                'GET',
+                url,
+                headers=headers,
+                timeout=urllib3.Timeout(connect=min(connect_timeout, 30), read=min(read_timeout, 30)),
+                preload_content=False
+            )
+            get_latency_tracker().record_first_byte(url, time.time() - sent_at)
+            lease.record_latency(time.time() - sent_at)
+            # geturl() can be relative to the requested URL after a redirect
+            final_url = urljoin(url, response.geturl() or url)
+            get_cookie_jar().store_cookies(final_url, response.headers)
+            if response.retries and response.retries.history:
+                hops = [(hop.status, urljoin(url, hop.url)) for hop in response.retries.history]
+                get_redirect_cache().record(hops, final_url)
+            
+            try:
+                body = read_response_body(response, watcher=attempt, stats=stats,
+                                          deadline=attempt.deadline if attempt else None)
+            finally:
+                if attempt and attempt.cancelled.is_set():
+                    # Unread data would poison the pooled connection
+                    response.close()
+                response.release_conn()
+        html = decode_body(body, response.headers.get('Content-Type'))
+        if attempt:
+            attempt.final_url = final_url
+        debug_info.append(f"Downloaded {len(body)} bytes, {stats.describe()}")
         debug_info.append("Successfully retrieved content with urllib3")
         return html, debug_info
     except Exception as e:
@@ -124,7 +255,7 @@ def extract_with_urllib3(url, debug_info=None):
     
     return None, debug_info
 
-def extract_with_httplib(url, debug_info=None):
+def extract_with_httplib(url, debug_info=None, attempt=None, user_agent=None):
     """Try to extract content using http.client directly"""
     if debug_info is None:
         debug_info = []
@@ -136,23 +267,12 @@ def extract_with_httplib(url, debug_info=None):
         domain = parsed_url.netloc
         path = parsed_url.path or '/'
         
-        # Create a custom HTTPSConnection with our SSL context
-        connection = http.client.HTTPSConnection(
-            domain, 
-            timeout=60,
-            context=custom_context
-        )
-        
-        headers = {
-            'User-Agent': get_random_user_agent(),
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-            'Accept-Language': 'vi-VN,vi;q=0.9,en-US;q=0.8,en;q=0.7',
-        }
-        
-        connection.request('GET', path, headers=headers)
-        response = connection.getresponse()
+        connect_timeout, read_timeout = get_attempt_timeouts(url, debug_info, attempt)
         
-        html = response.read().decode('utf-8', errors='ignore')
+        # http.client can only tunnel through plain HTTP proxies
+        with get_proxy_pool().lease(read_timeout, ("http",)) as lease:
+            html = _fetch_with_httplib(url, domain, path, connect_timeout, read_timeout, lease, debug_info,
+                                       attempt, user_agent)
         debug_info.append("Successfully retrieved content with http.client")
         return html, debug_info
     except Exception as e:
@@ -160,7 +280,63 @@ def extract_with_httplib(url, debug_info=None):
     
     return None, debug_info
 
-def extract_using_curl(url, debug_info=None):
+def _fetch_with_httplib(url, domain, path, connect_timeout, read_timeout, lease, debug_info, attempt, user_agent):
+    """Download a page over one http.client connection, tunnelled through the leased proxy if any"""
+    # Create a custom HTTPSConnection with our SSL context
+    if lease.proxy:
+        proxy = urlparse(lease.proxy.url)
+        connection = http.client.HTTPSConnection(
+            proxy.hostname,
+            proxy.port or 8080,
+            timeout=connect_timeout,
+            context=custom_context
+        )
+        tunnel_headers = {}
+        if proxy.username:
+            credentials = f"{unquote(proxy.username)}:{unquote(proxy.password or '')}"
+            tunnel_headers['Proxy-Authorization'] = 'Basic ' + base64.b64encode(credentials.encode()).decode()
+        connection.set_tunnel(domain, headers=tunnel_headers)
+    else:
+        connection = http.client.HTTPSConnection(
+            domain, 
+            timeout=connect_timeout,
+            context=custom_context
+        )
+    connect_started = time.time()
+    connection.connect()
+    get_latency_tracker().record_connect(url, time.time() - connect_started)
+    connection.sock.settimeout(read_timeout)
+    
+    headers = {
+        'User-Agent': user_agent or get_random_user_agent(),
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        'Accept-Language': 'vi-VN,vi;q=0.9,en-US;q=0.8,en;q=0.7',
+        'Accept-Encoding': ACCEPT_ENCODING,
+    }
+    cookie = get_cookie_jar().cookie_header(url)
+    if cookie:
+        headers['Cookie'] = cookie
+    
+    sent_at = time.time()
+    connection.request('GET', path, headers=headers)
+    response = connection.getresponse()
+    get_latency_tracker().record_first_byte(url, time.time() - sent_at)
+    lease.record_latency(time.time() - sent_at)
+    get_cookie_jar().store_cookies(url, response.headers)
+    
+    stats = TransferStats()
+    if lease.proxy:
+        stats.proxy = lease.proxy.label
+    try:
+        body = read_response_body(response, watcher=attempt, stats=stats,
+                                  deadline=attempt.deadline if attempt else None)
+    finally:
+        connection.close()
+    html = decode_body(body, response.getheader('Content-Type'))
+    debug_info.append(f"Downloaded {len(body)} bytes, {stats.describe()}")
+    return html
+
+def extract_using_curl(url, debug_info=None, attempt=None, user_agent=None):
     """Try to extract content by executing curl command"""
     if debug_info is None:
         debug_info = []
@@ -168,24 +344,45 @@ def extract_using_curl(url, debug_info=None):
     debug_info.append("Attempt 4: Using curl command")
     
     try:
-        # Create a temporary file for the output
-        temp_file = f"temp_content_{int(time.time())}.html"
-        
-        # Construct the curl command with all necessary options
-        curl_command = f'curl -s -k -L -A "{get_random_user_agent()}" --connect-timeout 30 --max-time 60 "{url}" > {temp_file}'
-        
-        # Execute the curl command
-        os.system(curl_command)
+        # Construct the curl command with all necessary options; the page is read from its stdout
+        connect_timeout, _ = get_attempt_timeouts(url, debug_info, attempt)
+        curl_command = [
+            'curl', '-s', '-k', '-L', '--compressed',
+            '-A', user_agent or get_random_user_agent(),
+            '--connect-timeout', str(connect_timeout),
+            '--max-time', str(round(min(60, attempt.budget.remaining()), 1) if attempt and attempt.budget else 60),
+            url,
+        ]
+        cookie = get_cookie_jar().cookie_header(url)
+        if cookie:
+            curl_command[-1:-1] = ['-H', f'Cookie: {cookie}']
         
-        # Read the content from the temporary file
-        with open(temp_file, 'r', encoding='utf-8', errors='ignore') as f:
-            html = f.read()
+        with get_proxy_pool().lease(connect_timeout) as lease:
+            if lease.proxy:
+                # curl handles HTTP and SOCKS proxies itself
+                curl_command[-1:-1] = ['--proxy', lease.proxy.url]
+                debug_info.append(f"Using proxy {lease.proxy.label}")
+            process = subprocess.Popen(curl_command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+            chunks = []
+            killed = False
+            try:
+                for chunk in iter(lambda: process.stdout.read1(65536), b''):
+                    if attempt:
+                        attempt.responding.set()
+                        if attempt.cancelled.is_set():
+                            break
+                    chunks.append(chunk)
+            finally:
+                if process.poll() is None:
+                    process.kill()
+                    killed = True
+                process.stdout.close()
+                process.wait()
+            if process.returncode and not killed:
+                # Counts against the proxy like any other connection failure
+                raise ConnectionError(f"curl exited with code {process.returncode}")
         
-        # Remove the temporary file
-        try:
-            os.remove(temp_file)
-        except:
-            pass
+        html = decode_body(b''.join(chunks))
         
         if html and len(html) > 100:  # Ensure we got meaningful content
             debug_info.append("Successfully retrieved content with curl")
@@ -197,13 +394,84 @@ def extract_using_curl(url, debug_info=None):
     
     return None, debug_info
 
-def parse_content(html, url, debug_info=None):
-    """Parse the HTML content to extract the article"""
+FETCH_STRATEGIES = [extract_with_requests, extract_with_urllib3, extract_with_httplib, extract_using_curl]
+
+def fetch_hedged(url, debug_info, strategies=FETCH_STRATEGIES, hedge_delay=HEDGE_DELAY, user_agent=None, budget=None):
+    """
+    Run the fetch strategies as a hedged race.
+    The first strategy starts immediately; the next one is started whenever
+    hedge_delay passes without any running strategy receiving a response, or
+    as soon as all running strategies have failed. The first strategy to
+    return a page wins and the others are told to stop. No strategy is started,
+    and the race is abandoned, once the budget (a RetryBudget) has run out.
+    Returns (html, winning strategy name, URL the page was served from),
+    or (None, None, None) when all failed.
+    """
+    cancelled = threading.Event()
+    pending = {}  # future -> (attempt, its own debug list)
+    remaining = list(strategies)
+    html = None
+    winner = None
+    final_url = None
+    
+    def launch():
+        strategy = remaining.pop(0)
+        attempt = HedgedAttempt(cancelled, budget)
+        attempt_debug = []
+        future = _hedge_executor.submit(strategy, url, attempt_debug, attempt, user_agent)
+        pending[future] = (strategy.__name__, attempt, attempt_debug)
+    
+    launch()
+    try:
+        while pending:
+            wait_time = min(hedge_delay, budget.remaining()) if budget else hedge_delay
+            done, _ = wait(list(pending), timeout=wait_time, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, attempt, attempt_debug = pending.pop(future)
+                debug_info.extend(attempt_debug)
+                result, _ = future.result()
+                if result and html is None:
+                    html, winner, final_url = result, name, attempt.final_url or url
+            if html is not None:
+                break
+            if budget and budget.remaining() <= 0:
+                debug_info.append(f"Time budget of {budget.seconds:.0f}s exhausted")
+                break
+            
+            nobody_responding = not any(attempt.responding.is_set() for _, attempt, _ in pending.values())
+            if remaining and not pending:
+                debug_info.append("Hedging: starting next strategy after failure")
+                launch()
+            elif remaining and not done and nobody_responding:
+                debug_info.append(f"Hedging: starting next strategy after {hedge_delay}s without a response")
+                launch()
+    finally:
+        cancelled.set()
+    
+    if pending:
+        debug_info.append(f"Stopped {len(pending)} slower strategies")
+    return html, winner, final_url
+
+def ordered_strategies(profile):
+    """FETCH_STRATEGIES with the one that last worked for the domain moved to the front"""
+    strategies = list(FETCH_STRATEGIES)
+    for strategy in strategies:
+        if strategy.__name__ == profile.get("strategy"):
+            strategies.remove(strategy)
+            strategies.insert(0, strategy)
+            break
+    return strategies
+
+def parse_content(html, url, debug_info=None, page_url=None):
+    """
+    Parse the HTML content to extract the article
+    Relative links are resolved against page_url, where the page was finally served from (default: url).
+    """
     if debug_info is None:
         debug_info = []
     
     try:
-        soup = BeautifulSoup(html, 'html.parser')
+        soup = parse_page(url, html, debug_info)
         
         # Extract title
         title_elem = soup.select_one('h1.txt-primary')
@@ -224,8 +492,7 @@ def parse_content(html, url, debug_info=None):
         
         if content_elem:
             # Remove unwanted elements
-            for unwanted in content_elem.select('script, style, .ads, .ad-container, .related, .comments'):
-                unwanted.decompose()
+            prune(content_elem, TRUYENSEXTV_CONTENT_RULES)
             
             # Get the text
             paragraphs = content_elem.find_all(['p', 'div'], recursive=False)
@@ -249,13 +516,14 @@ def parse_content(html, url, debug_info=None):
         next_link = None
         prev_link = None
         
-        # Try to find navigation links
-        for link in soup.find_all('a'):
-            link_text = link.get_text().lower().strip()
-            if any(term in link_text for term in ['chương sau', 'tiếp', 'tiếp theo', 'next']):
-                next_link = link.get('href')
-            elif any(term in link_text for term in ['chương trước', 'trước', 'previous', 'prev']):
-                prev_link = link.get('href')
+        # Try to find navigation links (the last matching link wins)
+        for link in LinkIndex(soup, page_url or url).anchors:
+            if not link.url:
+                continue
+            if any(term in link.text for term in ['chương sau', 'tiếp', 'tiếp theo', 'next']):
+                next_link = link.url
+            elif any(term in link.text for term in ['chương trước', 'trước', 'previous', 'prev']):
+                prev_link = link.url
         
         debug_info.append(f"Navigation links - Next: {next_link}, Previous: {prev_link}")
         
@@ -264,36 +532,58 @@ def parse_content(html, url, debug_info=None):
         debug_info.append(f"Error parsing content: {str(e)}")
         return "Error", f"Failed to parse content: {str(e)}", None, None, debug_info
 
-def extract_from_truyensextv(url):
-    """Main function to extract content from truyensextv.com"""
+def extract_from_truyensextv(url, hedged=True, budget=None):
+    """
+    Main function to extract content from truyensextv.com
+    With hedged=True the fetch strategies race (see fetch_hedged);
+    otherwise they are tried one after another. All attempts share one
+    RetryBudget (interactive by default).
+    """
     start_time = time.time()
+    if budget is None:
+        budget = RetryBudget()
     debug_info = []
     debug_info.append(f"Starting extraction from: {url}")
     
-    # Try multiple methods until one succeeds
-    html = None
-    
-    # Method 1: Requests
-    html, debug_info = extract_with_requests(url, debug_info)
+    # Skip redirect hops seen on earlier visits
+    url = resolve_redirects(url, debug_info)
     
-    # Method 2: urllib3
-    if not html:
-        html, debug_info = extract_with_urllib3(url, debug_info)
+    # Start with the strategy and User-Agent that worked for this domain last time
+    profiles = get_transport_profiles()
+    profile = profiles.get(url)
+    strategies = ordered_strategies(profile)
+    user_agent = profile.get("headers", {}).get("User-Agent") or get_random_user_agent()
+    if profile.get("strategy"):
+        debug_info.append(f"Last successful strategy for this domain: {profile['strategy']}")
     
-    # Method 3: http.client
-    if not html:
-        html, debug_info = extract_with_httplib(url, debug_info)
+    # Try multiple methods until one succeeds
+    html = None
+    winner = None
+    page_url = None
     
-    # Method 4: curl command
-    if not html:
-        html, debug_info = extract_using_curl(url, debug_info)
+    if hedged:
+        html, winner, page_url = fetch_hedged(url, debug_info, strategies, user_agent=user_agent, budget=budget)
+    else:
+        for strategy in strategies:
+            if budget.remaining() <= 0:
+                break
+            attempt = HedgedAttempt(threading.Event(), budget)
+            html, debug_info = strategy(url, debug_info, attempt, user_agent)
+            if html:
+                winner = strategy.__name__
+                page_url = attempt.final_url or url
+                break
+    get_cookie_jar().save_if_dirty()
     
-    if not html:
+    if html:
+        profiles.record_success(url, strategy=winner, headers={'User-Agent': user_agent})
+    else:
         debug_info.append("All extraction methods failed")
+        profiles.record_failure(url, "All extraction methods failed")
         return "Error", "Failed to extract content after multiple attempts", None, None, "\n".join(debug_info), time.time() - start_time
     
     # Parse the content
-    title, content, prev_link, next_link, debug_info = parse_content(html, url, debug_info)
+    title, content, prev_link, next_link, debug_info = parse_content(html, url, debug_info, page_url)
     
     execution_time = time.time() - start_time
     debug_info.append(f"Total execution time: {execution_time:.2f} seconds")